@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends, Query
+import asyncpg
+from ...database.base import get_db
+from ...crud import partitions as partitions_crud
+
+# 되돌릴 수 없는 DDL을 실행하는 관리자 전용 라우터 - BW_ENABLE_ADMIN_API=true일 때만 등록
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+@router.post("/partitions/create")
+async def create_future_partitions(
+    months_ahead: int = Query(partitions_crud.DEFAULT_MONTHS_AHEAD, ge=0, le=24, description="미리 생성할 개월 수"),
+    db: asyncpg.Connection = Depends(get_db)
+):
+    """미래 월 파티션 생성 (관리자용) - 보존 기간 정리는 정기 유지보수 작업에서만 실행"""
+    try:
+        if not await partitions_crud.is_partitioned(db):
+            return {"status": "error", "message": "bw_data가 아직 파티션 테이블이 아닙니다. 먼저 전환을 실행하세요."}
+        return {"status": "success", "created": await partitions_crud.ensure_future_partitions(db, months_ahead)}
+    except Exception as e:
+        return {"status": "error", "message": f"파티션 생성 실패: {str(e)}"}
+
+@router.post("/partitions/convert")
+async def convert_to_partitioned(
+    months_ahead: int = Query(partitions_crud.DEFAULT_MONTHS_AHEAD, ge=0, le=24, description="미리 생성할 개월 수"),
+    confirm: str = Query(..., description="전환 확인 - 테이블 이름(bw_data)을 그대로 입력"),
+    db: asyncpg.Connection = Depends(get_db)
+):
+    """bw_data를 월 단위 파티션 테이블로 전환 (관리자용, 1회성)"""
+    if confirm != partitions_crud.PARENT_TABLE:
+        return {"status": "error", "message": f"confirm={partitions_crud.PARENT_TABLE}을 지정해야 전환합니다."}
+    try:
+        return await partitions_crud.convert_to_partitioned(db, months_ahead)
+    except Exception as e:
+        return {"status": "error", "message": f"파티션 전환 실패: {str(e)}"}
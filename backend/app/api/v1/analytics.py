@@ -1,8 +1,16 @@
-from fastapi import APIRouter, Depends, Query
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query
 import asyncpg
 from typing import List, Optional
-from ...database.base import get_db
+from ...database.base import get_db, get_db_pool
 from ...crud import analytics as analytics_crud
+from ...crud import segments as segments_crud
+from ...services.fastjson import FastJSONResponse
+from ...services.segment_refresh import segment_refresher
+from ...services.cache import session_trend_cache, view_cache
+from ...services.view_refresh import view_refresher
+from ...services.row_counts import row_count_verifier
+from ...services.distribution import DEFAULT_PERCENTILES, fleet_distribution
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
@@ -15,11 +23,15 @@ async def get_bw_dashboard_data(db: asyncpg.Connection = Depends(get_db)):
 async def get_client_vehicles_info(
     car_type: Optional[str] = Query(None, description="차종 필터"),
     limit: int = Query(15, ge=1, le=100, description="페이지당 항목 수"),
-    offset: int = Query(0, ge=0, description="페이지 오프셋"),
+    offset: int = Query(0, ge=0, description="페이지 오프셋 (cursor 미지정 시)"),
+    cursor: Optional[str] = Query(None, description="이전 응답의 pagination.next_cursor 값 (keyset 페이지네이션)"),
     db: asyncpg.Connection = Depends(get_db)
 ):
     """Client ID별 차량 정보 조회 - 페이지네이션 및 차종 필터링 지원"""
-    return await analytics_crud.get_client_vehicles_info(db, car_type, limit, offset)
+    try:
+        return await analytics_crud.get_client_vehicles_info(db, car_type, limit, offset, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/car-types")
 async def get_available_car_types(db: asyncpg.Connection = Depends(get_db)):
@@ -27,26 +39,147 @@ async def get_available_car_types(db: asyncpg.Connection = Depends(get_db)):
     return await analytics_crud.get_available_car_types(db)
 
 @router.post("/bw-dashboard/refresh")
-async def refresh_bw_dashboard_view(db: asyncpg.Connection = Depends(get_db)):
-    """BW 대시보드 materialized view 새로고침 (관리자용)"""
-    return await analytics_crud.refresh_bw_dashboard_view(db)
+async def refresh_bw_dashboard_view(
+    wait: bool = Query(False, description="true면 새로고침 완료까지 대기 후 결과 반환")
+):
+    """BW 대시보드 materialized view 새로고침 (관리자용) - 백그라운드 작업으로 실행"""
+    job = view_refresher.submit(["bw_dashboard"], include_dependents=False)
+    if wait:
+        # 요청이 취소되어도 새로고침 작업 자체는 계속 실행
+        await asyncio.shield(job.task)
+        return job.to_dict()
+    return {"status": "accepted", "message": "bw_dashboard 새로고침 작업을 등록했습니다.", "job_id": job.id}
 
 @router.get("/bw-dashboard/status")
 async def get_bw_dashboard_status(db: asyncpg.Connection = Depends(get_db)):
     """BW 대시보드 관련 테이블 및 뷰 상태 확인"""
-    return await analytics_crud.get_bw_dashboard_status(db)
+    status = await analytics_crud.get_bw_dashboard_status(db)
+    status["refresh_scheduler"] = view_refresher.status()
+    status["count_verifier"] = row_count_verifier.status()
+    return status
+
+@router.post("/bw-dashboard/counts/refresh")
+async def refresh_exact_row_counts():
+    """상태 API 테이블의 정확한 행 수를 백그라운드에서 다시 집계 (관리자용)"""
+    if not row_count_verifier.trigger():
+        return {"status": "running", "message": "행 수 집계가 이미 진행 중입니다."}
+    return {"status": "accepted", "message": "행 수 집계를 시작했습니다."}
+
+@router.post("/views/refresh")
+async def refresh_materialized_views(
+    view: Optional[List[str]] = Query(None, description="새로고침할 뷰 (반복 지정, 미지정 시 전체 - BW_VIEW_REFRESH_EXCLUDE 제외)"),
+    include_dependents: bool = Query(True, description="지정한 뷰에 의존하는 뷰도 함께 새로고침"),
+    wait: bool = Query(False, description="true면 완료까지 대기 후 결과 반환")
+):
+    """머티리얼라이즈드 뷰를 의존 순서대로 새로고침 (관리자용) - 가능한 뷰는 CONCURRENTLY"""
+    job = view_refresher.submit(view, include_dependents)
+    if wait:
+        # 요청이 취소되어도 새로고침 작업 자체는 계속 실행
+        await asyncio.shield(job.task)
+        return job.to_dict()
+    return {"status": "accepted", "message": "뷰 새로고침 작업을 등록했습니다.", "job_id": job.id}
 
+@router.get("/views/refresh/jobs")
+async def list_view_refresh_jobs():
+    """최근 뷰 새로고침 작업 목록"""
+    return view_refresher.list_jobs()
 
+@router.get("/views/refresh/jobs/{job_id}")
+async def get_view_refresh_job(job_id: str):
+    """뷰 새로고침 작업 진행 상태 조회"""
+    job = view_refresher.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다.")
+    return job.to_dict()
+
+
+
+@router.get("/distribution")
+async def get_distribution(
+    metric: str = Query(..., description="지표 (avg_soh, avg_cell_imbalance, avg_soc_per_km, total_battery_score, segment_soc_per_km, segment_wh_per_km 등)"),
+    car_type: Optional[str] = Query(None, description="차종 (미지정 시 전체)"),
+    percentile: Optional[List[float]] = Query(None, description="백분위 (0~100, 반복 지정, 미지정 시 1/5/10/25/50/75/90/95/99)"),
+    bins: int = Query(20, ge=1, le=200, description="히스토그램 구간 수"),
+    db: asyncpg.Connection = Depends(get_db)
+):
+    """차종별 지표 분포 (분위수 스케치 기반 백분위/히스토그램 근사)"""
+    try:
+        return await fleet_distribution.describe(
+            db, metric, car_type, percentile or DEFAULT_PERCENTILES, bins
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/distribution/refresh")
+async def refresh_distribution(db: asyncpg.Connection = Depends(get_db)):
+    """분포 스케치 갱신 (랭킹 변경분 재구성, 새 주행 구간 증분 반영)"""
+    try:
+        result = await fleet_distribution.refresh(db)
+        return {"status": "success", "message": "분포 스케치를 갱신했습니다.", **result}
+    except Exception as e:
+        return {"status": "error", "message": f"분포 스케치 갱신 실패: {str(e)}"}
+
+@router.get("/distribution/status")
+async def get_distribution_status():
+    """분포 스케치 현황 (지표/차종별 표본 수)"""
+    return fleet_distribution.status()
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """뷰 기반 응답 캐시 적중/미스 통계 (차량별 세션 추세 캐시는 session_trend_cache)"""
+    return {**view_cache.stats(), "session_trend_cache": session_trend_cache.stats()}
+
+@router.post("/cache/invalidate")
+async def invalidate_cache(
+    view: Optional[List[str]] = Query(None, description="무효화할 뷰/테이블 이름 (반복 지정, 미지정 시 전체)")
+):
+    """응답 캐시 무효화 (관리자용) - 외부에서 뷰를 새로고침한 경우 호출"""
+    removed = sum(
+        cache.invalidate(*view) if view else cache.clear()
+        for cache in (view_cache, session_trend_cache)
+    )
+    return {"status": "success", "message": f"캐시 항목 {removed}개를 무효화했습니다.", "removed": removed}
 
 @router.get("/vehicle/{clientid}/segments")
 async def get_vehicle_segments(
     clientid: str,
     data_type: str = Query("mileage", description="데이터 타입: mileage 또는 soc"),
+    fast: bool = Query(False, description="true면 orjson으로 바로 직렬화"),
     db: asyncpg.Connection = Depends(get_db)
 ):
     """특정 차량의 구간별 데이터 조회 (마일리지 또는 SOC 기준)"""
+    if fast:
+        # 행 단위 dict 변환 없이 레코드를 바로 직렬화
+        return FastJSONResponse(await analytics_crud.get_vehicle_segments_records(db, clientid, data_type))
     return await analytics_crud.get_vehicle_segments_data(db, clientid, data_type)
 
+@router.post("/segments/refresh")
+async def refresh_segments(
+    clientid: Optional[List[str]] = Query(None, description="갱신할 차량 ID (반복 지정, 미지정 시 전체 차량)")
+):
+    """원본 bw_data에서 구간을 증분 분류하여 bw_segment_states_live에 반영 (관리자용)"""
+    try:
+        if clientid:
+            return await segments_crud.refresh_segments(await get_db_pool(), clientid)
+        return await segment_refresher.run_once()
+    except Exception as e:
+        return {"status": "error", "message": f"구간 갱신 실패: {str(e)}"}
+
+@router.post("/segments/energy/refresh")
+async def refresh_segment_energy(
+    clientid: Optional[List[str]] = Query(None, description="갱신할 차량 ID (반복 지정, 미지정 시 전체 차량)")
+):
+    """구간별 pack_v * current 적분 에너지(Wh, Wh/km) 일괄 계산 - 미계산/변경 구간만 처리 (관리자용)"""
+    try:
+        return await segments_crud.refresh_segment_energy(await get_db_pool(), clientid)
+    except Exception as e:
+        return {"status": "error", "message": f"구간 에너지 갱신 실패: {str(e)}"}
+
+@router.get("/segments/refresh/status")
+async def get_segment_refresh_status(db: asyncpg.Connection = Depends(get_db)):
+    """구간 증분 갱신 현황 조회"""
+    return {**await segments_crud.get_segment_refresh_status(db), "scheduler": segment_refresher.status()}
+
 @router.get("/vehicle/{clientid}/segments/count")
 async def get_vehicle_segments_count(
     clientid: str,
@@ -55,6 +188,19 @@ async def get_vehicle_segments_count(
     """특정 차량의 실제 구간 수 조회"""
     return await analytics_crud.get_vehicle_segments_count(db, clientid)
 
+@router.get("/vehicles/summary")
+async def get_vehicle_summaries(
+    clientid: Optional[List[str]] = Query(None, description="차량 ID (반복 지정, 최대 1000대)"),
+    car_type: Optional[str] = Query(None, description="차종 - clientid 미지정 시 해당 차종 전체"),
+    db: asyncpg.Connection = Depends(get_db)
+):
+    """여러 차량의 요약 정보를 한 번의 그룹 쿼리로 조회 (차량 목록/차종 단위 테이블용)"""
+    if not clientid and not car_type:
+        raise HTTPException(status_code=400, detail="clientid 또는 car_type을 지정하세요.")
+    if clientid and len(clientid) > 1000:
+        raise HTTPException(status_code=400, detail="clientid는 최대 1000개까지 지정할 수 있습니다.")
+    return await analytics_crud.get_vehicle_summaries(db, clientid, car_type)
+
 @router.get("/vehicle/{clientid}/summary")
 async def get_vehicle_summary_info(
     clientid: str,
@@ -66,11 +212,17 @@ async def get_vehicle_summary_info(
 @router.get("/battery-performance/ranking")
 async def get_battery_performance_ranking(
     limit: int = Query(50, ge=1, le=1000, description="페이지당 항목 수"),
-    offset: int = Query(0, ge=0, description="페이지 오프셋"),
+    offset: int = Query(0, ge=0, description="페이지 오프셋 (cursor 미지정 시)"),
+    cursor: Optional[str] = Query(None, description="이전 응답의 pagination.next_cursor 값 (keyset 페이지네이션)"),
+    fast: bool = Query(False, description="true면 orjson으로 바로 직렬화"),
     db: asyncpg.Connection = Depends(get_db)
 ):
     """배터리 성능 랭킹 조회"""
-    return await analytics_crud.get_battery_performance_ranking(db, limit, offset)
+    try:
+        data = await analytics_crud.get_battery_performance_ranking(db, limit, offset, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse(data) if fast else data
 
 @router.get("/battery-performance/ranking/summary")
 async def get_battery_performance_ranking_summary(
@@ -78,3 +230,43 @@ async def get_battery_performance_ranking_summary(
 ):
     """배터리 성능 랭킹 요약 통계 조회"""
     return await analytics_crud.get_battery_performance_ranking_summary(db)
+
+@router.get("/battery-performance/ranking/what-if")
+async def get_battery_ranking_what_if(
+    soh: Optional[float] = Query(None, ge=0, description="SOH 가중치 (기본 20)"),
+    cell_balance: Optional[float] = Query(None, ge=0, description="셀 밸런싱 가중치 (기본 15)"),
+    driving_efficiency: Optional[float] = Query(None, ge=0, description="주행 효율 가중치 (기본 20)"),
+    charging_efficiency: Optional[float] = Query(None, ge=0, description="충전 효율 가중치 (기본 15)"),
+    temperature_stability: Optional[float] = Query(None, ge=0, description="온도 안정성 가중치 (기본 15)"),
+    charging_habit: Optional[float] = Query(None, ge=0, description="충전 습관 가중치 (기본 15)"),
+    limit: int = Query(50, ge=1, le=1000, description="페이지당 항목 수"),
+    offset: int = Query(0, ge=0, description="페이지 오프셋"),
+    fast: bool = Query(False, description="true면 orjson으로 바로 직렬화"),
+    db: asyncpg.Connection = Depends(get_db)
+):
+    """영역별 가중치를 바꿔 다시 채점한 배터리 성능 랭킹 (가중치는 합계 100으로 환산)"""
+    weights = {
+        'soh': soh,
+        'cell_balance': cell_balance,
+        'driving_efficiency': driving_efficiency,
+        'charging_efficiency': charging_efficiency,
+        'temperature_stability': temperature_stability,
+        'charging_habit': charging_habit
+    }
+    try:
+        data = await analytics_crud.get_battery_ranking_what_if(db, weights, limit, offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse(data) if fast else data
+
+@router.get("/battery-performance/ranking/{clientid}")
+async def get_battery_ranking_position(
+    clientid: str,
+    window: int = Query(5, ge=0, le=100, description="위/아래로 함께 조회할 차량 수"),
+    db: asyncpg.Connection = Depends(get_db)
+):
+    """특정 차량의 랭킹 순위/백분위와 주변 차량 조회"""
+    data = await analytics_crud.get_battery_ranking_position(db, clientid, window)
+    if data is None:
+        raise HTTPException(status_code=404, detail=f"랭킹에 없는 차량입니다: {clientid}")
+    return data
@@ -1,334 +1,226 @@
-from fastapi import APIRouter, HTTPException, Query
-from typing import List, Optional
-from datetime import datetime, timedelta
-import psycopg2
-from psycopg2.extras import RealDictCursor
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+from fastapi import APIRouter, Depends, HTTPException, Query
+import asyncpg
+from typing import Optional
+from ...database.base import get_db
+from ...crud import battery_trend as battery_trend_crud
+from ...services.forecast import describe_forecast, summarize_by_car_type
+from ...services.forecast_refresh import soh_forecaster
 
 router = APIRouter()
 
-# 데이터베이스 연결 설정
-def get_db_connection():
-    return psycopg2.connect(
-        host=os.getenv("DB_HOST", "localhost"),
-        database=os.getenv("DB_NAME", "ev_analytics"),
-        user=os.getenv("DB_USER", "postgres"),
-        password=os.getenv("DB_PASSWORD", "password"),
-        port=os.getenv("DB_PORT", "5432")
-    )
-
 @router.get("/car-types")
-async def get_car_types():
+async def get_car_types(db: asyncpg.Connection = Depends(get_db)):
     """사용 가능한 차량 종류 목록을 반환합니다."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # bw_esoh_monthly 뷰에 데이터가 있는 차량들의 car_type만 조회
-        query = """
-        SELECT DISTINCT ct.car_type
-        FROM bw_esoh_monthly bem
-        JOIN car_type ct ON bem.clientid = ct.clientid
-        WHERE ct.car_type IS NOT NULL
-        GROUP BY ct.car_type
-        ORDER BY ct.car_type
-        """
-        
-        cursor.execute(query)
-        results = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
-        return {"car_types": [dict(row) for row in results]}
-        
+        return {"car_types": await battery_trend_crud.get_trend_car_types(db)}
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"데이터베이스 오류: {str(e)}")
 
 @router.get("/vehicles")
-async def get_vehicles():
-    """6개월 이상 데이터가 있고 전반적으로 감소 추세를 보이는 차량 목록을 반환합니다."""
+async def get_vehicles(
+    min_periods: int = Query(battery_trend_crud.MIN_TREND_PERIODS, ge=2, description="최소 데이터 기간 수"),
+    direction: str = Query(battery_trend_crud.DEFAULT_TREND_DIRECTION, description="기울기 조건 (decreasing, increasing, any)"),
+    db: asyncpg.Connection = Depends(get_db)
+):
+    """6개월(min_periods) 이상 데이터가 있고 전반적으로 감소 추세를 보이는 차량 목록을 반환합니다."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # 6개월 이상 데이터가 있고 전반적으로 감소 추세를 보이는 차량들만 조회
-        query = """
-        WITH base AS (
-          SELECT
-            b.*,
-            ROW_NUMBER() OVER (PARTITION BY b.clientid ORDER BY b.month) AS month_seq,
-            COUNT(*)    OVER (PARTITION BY b.clientid)                   AS n
-          FROM bw_esoh_monthly b
-        ),
-        trend AS (
-          SELECT DISTINCT
-            clientid,
-            n,
-            REGR_SLOPE(p20_ma3, month_seq) OVER (
-              PARTITION BY clientid
-              ORDER BY month_seq
-              ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
-            ) AS slope
-          FROM base
-        ),
-        eligible_clients AS (
-          SELECT clientid
-          FROM trend
-          WHERE n >= 6
-            AND slope < 0          -- 기울기가 음수면 전반적 감소 추세
-        )
-        SELECT DISTINCT e.clientid, ct.car_type
-        FROM eligible_clients e
-        LEFT JOIN car_type ct ON e.clientid = ct.clientid
-        ORDER BY e.clientid
-        """
-        
-        cursor.execute(query)
-        results = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
-        return {"vehicles": [dict(row) for row in results]}
-        
+        return {"vehicles": await battery_trend_crud.get_trend_vehicles(db, "monthly", min_periods, direction)}
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"데이터베이스 오류: {str(e)}")
 
 @router.get("/battery-trend")
-async def get_battery_trend(clientid: str = Query(..., description="차량 ID")):
+async def get_battery_trend(
+    clientid: str = Query(..., description="차량 ID"),
+    min_periods: int = Query(battery_trend_crud.MIN_TREND_PERIODS, ge=2, description="최소 데이터 기간 수"),
+    direction: str = Query(battery_trend_crud.DEFAULT_TREND_DIRECTION, description="기울기 조건 (decreasing, increasing, any)"),
+    db: asyncpg.Connection = Depends(get_db)
+):
     """특정 차량의 배터리 성능 트렌드를 반환합니다 (6개월 이상, 감소 추세 차량만)."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
         # 먼저 해당 차량이 조건을 만족하는지 확인
-        eligibility_query = """
-        WITH base AS (
-          SELECT
-            b.*,
-            ROW_NUMBER() OVER (PARTITION BY b.clientid ORDER BY b.month) AS month_seq,
-            COUNT(*)    OVER (PARTITION BY b.clientid)                   AS n
-          FROM bw_esoh_monthly b
-          WHERE b.clientid = %s
-        ),
-        trend AS (
-          SELECT DISTINCT
-            clientid,
-            n,
-            REGR_SLOPE(p20_ma3, month_seq) OVER (
-              PARTITION BY clientid
-              ORDER BY month_seq
-              ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
-            ) AS slope
-          FROM base
-        )
-        SELECT clientid, n, slope
-        FROM trend
-        WHERE n >= 6 AND slope < 0
-        """
-        
-        cursor.execute(eligibility_query, (clientid,))
-        eligibility = cursor.fetchone()
-        
+        eligibility = await battery_trend_crud.get_trend_eligibility(db, clientid, "monthly", min_periods, direction)
+
         if not eligibility:
             raise HTTPException(
-                status_code=400, 
-                detail=f"해당 차량({clientid})은 6개월 이상 데이터가 있거나 감소 추세를 보이지 않습니다."
+                status_code=400,
+                detail=f"해당 차량({clientid})은 {min_periods}개월 이상 데이터가 없거나 추세 조건({direction})을 만족하지 않습니다."
             )
-        
+
         # 조건을 만족하는 경우 배터리 트렌드 데이터 조회
-        trend_query = """
-        SELECT month, monthly_p20_esoh, p20_ma3, delta_1m, n_sessions
-        FROM bw_esoh_monthly
-        WHERE clientid = %s
-        ORDER BY month
-        """
-        
-        cursor.execute(trend_query, (clientid,))
-        results = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
         return {
             "clientid": clientid,
             "data_months": eligibility['n'],
             "trend_slope": float(eligibility['slope']),
-            "trend_data": [dict(row) for row in results]
+            "trend_data": await battery_trend_crud.get_trend_data(db, clientid, "monthly")
         }
-        
+
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"데이터베이스 오류: {str(e)}")
 
 @router.get("/weekly-vehicles")
-async def get_weekly_vehicles():
-    """6주 이상 데이터가 있고 전반적으로 감소 추세를 보이는 차량 목록을 반환합니다."""
+async def get_weekly_vehicles(
+    min_periods: int = Query(battery_trend_crud.MIN_TREND_PERIODS, ge=2, description="최소 데이터 기간 수"),
+    direction: str = Query(battery_trend_crud.DEFAULT_TREND_DIRECTION, description="기울기 조건 (decreasing, increasing, any)"),
+    db: asyncpg.Connection = Depends(get_db)
+):
+    """6주(min_periods) 이상 데이터가 있고 전반적으로 감소 추세를 보이는 차량 목록을 반환합니다."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # 6주 이상 데이터가 있고 전반적으로 감소 추세를 보이는 차량들만 조회
-        query = """
-        WITH base AS (
-          SELECT
-            b.*,
-            ROW_NUMBER() OVER (PARTITION BY b.clientid ORDER BY b.week_start) AS week_seq,
-            COUNT(*)    OVER (PARTITION BY b.clientid)                         AS n
-          FROM bw_esoh_weekly b
-        ),
-        trend AS (
-          SELECT DISTINCT
-            clientid,
-            n,
-            REGR_SLOPE(p20_ma4, week_seq) OVER (
-              PARTITION BY clientid
-              ORDER BY week_seq
-              ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
-            ) AS slope
-          FROM base
-        ),
-        eligible_clients AS (
-          SELECT clientid
-          FROM trend
-          WHERE n >= 6
-            AND slope < 0          -- 기울기가 음수면 전반적 감소 추세
-        )
-        SELECT DISTINCT e.clientid, ct.car_type
-        FROM eligible_clients e
-        LEFT JOIN car_type ct ON e.clientid = ct.clientid
-        ORDER BY e.clientid
-        """
-        
-        cursor.execute(query)
-        results = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
-        return {"vehicles": [dict(row) for row in results]}
-        
+        return {"vehicles": await battery_trend_crud.get_trend_vehicles(db, "weekly", min_periods, direction)}
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"데이터베이스 오류: {str(e)}")
 
 @router.get("/weekly-battery-trend")
-async def get_weekly_battery_trend(clientid: str = Query(..., description="차량 ID")):
+async def get_weekly_battery_trend(
+    clientid: str = Query(..., description="차량 ID"),
+    min_periods: int = Query(battery_trend_crud.MIN_TREND_PERIODS, ge=2, description="최소 데이터 기간 수"),
+    direction: str = Query(battery_trend_crud.DEFAULT_TREND_DIRECTION, description="기울기 조건 (decreasing, increasing, any)"),
+    db: asyncpg.Connection = Depends(get_db)
+):
     """특정 차량의 주간 배터리 성능 트렌드를 반환합니다 (6주 이상, 감소 추세 차량만)."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
         # 먼저 해당 차량이 조건을 만족하는지 확인
-        eligibility_query = """
-        WITH base AS (
-          SELECT
-            b.*,
-            ROW_NUMBER() OVER (PARTITION BY b.clientid ORDER BY b.week_start) AS week_seq,
-            COUNT(*)    OVER (PARTITION BY b.clientid)                         AS n
-          FROM bw_esoh_weekly b
-          WHERE b.clientid = %s
-        ),
-        trend AS (
-          SELECT DISTINCT
-            clientid,
-            n,
-            REGR_SLOPE(p20_ma4, week_seq) OVER (
-              PARTITION BY clientid
-              ORDER BY week_seq
-              ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
-            ) AS slope
-          FROM base
-        )
-        SELECT clientid, n, slope
-        FROM trend
-        WHERE n >= 6 AND slope < 0
-        """
-        
-        cursor.execute(eligibility_query, (clientid,))
-        eligibility = cursor.fetchone()
-        
+        eligibility = await battery_trend_crud.get_trend_eligibility(db, clientid, "weekly", min_periods, direction)
+
         if not eligibility:
             raise HTTPException(
-                status_code=400, 
-                detail=f"해당 차량({clientid})은 6주 이상 데이터가 있거나 감소 추세를 보이지 않습니다."
+                status_code=400,
+                detail=f"해당 차량({clientid})은 {min_periods}주 이상 데이터가 없거나 추세 조건({direction})을 만족하지 않습니다."
             )
-        
+
         # 조건을 만족하는 경우 주간 배터리 트렌드 데이터 조회
-        trend_query = """
-        SELECT week_start, weekly_p20_esoh, p20_ma4, delta_1w, n_sessions
-        FROM bw_esoh_weekly
-        WHERE clientid = %s
-        ORDER BY week_start
-        """
-        
-        cursor.execute(trend_query, (clientid,))
-        results = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
         return {
             "clientid": clientid,
             "data_weeks": eligibility['n'],
             "trend_slope": float(eligibility['slope']),
-            "trend_data": [dict(row) for row in results]
+            "trend_data": await battery_trend_crud.get_trend_data(db, clientid, "weekly")
         }
-        
+
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"데이터베이스 오류: {str(e)}")
+
+@router.get("/custom-trend")
+async def get_custom_battery_trend(
+    clientid: str = Query(..., description="차량 ID"),
+    bucket: str = Query("month", description="기간 단위 (day, week, month, quarter)"),
+    ma_window: Optional[int] = Query(None, ge=1, le=battery_trend_crud.MAX_MA_WINDOW, description="이동평균 기간 수 (미지정 시 기간 단위별 기본값)"),
+    db: asyncpg.Connection = Depends(get_db)
+):
+    """세션 단위 eSOH에서 임의 기간 단위의 p20 eSOH 트렌드를 계산해 반환합니다 (기간별 뷰 불필요)."""
+    try:
+        trend_data = await battery_trend_crud.get_custom_trend_data(db, clientid, bucket, ma_window)
+        if not trend_data:
+            raise HTTPException(status_code=404, detail=f"해당 차량({clientid})의 eSOH 세션 데이터가 없습니다.")
+        return {
+            "clientid": clientid,
+            "bucket": bucket,
+            "ma_window": ma_window or battery_trend_crud.TREND_BUCKETS[bucket],
+            "data_periods": len(trend_data),
+            "trend_data": trend_data
+        }
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"데이터베이스 오류: {str(e)}")
 
 @router.get("/battery-trend-summary")
-async def get_battery_trend_summary():
-    """전체 차량의 배터리 트렌드 요약 정보를 반환합니다."""
+async def get_battery_trend_summary(
+    granularity: str = Query("monthly", description="기간 단위 (monthly, weekly)"),
+    db: asyncpg.Connection = Depends(get_db)
+):
+    """전체 차량의 배터리 트렌드 요약 정보를 반환합니다 (차량별 최신 기간 스냅샷 기준)."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # bw_esoh_monthly 뷰에 데이터가 있는 차량들의 요약 정보
-        summary_query = """
-        WITH latest_trends AS (
-            SELECT 
-                bem.clientid,
-                ct.car_type,
-                ct.model_year,
-                bem.monthly_p20_esoh,
-                bem.p20_ma3,
-                bem.delta_1m
-            FROM bw_esoh_monthly bem
-            JOIN car_type ct ON bem.clientid = ct.clientid
-            WHERE ct.car_type IS NOT NULL 
-              AND ct.model_year IS NOT NULL
-              AND bem.month = (
-                SELECT MAX(month) 
-                FROM bw_esoh_monthly bem2 
-                WHERE bem2.clientid = bem.clientid
-              )
-        )
-        SELECT 
-            car_type,
-            COUNT(*) as vehicle_count,
-            ROUND(AVG(monthly_p20_esoh), 2) as avg_esoh,
-            ROUND(AVG(p20_ma3), 2) as avg_ma3,
-            ROUND(AVG(delta_1m), 3) as avg_delta
-        FROM latest_trends
-        GROUP BY car_type
-        ORDER BY car_type
-        """
-        
-        cursor.execute(summary_query)
-        results = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
-        return {"summary": [dict(row) for row in results]}
-        
+        return {"summary": await battery_trend_crud.get_battery_trend_summary(db, granularity)}
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"데이터베이스 오류: {str(e)}")
+
+@router.post("/index/refresh")
+async def refresh_trend_index(
+    granularity: Optional[str] = Query(None, description="기간 단위 (monthly, weekly, 미지정 시 전체)"),
+    db: asyncpg.Connection = Depends(get_db)
+):
+    """eSOH 뷰에서 차량별 추세 인덱스와 최신 기간 스냅샷 갱신 (관리자용) - 뷰 새로고침 작업 후에는 자동 실행"""
+    granularities = [granularity] if granularity else list(battery_trend_crud.TREND_SOURCES)
+    try:
+        results = []
+        for name in granularities:
+            if name not in battery_trend_crud.TREND_SOURCES:
+                raise ValueError(f"지원하지 않는 기간 단위입니다: {name}")
+            results.append(await battery_trend_crud.trend_refresh_hook(name)(db))
+        return {"status": "success", "message": "추세 인덱스와 최신 스냅샷을 갱신했습니다.", "results": results}
+    except Exception as e:
+        return {"status": "error", "message": f"추세 인덱스 갱신 실패: {str(e)}"}
+
+@router.get("/forecast")
+async def get_soh_forecast(
+    clientid: str = Query(..., description="차량 ID"),
+    threshold: Optional[float] = Query(None, gt=0, lt=100, description="EOL 기준 eSOH [%] (미지정 시 저장된 기준)"),
+    granularity: str = Query("monthly", description="기간 단위 (monthly, weekly)"),
+    db: asyncpg.Connection = Depends(get_db)
+):
+    """차량의 SOH 열화 회귀와 EOL(기준 eSOH 도달) 예상 시점, 95% 신뢰구간을 반환합니다."""
+    try:
+        if granularity not in battery_trend_crud.TREND_SOURCES:
+            raise ValueError(f"지원하지 않는 기간 단위입니다: {granularity}")
+        fit = await battery_trend_crud.get_vehicle_forecast(db, clientid, granularity)
+        if not fit:
+            raise HTTPException(status_code=404, detail=f"해당 차량({clientid})의 예측 결과가 없습니다.")
+        # 저장된 회귀 계수로 바로 계산하므로 기준값을 바꿔도 재회귀가 필요 없음
+        return describe_forecast(fit, threshold if threshold is not None else fit["threshold"])
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"데이터베이스 오류: {str(e)}")
+
+@router.get("/forecast/car-types")
+async def get_soh_forecast_by_car_type(
+    threshold: float = Query(soh_forecaster.threshold, gt=0, lt=100, description="EOL 기준 eSOH [%]"),
+    granularity: str = Query("monthly", description="기간 단위 (monthly, weekly)"),
+    db: asyncpg.Connection = Depends(get_db)
+):
+    """차종별 EOL 예상 시점 분포(중앙값/사분위)와 예측 상태별 차량 수를 반환합니다."""
+    try:
+        if granularity not in battery_trend_crud.TREND_SOURCES:
+            raise ValueError(f"지원하지 않는 기간 단위입니다: {granularity}")
+        fits = await battery_trend_crud.get_forecast_fits(db, granularity)
+        return {"threshold": threshold, "granularity": granularity, "summary": summarize_by_car_type(fits, threshold)}
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"데이터베이스 오류: {str(e)}")
+
+@router.post("/forecast/refresh")
+async def refresh_soh_forecast():
+    """전체 차량 SOH 열화 예측을 백그라운드에서 다시 계산 (관리자용) - 월간 뷰 새로고침 후에는 자동 실행"""
+    if soh_forecaster.trigger():
+        return {"status": "success", "message": "SOH 예측 계산을 시작했습니다."}
+    return {"status": "skipped", "message": "이미 SOH 예측 계산이 진행 중입니다."}
+
+@router.get("/forecast/status")
+async def get_soh_forecast_status():
+    """SOH 예측 작업 상태 (마지막 실행 시각, 결과, 오류)"""
+    return soh_forecaster.status()
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, HTTPException, Request
+import asyncpg
+from ...services.ingest import (
+    IngestBackpressureError, bw_data_ingestor, parse_arrow, parse_ndjson
+)
+
+router = APIRouter(prefix="/ingest", tags=["ingest"])
+
+ARROW_STREAM_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+ARROW_FILE_CONTENT_TYPE = "application/vnd.apache.arrow.file"
+ARROW_CONTENT_TYPES = (ARROW_STREAM_CONTENT_TYPE, ARROW_FILE_CONTENT_TYPE)
+
+@router.post("/bw-data")
+async def ingest_bw_data(request: Request):
+    """bw_data 대량 적재 - NDJSON 또는 Arrow IPC 스트림/파일 본문을 binary COPY로 적재"""
+    content_type = request.headers.get("content-type", "application/x-ndjson").split(";")[0].strip()
+    body = await request.body()
+    
+    try:
+        if content_type in ARROW_CONTENT_TYPES:
+            rows = parse_arrow(body, file_format=content_type == ARROW_FILE_CONTENT_TYPE)
+        else:
+            rows = parse_ndjson(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        result = await bw_data_ingestor.submit(rows)
+    except IngestBackpressureError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except (asyncpg.DataError, asyncpg.IntegrityConstraintViolationError) as e:
+        # 이 요청의 행이 컬럼 길이/제약 조건을 위반 (같은 배치의 다른 요청은 정상 적재)
+        raise HTTPException(status_code=400, detail=f"적재 실패: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"적재 실패: {str(e)}")
+    
+    return {**result, "rows_per_second": round(bw_data_ingestor.rows_per_second(), 1)}
+
+@router.get("/stats")
+async def get_ingest_stats():
+    """적재 처리량 및 대기열 상태 조회"""
+    return bw_data_ingestor.stats()
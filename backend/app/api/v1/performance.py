@@ -1,49 +1,193 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 import asyncpg
-from typing import List
-from ...database.base import get_db
+import numpy as np
+from typing import List, Optional
+from ...database.base import get_db, get_db_pool
 from ...crud import bw_data as bw_data_crud
-from ...schemas.bw_data import BwDataResponse, BwDataFilter
+from ...crud import rollup as rollup_crud
+from ...crud import partitions as partitions_crud
+from ...crud.cursor import next_bw_data_cursor
+from ...schemas.bw_data import BwDataResponse, BwDataFilter, bw_data_projection_adapter
+from ...services.export import STREAM_MEDIA_TYPES, encode_records, streaming_export_response
+from ...services.downsample import downsample_series
+from ...services.fastjson import FastJSONResponse
+from ...services.rollup_refresh import rollup_refresher
+from ...services.partition_maintenance import partition_maintainer
 
 router = APIRouter(prefix="/performance", tags=["performance"])
 
+FIELDS_DESCRIPTION = "조회할 컬럼 (콤마 구분, 예: soc,speed) - clientid, timestamp는 항상 포함"
+
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """fields 쿼리 파라미터 검증 (허용되지 않은 컬럼이면 400)"""
+    if not fields:
+        return None
+    try:
+        return bw_data_crud.parse_columns(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/data", response_model=List[BwDataResponse])
 async def get_performance_data(
+    response: Response,
     clientid: str = Query(None, description="차량 ID"),
     start_date: str = Query(None, description="시작 날짜 (YYYY-MM-DD)"),
     end_date: str = Query(None, description="종료 날짜 (YYYY-MM-DD)"),
     limit: int = Query(1000, ge=1, le=10000),
+    cursor: str = Query(None, description="이전 응답의 X-Next-Cursor 값 (keyset 페이지네이션)"),
+    format: str = Query("json", pattern="^(json|arrow|parquet)$", description="응답 형식: json, arrow(IPC 스트림) 또는 parquet"),
+    fields: str = Query(None, description=FIELDS_DESCRIPTION),
+    fast: bool = Query(False, description="true면 응답 모델 검증 없이 레코드를 orjson으로 바로 직렬화"),
     db: asyncpg.Connection = Depends(get_db)
 ):
-    """성능 데이터 조회"""
+    """성능 데이터 조회 - 다음 페이지 커서는 X-Next-Cursor 헤더로 반환"""
     from datetime import datetime
     
+    selected = _parse_fields(fields)
+    if fast and not selected:
+        # SELECT *는 응답 모델에 없는 컬럼까지 가져올 수 있으므로 모델 컬럼만 명시적으로 조회
+        selected = bw_data_crud.BW_DATA_NUMERIC_COLUMNS
     start_dt = datetime.fromisoformat(start_date) if start_date else None
     end_dt = datetime.fromisoformat(end_date) if end_date else None
     
-    data = await bw_data_crud.get_bw_data_filtered(
-        db, 
-        clientid=clientid, 
-        start_date=start_dt, 
-        end_date=end_dt, 
-        limit=limit
-    )
-    return data
+    try:
+        rows = await bw_data_crud.fetch_bw_data_filtered(
+            db, 
+            clientid=clientid, 
+            start_date=start_dt, 
+            end_date=end_dt, 
+            limit=limit,
+            cursor=cursor,
+            fields=selected
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    next_cursor = next_bw_data_cursor(rows, limit)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    if format != "json":
+        # 컬럼 형식은 pydantic 검증/행 단위 dict 변환 없이 레코드에서 바로 인코딩
+        return Response(encode_records(rows, format), media_type=STREAM_MEDIA_TYPES[format], headers=headers)
+    
+    if fast:
+        return FastJSONResponse(rows, headers=headers)
+    
+    if selected:
+        # 요청 컬럼만 가진 축소 응답 모델로 검증/직렬화
+        adapter = bw_data_projection_adapter(tuple(rows[0].keys()) if rows else tuple(selected))
+        body = adapter.dump_json(adapter.validate_python([dict(row) for row in rows]))
+        return Response(body, media_type="application/json", headers=headers)
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [dict(row) for row in rows]
 
 @router.get("/data/{clientid}")
 async def get_vehicle_performance_data(
     clientid: str,
     limit: int = Query(1000, ge=1, le=10000),
+    skip: int = Query(0, ge=0, description="건너뛸 행 수 (하위 호환용, cursor 사용 권장)"),
+    cursor: str = Query(None, description="이전 응답의 next_cursor 값 (keyset 페이지네이션)"),
+    points: int = Query(None, ge=3, le=5000, description="지정 시 컬럼별 LTTB 다운샘플링 점 개수"),
+    columns: str = Query("speed,soc,pack_v", description="다운샘플링 대상 컬럼 (콤마 구분)"),
+    start_date: str = Query(None, description="다운샘플링 시작 시각 (ISO 8601)"),
+    end_date: str = Query(None, description="다운샘플링 종료 시각 (ISO 8601)"),
+    fields: str = Query(None, description=FIELDS_DESCRIPTION),
     db: asyncpg.Connection = Depends(get_db)
 ):
-    """특정 차량의 성능 데이터 조회"""
-    data = await bw_data_crud.get_bw_data_by_client(db, clientid=clientid, limit=limit)
+    """특정 차량의 성능 데이터 조회 - points 지정 시 차트용 다운샘플링 시계열 반환"""
+    if points:
+        return await _get_downsampled_series(db, clientid, points, columns, start_date, end_date)
+    
+    try:
+        data = await bw_data_crud.get_bw_data_by_client(
+            db, clientid=clientid, skip=skip, limit=limit, cursor=cursor, fields=_parse_fields(fields)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {
         "clientid": clientid,
         "total_records": len(data),
+        "next_cursor": next_bw_data_cursor(data, limit),
         "data": data
     }
 
+async def _get_downsampled_series(db: asyncpg.Connection, clientid: str, points: int,
+                                  columns: str, start_date: str, end_date: str):
+    """LTTB 다운샘플링 시계열 응답 구성"""
+    from datetime import datetime
+    
+    try:
+        selected = bw_data_crud.parse_columns(columns, bw_data_crud.BW_DATA_NUMERIC_COLUMNS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    start_dt = datetime.fromisoformat(start_date) if start_date else None
+    end_dt = datetime.fromisoformat(end_date) if end_date else None
+    
+    # 긴 구간은 원본 대신 SQL/롤업 버킷 평균에 LTTB를 적용하므로 처리량이 기록 길이와 무관
+    rows, bucket_seconds = await bw_data_crud.get_bw_data_series(db, clientid, selected, start_dt, end_dt)
+    timestamps = [row[0] for row in rows]
+    values = np.array([tuple(row)[1:] for row in rows], dtype=np.float64).reshape(len(rows), len(selected))
+    
+    return {
+        "clientid": clientid,
+        "total_records": len(rows),
+        "bucket_seconds": bucket_seconds,
+        "points": min(points, len(rows)),
+        "series": downsample_series(timestamps, values, selected, points)
+    }
+
+@router.get("/batch")
+async def get_multi_vehicle_performance_data(
+    clientids: List[str] = Query(..., description="차량 ID 목록 (반복 지정 또는 콤마 구분)"),
+    start_date: str = Query(None, description="시작 시각 (ISO 8601)"),
+    end_date: str = Query(None, description="종료 시각 (ISO 8601)"),
+    limit_per_vehicle: int = Query(1000, ge=1, le=10000, description="차량별 최대 행 수"),
+    fields: str = Query(None, description=FIELDS_DESCRIPTION),
+    strategy: str = Query("auto", pattern="^(auto|single|concurrent)$",
+                          description="single: ANY/LATERAL 단일 쿼리, concurrent: 차량별 동시 조회, auto: 예상 행 수로 선택"),
+    max_concurrency: int = Query(4, ge=1, le=8, description="concurrent 전략의 최대 동시 쿼리 수"),
+):
+    """여러 차량의 성능 데이터를 한 번에 조회 - 차량별로 묶어서 반환"""
+    from datetime import datetime
+    
+    ids = list(dict.fromkeys(cid.strip() for value in clientids for cid in value.split(",") if cid.strip()))
+    if not ids:
+        raise HTTPException(status_code=400, detail="최소 한 개 이상의 차량 ID가 필요합니다.")
+    if len(ids) > 100:
+        raise HTTPException(status_code=400, detail="한 번에 최대 100대까지 조회할 수 있습니다.")
+    
+    selected = _parse_fields(fields)
+    start_dt = datetime.fromisoformat(start_date) if start_date else None
+    end_dt = datetime.fromisoformat(end_date) if end_date else None
+    
+    # 결과가 작으면 단일 쿼리가 왕복 비용이 적고, 크면 여러 연결로 나눠 병렬 처리하는 편이 빠름
+    if strategy == "auto":
+        strategy = "concurrent" if len(ids) > 1 and len(ids) * limit_per_vehicle > 20000 else "single"
+    
+    # get_db 의존성을 쓰지 않음: concurrent 전략이 쉬는 연결을 잡은 채 풀에서 더 가져가면 교착 가능
+    pool = await get_db_pool()
+    if strategy == "single":
+        async with pool.acquire() as db:
+            grouped = await bw_data_crud.get_bw_data_multi(
+                db, ids, start_dt, end_dt, limit_per_vehicle, selected
+            )
+    else:
+        grouped = await bw_data_crud.get_bw_data_multi_concurrent(
+            pool, ids, start_dt, end_dt, limit_per_vehicle, selected, max_concurrency
+        )
+    
+    return {
+        "strategy": strategy,
+        "vehicle_count": len(ids),
+        "total_records": sum(len(rows) for rows in grouped.values()),
+        "vehicles": {
+            cid: {"total_records": len(rows), "data": rows}
+            for cid, rows in grouped.items()
+        }
+    }
+
 @router.get("/stats/{clientid}")
 async def get_vehicle_stats(clientid: str, db: asyncpg.Connection = Depends(get_db)):
     """특정 차량의 통계 정보 조회"""
@@ -53,15 +197,103 @@ async def get_vehicle_stats(clientid: str, db: asyncpg.Connection = Depends(get_
         "stats": stats
     }
 
+@router.get("/rollup")
+async def get_rollup_stats(
+    clientid: str = Query(None, description="차량 ID (미지정 시 전체 차량)"),
+    start_date: str = Query(None, description="시작 시각 (ISO 8601, 포함)"),
+    end_date: str = Query(None, description="종료 시각 (ISO 8601, 미포함)"),
+    resolution: str = Query(None, pattern="^(minute|hour|day)$", description="지정 시 해당 해상도의 버킷 시계열 포함"),
+    db: asyncpg.Connection = Depends(get_db)
+):
+    """롤업 기반 구간 집계 - 구간을 덮는 가장 거친 롤업부터 사용"""
+    from datetime import datetime
+    
+    start_dt = datetime.fromisoformat(start_date) if start_date else None
+    end_dt = datetime.fromisoformat(end_date) if end_date else None
+    
+    agg = await rollup_crud.get_rollup_aggregates(db, clientid, start_dt, end_dt)
+    if agg is None:
+        raise HTTPException(
+            status_code=404,
+            detail="bw_data 롤업이 아직 구성되지 않았습니다. /performance/rollup/refresh를 먼저 실행하세요."
+        )
+    
+    result = {"clientid": clientid, "start_date": start_dt, "end_date": end_dt, **agg}
+    if resolution:
+        result["series"] = await rollup_crud.get_rollup_series(db, resolution, clientid, start_dt, end_dt)
+    return result
+
+@router.post("/rollup/refresh")
+async def refresh_rollups(db: asyncpg.Connection = Depends(get_db)):
+    """bw_data 롤업 증분 갱신 (관리자용)"""
+    try:
+        return await rollup_crud.refresh_rollups(db)
+    except Exception as e:
+        return {"status": "error", "message": f"롤업 갱신 실패: {str(e)}"}
+
+@router.get("/rollup/status")
+async def get_rollup_status():
+    """롤업 주기 갱신 상태 (마지막 실행 시각, 결과, 오류)"""
+    return rollup_refresher.status()
+
+@router.get("/partitions")
+async def get_partitions(db: asyncpg.Connection = Depends(get_db)):
+    """bw_data 파티션 목록 조회"""
+    return {
+        "partitioned": await partitions_crud.is_partitioned(db),
+        "partitions": await partitions_crud.list_partitions(db),
+        "maintenance": partition_maintainer.status()
+    }
+
 @router.get("/recent")
 async def get_recent_performance_data(
     hours: int = Query(24, ge=1, le=168),
+    fields: str = Query(None, description=FIELDS_DESCRIPTION),
     db: asyncpg.Connection = Depends(get_db)
 ):
     """최근 N시간 동안의 성능 데이터 조회"""
-    data = await bw_data_crud.get_recent_bw_data(db, hours=hours)
+    data = await bw_data_crud.get_recent_bw_data(db, hours=hours, fields=_parse_fields(fields))
     return {
         "hours": hours,
         "total_records": len(data),
         "data": data
     }
+
+@router.get("/export/data")
+async def export_performance_data(
+    request: Request,
+    clientid: str = Query(None, description="차량 ID"),
+    start_date: str = Query(None, description="시작 날짜 (YYYY-MM-DD)"),
+    end_date: str = Query(None, description="종료 날짜 (YYYY-MM-DD)"),
+    limit: int = Query(None, ge=1, description="최대 행 수 (미지정 시 전체)"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv|arrow|parquet)$", description="내보내기 형식: ndjson, csv, arrow 또는 parquet"),
+    fields: str = Query(None, description=FIELDS_DESCRIPTION),
+):
+    """성능 데이터 스트리밍 내보내기 - 서버 측 커서로 배치 단위 전송"""
+    from datetime import datetime
+    
+    selected = _parse_fields(fields)
+    start_dt = datetime.fromisoformat(start_date) if start_date else None
+    end_dt = datetime.fromisoformat(end_date) if end_date else None
+    
+    def source(conn):
+        return bw_data_crud.iter_bw_data_filtered(
+            conn, clientid=clientid, start_date=start_dt, end_date=end_dt, limit=limit, fields=selected
+        )
+    
+    return streaming_export_response(source, format, "bw_data", request)
+
+@router.get("/export/recent")
+async def export_recent_performance_data(
+    request: Request,
+    hours: int = Query(24, ge=1, le=168),
+    format: str = Query("ndjson", pattern="^(ndjson|csv|arrow|parquet)$", description="내보내기 형식: ndjson, csv, arrow 또는 parquet"),
+    fields: str = Query(None, description=FIELDS_DESCRIPTION),
+):
+    """최근 N시간 성능 데이터 스트리밍 내보내기"""
+    selected = _parse_fields(fields)
+    
+    def source(conn):
+        return bw_data_crud.iter_recent_bw_data(conn, hours=hours, fields=selected)
+    
+    return streaming_export_response(source, format, f"bw_data_recent_{hours}h", request)
@@ -1,9 +1,9 @@
 from .bw_data import get_bw_data, get_bw_data_by_client, get_bw_data_stats
 from .car_type import get_car_types, get_car_type_by_id, create_car_type
-from .analytics import get_bw_dashboard_data, get_client_vehicles_info, get_available_car_types, refresh_bw_dashboard_view, get_bw_dashboard_status
+from .analytics import get_bw_dashboard_data, get_client_vehicles_info, get_available_car_types, get_bw_dashboard_status
 
 __all__ = [
     "get_bw_data", "get_bw_data_by_client", "get_bw_data_stats",
     "get_car_types", "get_car_type_by_id", "create_car_type",
-    "get_bw_dashboard_data", "get_client_vehicles_info", "get_available_car_types", "refresh_bw_dashboard_view", "get_bw_dashboard_status"
+    "get_bw_dashboard_data", "get_client_vehicles_info", "get_available_car_types", "get_bw_dashboard_status"
 ]
@@ -1,7 +1,20 @@
+import asyncio
 import asyncpg
 from typing import Dict, Any, List, Optional
 import math
+import os
+from .segments import SEGMENT_ENERGY_TABLE, SEGMENT_STATES_TABLE, energy_table_exists
+from . import row_counts as row_counts_crud
+from . import views as views_crud
+from .cursor import (
+    decode_client_vehicles_cursor, decode_ranking_cursor,
+    encode_client_vehicles_cursor, encode_ranking_cursor,
+)
+from ..services.cache import cached_view
+from ..services.rank_index import RankIndex
+from ..services.scoring import ScoringEngine
 
+@cached_view("bw_dashboard")
 async def get_bw_dashboard_data(db: asyncpg.Connection) -> Dict[str, Any]:
     """BW 대시보드 데이터 조회 - bw_dashboard 뷰 사용"""
     try:
@@ -48,23 +61,100 @@ async def get_bw_dashboard_data(db: asyncpg.Connection) -> Dict[str, Any]:
         print(f"BW Dashboard 데이터 조회 오류: {e}")
         raise Exception(f"BW Dashboard 데이터 조회 실패: {str(e)}")
 
-async def get_client_vehicles_info(db: asyncpg.Connection, car_type: Optional[str] = None, limit: int = 15, offset: int = 0) -> Dict[str, Any]:
-    """Client ID별 차량 정보 조회 - bw_vehicle_status 뷰 사용"""
+# 랭킹 인덱스는 뷰 새로고침 시 무효화되므로 TTL은 외부에서 뷰를 새로고침한 경우에 대비한 상한
+RANK_INDEX_TTL_SECONDS = float(os.getenv("BW_RANK_INDEX_TTL_SECONDS", "3600"))
+
+# bw_vehicle_status 정렬 키: Unknown 연식은 뒤로, 연식 내림차순, client_id 오름차순
+# (뷰는 차량당 한 행이므로 client_id까지로 순서가 유일하게 정해짐)
+VEHICLE_STATUS_SORT_FLAG = "(CASE WHEN model_year_month = 'Unknown' THEN 1 ELSE 0 END)"
+
+VEHICLE_STATUS_INDEXES = {
+    "ix_bw_vehicle_status_sort":
+        f"({VEHICLE_STATUS_SORT_FLAG}, model_year_month DESC, client_id)",
+    "ix_bw_vehicle_status_car_type_sort":
+        f"(car_type, {VEHICLE_STATUS_SORT_FLAG}, model_year_month DESC, client_id)",
+}
+
+_vehicle_status_indexes_ready = False
+
+async def ensure_vehicle_status_indexes(db: asyncpg.Connection) -> bool:
+    """정렬 식과 같은 식 인덱스 생성 - ORDER BY/keyset 조건이 인덱스 순서대로 읽히도록 함
+
+    앱 시작 시 한 번 실행하며, 조회를 막지 않도록 CONCURRENTLY로 만든다 (트랜잭션 밖에서 호출).
+    머티리얼라이즈드 뷰의 인덱스는 REFRESH 후에도 유지되므로 성공하면 프로세스당 다시 확인하지 않는다.
+    """
+    global _vehicle_status_indexes_ready
+    if _vehicle_status_indexes_ready:
+        return True
+    try:
+        # 이전에 중단된 CONCURRENTLY 생성이 남긴 INVALID 인덱스는 IF NOT EXISTS에 걸리므로 먼저 제거
+        invalid = await db.fetch("""
+            SELECT c.relname
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE i.indrelid = 'bw_vehicle_status'::regclass
+              AND NOT i.indisvalid
+              AND c.relname = ANY($1::text[])
+        """, list(VEHICLE_STATUS_INDEXES))
+        for row in invalid:
+            await db.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {row['relname']}")
+        for name, columns in VEHICLE_STATUS_INDEXES.items():
+            await db.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON bw_vehicle_status {columns}")
+    except Exception as e:
+        # 권한이 없는 계정이면 인덱스 없이 동작 (다음 시작 시 다시 시도)
+        print(f"bw_vehicle_status 인덱스 생성 실패: {e}")
+        return False
+    _vehicle_status_indexes_ready = True
+    return True
+
+@cached_view("bw_vehicle_status")
+async def get_client_vehicle_counts(db: asyncpg.Connection) -> Dict[str, int]:
+    """차종별 차량 수 ("전체" 포함) - 뷰 새로고침 시 캐시 무효화"""
+    rows = await db.fetch("""
+        SELECT car_type, COUNT(*) AS count
+        FROM bw_vehicle_status
+        GROUP BY car_type
+    """)
+    counts = {row["car_type"]: row["count"] for row in rows if row["car_type"] is not None}
+    counts["전체"] = sum(row["count"] for row in rows)
+    return counts
+
+async def get_client_vehicles_info(db: asyncpg.Connection, car_type: Optional[str] = None, limit: int = 15,
+                                   offset: int = 0, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """Client ID별 차량 정보 조회 - bw_vehicle_status 뷰 사용
+
+    cursor가 있으면 정렬 키 기준 keyset 페이지네이션(O(page size)), 없으면 OFFSET 방식.
+    전체 개수는 차종별로 캐시된 값을 사용한다.
+    """
     try:
         # 차종 필터링
-        where_clause = ""
+        conditions = []
         params = []
         
         # 차종 필터링
         if car_type and car_type != "전체":
-            where_clause = "WHERE car_type = $1"
             params.append(car_type)
-        
-        # 전체 개수 조회
-        count_query = f"SELECT COUNT(*) FROM bw_vehicle_status {where_clause}"
-        total_count = await db.fetchval(count_query, *params)
-        
-        # 페이지네이션된 데이터 조회
+            conditions.append(f"car_type = ${len(params)}")
+        
+        # 전체 개수 (캐시)
+        counts = await get_client_vehicle_counts(db)
+        total_count = counts.get(car_type if car_type and car_type != "전체" else "전체", 0)
+        
+        if cursor:
+            key = decode_client_vehicles_cursor(cursor)
+            params.extend([key["flag"], key["model_year_month"], key["client_id"]])
+            f, m, c = (f"${len(params) - 2}", f"${len(params) - 1}", f"${len(params)}")
+            # 앞의 sort_flag >= 조건은 중복이지만 인덱스 범위 조건으로 쓰여,
+            # OR 조건만 있을 때처럼 앞 페이지의 행을 모두 읽고 건너뛰지 않게 한다
+            conditions.append(f"""{VEHICLE_STATUS_SORT_FLAG} >= {f} AND (
+                {VEHICLE_STATUS_SORT_FLAG} > {f}
+                OR ({VEHICLE_STATUS_SORT_FLAG} = {f} AND model_year_month < {m})
+                OR ({VEHICLE_STATUS_SORT_FLAG} = {f} AND model_year_month = {m} AND client_id > {c})
+            )""")
+            offset = 0
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        # 페이지네이션된 데이터 조회 (다음 페이지 여부 확인용으로 1행 더 조회)
         data_query = f"""
         SELECT 
             client_id,
@@ -77,22 +167,20 @@ async def get_client_vehicles_info(db: asyncpg.Connection, car_type: Optional[st
             avg_segment_time,
             last_activity,
             total_activity_seconds,
-            avg_segment_duration_seconds
+            avg_segment_duration_seconds,
+            {VEHICLE_STATUS_SORT_FLAG} AS sort_flag
         FROM bw_vehicle_status
         {where_clause}
         ORDER BY 
-            CASE 
-                WHEN model_year_month = 'Unknown' THEN 1
-                ELSE 0
-            END,
+            {VEHICLE_STATUS_SORT_FLAG},
             model_year_month DESC,
-            client_id ASC,
-            total_segments DESC, 
-            valid_segments DESC
+            client_id ASC
         LIMIT ${len(params) + 1} OFFSET ${len(params) + 2}
         """
         
-        rows = await db.fetch(data_query, *params, limit, offset)
+        rows = await db.fetch(data_query, *params, limit + 1, offset)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
         
         # 응답 데이터 구성
         vehicles = []
@@ -116,6 +204,7 @@ async def get_client_vehicles_info(db: asyncpg.Connection, car_type: Optional[st
         
         # 페이지네이션 정보 계산
         total_pages = math.ceil(total_count / limit) if total_count > 0 else 0
+        last = rows[-1] if rows else None
         
         return {
             'data': vehicles,
@@ -123,16 +212,22 @@ async def get_client_vehicles_info(db: asyncpg.Connection, car_type: Optional[st
                 'total_count': total_count,
                 'current_offset': offset,
                 'current_limit': limit,
-                'has_more': offset + limit < total_count,
-                'next_offset': offset + limit if offset + limit < total_count else None,
+                'has_more': has_more,
+                'next_offset': offset + limit if has_more and not cursor else None,
+                'next_cursor': encode_client_vehicles_cursor(
+                    last['sort_flag'], last['model_year_month'], last['client_id']
+                ) if has_more else None,
                 'total_pages': total_pages
             }
         }
         
+    except ValueError:
+        raise
     except Exception as e:
         print(f"Client vehicles 조회 오류: {e}")
         raise Exception(f"Client vehicles 조회 실패: {str(e)}")
 
+@cached_view("bw_vehicle_status")
 async def get_available_car_types(db: asyncpg.Connection) -> List[str]:
     """사용 가능한 차종 목록 조회"""
     try:
@@ -149,22 +244,14 @@ async def get_available_car_types(db: asyncpg.Connection) -> List[str]:
         print(f"Car types 조회 오류: {e}")
         return ["전체"]
 
-async def refresh_bw_dashboard_view(db: asyncpg.Connection) -> Dict[str, str]:
-    """bw_dashboard materialized view 새로고침"""
-    try:
-        await db.execute("REFRESH MATERIALIZED VIEW bw_dashboard")
-        return {"status": "success", "message": "bw_dashboard 뷰가 성공적으로 새로고침되었습니다."}
-    except Exception as e:
-        return {"status": "error", "message": f"뷰 새로고침 실패: {str(e)}"}
-
 async def get_bw_dashboard_status(db: asyncpg.Connection) -> Dict[str, Any]:
     """bw_dashboard 뷰 상태 확인"""
     try:
-        # 뷰 존재 여부 확인
+        # 뷰 존재 여부 확인 (materialized view는 information_schema.views에 나오지 않음)
         view_exists = await db.fetchval("""
             SELECT EXISTS (
-                SELECT 1 FROM information_schema.views 
-                WHERE table_name = 'bw_dashboard'
+                SELECT 1 FROM pg_matviews 
+                WHERE matviewname = 'bw_dashboard'
             )
         """)
         
@@ -175,22 +262,19 @@ async def get_bw_dashboard_status(db: asyncpg.Connection) -> Dict[str, Any]:
                     "view_exists": False
                 }
             
-        # 관련 테이블 레코드 수 확인
-        bw_data_count = await db.fetchval("SELECT COUNT(*) FROM bw_data")
-        bw_segments_count = await db.fetchval("SELECT COUNT(*) FROM bw_segments")
-        bw_segment_states_count = await db.fetchval("SELECT COUNT(*) FROM bw_segment_states")
-        car_type_count = await db.fetchval("SELECT COUNT(*) FROM car_type")
+        # 관련 테이블 레코드 수 - 즉시 반환되는 플래너 추정치 (정확한 값은 백그라운드 집계 결과)
+        estimates = await row_counts_crud.get_estimated_row_counts(db, row_counts_crud.DASHBOARD_COUNT_TABLES)
         
         return {
             "status": "success",
             "message": "bw_dashboard 뷰가 정상적으로 존재합니다.",
             "view_exists": True,
-            "table_counts": {
-                "bw_data": bw_data_count,
-                "bw_segments": bw_segments_count,
-                "bw_segment_states": bw_segment_states_count,
-                "car_type": car_type_count
-            }
+            "table_counts": {table: estimates.get(table) for table in row_counts_crud.DASHBOARD_COUNT_TABLES},
+            "table_counts_source": "estimate",
+            # 마지막으로 집계한 정확한 행 수와 집계 시각
+            "exact_counts": await row_counts_crud.get_exact_row_counts(db),
+            # 뷰별 마지막 새로고침 성공 시각/소요 시간
+            "view_refresh": await views_crud.get_refresh_log(db)
         }
         
     except Exception as e:
@@ -207,8 +291,83 @@ STATE_CODE_TO_TYPE = {
     4: "parked",
 }
 
-def _state_to_type(state_code: int) -> str:
-    return STATE_CODE_TO_TYPE.get(state_code, "other")
+async def _energy_join(db: asyncpg.Connection) -> str:
+    """구간(s)에 적분 에너지(e)를 붙이는 조인 - 에너지 테이블이 없으면 NULL 컬럼만 가진 서브쿼리"""
+    if await energy_table_exists(db):
+        return f"LEFT JOIN {SEGMENT_ENERGY_TABLE} e ON e.clientid = s.clientid AND e.start_time = s.start_time"
+    return (
+        "LEFT JOIN (SELECT NULL::varchar AS clientid, NULL::double precision AS energy_consumed_wh, "
+        "NULL::double precision AS energy_charged_wh, NULL::double precision AS efficiency_wh_per_km) e ON FALSE"
+    )
+
+async def get_segment_heads(db: asyncpg.Connection) -> Dict[str, int]:
+    """차량별 마지막 구간 번호 (마지막 구간은 아직 늘어날 수 있음)"""
+    rows = await db.fetch(f"""
+        SELECT clientid, MAX(segment_id) AS last_id
+        FROM {SEGMENT_STATES_TABLE}
+        GROUP BY clientid
+    """)
+    return {row["clientid"]: row["last_id"] for row in rows}
+
+async def get_driving_segment_metrics(db: asyncpg.Connection, clientids: List[str],
+                                      after_ids: List[int], before_ids: List[int]) -> List[asyncpg.Record]:
+    """차량별 (after_id, before_id) 범위 주행 구간의 SOC/km, Wh/km - 분포 스케치 증분 갱신용"""
+    energy_join = await _energy_join(db)
+    return await db.fetch(f"""
+        SELECT
+            COALESCE(ct.car_type, 'Unknown') AS car_type,
+            CASE WHEN s.mileage_change > 0 THEN -s.soc_change / s.mileage_change END AS soc_per_km,
+            e.efficiency_wh_per_km
+        FROM unnest($1::varchar[], $2::bigint[], $3::bigint[]) AS w(clientid, after_id, before_id)
+        JOIN {SEGMENT_STATES_TABLE} s
+          ON s.clientid = w.clientid AND s.segment_id > w.after_id AND s.segment_id < w.before_id
+        LEFT JOIN car_type ct ON ct.clientid = s.clientid
+        {energy_join}
+        WHERE s.state_code = 2
+    """, clientids, after_ids, before_ids)
+
+_SEGMENT_TYPE_SQL = "CASE s.state_code " + " ".join(
+    f"WHEN {code} THEN '{name}'" for code, name in STATE_CODE_TO_TYPE.items()
+) + " ELSE 'other' END"
+
+async def get_vehicle_segments_records(
+    db: asyncpg.Connection,
+    clientid: str,
+    data_type: str = "mileage"
+) -> List[asyncpg.Record]:
+    """차량 구간 레코드 - segment_type까지 SQL에서 만들어 그대로 직렬화할 수 있는 형태"""
+    extra_filter = (
+        "AND s.start_mileage IS NOT NULL AND s.end_mileage IS NOT NULL"
+        if data_type == "mileage"
+        else "AND s.start_soc IS NOT NULL AND s.end_soc IS NOT NULL"
+    )
+
+    # 에너지는 배치 엔진이 미리 적분해 둔 값을 조인 (요청 시 원본 샘플 계산 없음)
+    sql = f"""
+        SELECT
+            s.start_time                         AS segment_start_time,
+            s.end_time                           AS segment_end_time,
+            ROUND(s.duration_seconds/60.0, 1)    AS segment_duration_minutes,
+            s.start_mileage, 
+            s.end_mileage, 
+            (s.end_mileage - s.start_mileage)    AS mileage_change,
+            s.start_soc, 
+            s.end_soc, 
+            (s.end_soc - s.start_soc)            AS soc_change,
+            s.max_speed,
+            s.avg_speed,
+            s.engine_on_percentage,
+            s.avg_chg_state,
+            e.energy_consumed_wh,
+            e.efficiency_wh_per_km,
+            {_SEGMENT_TYPE_SQL} AS segment_type
+        FROM {SEGMENT_STATES_TABLE} s
+        {await _energy_join(db)}
+        WHERE s.clientid = $1
+          {extra_filter}
+        ORDER BY s.start_time;
+    """
+    return await db.fetch(sql, clientid)
 
 async def get_vehicle_segments_data(
     db: asyncpg.Connection, 
@@ -221,44 +380,12 @@ async def get_vehicle_segments_data(
     - data_type="soc":     SOC 정보가 유효한 세그먼트만
     """
     try:
-        extra_filter = (
-            "AND start_mileage IS NOT NULL AND end_mileage IS NOT NULL"
-            if data_type == "mileage"
-            else "AND start_soc IS NOT NULL AND end_soc IS NOT NULL"
-        )
-
-        sql = f"""
-            SELECT
-                start_time                           AS segment_start_time,
-                end_time                             AS segment_end_time,
-                ROUND(duration_seconds/60.0, 1)      AS segment_duration_minutes,
-                state_code,
-                start_mileage, 
-                end_mileage, 
-                (end_mileage - start_mileage)        AS mileage_change,
-                start_soc, 
-                end_soc, 
-                (end_soc - start_soc)                AS soc_change,
-                max_speed,
-                avg_speed,
-                engine_on_percentage,
-                avg_chg_state
-            FROM bw_segment_states
-            WHERE clientid = $1
-              {extra_filter}
-            ORDER BY start_time;
-        """
-
-        rows = await db.fetch(sql, clientid)
+        rows = await get_vehicle_segments_records(db, clientid, data_type)
         print(f"DB에서 조회된 원본 데이터: {len(rows)}개 행")
 
-        # state_code → segment_type 문자열로 변환
         result: List[Dict[str, Any]] = []
         for r in rows:
             d = dict(r)
-            original_state_code = d.get("state_code")
-            d["segment_type"] = _state_to_type(d.pop("state_code", None))
-            print(f"state_code {original_state_code} → segment_type {d['segment_type']}")
             
             # ISO8601 문자열이 필요하면 아래처럼 변환 (asyncpg는 보통 datetime으로 줌)
             if hasattr(d["segment_start_time"], "isoformat"):
@@ -325,97 +452,108 @@ async def get_vehicle_segments_data(
         
         return dummy_data
 
-async def get_vehicle_summary(db: asyncpg.Connection, clientid: str) -> Dict[str, Any]:
+async def _vehicle_summary_query(db: asyncpg.Connection, ids_sql: str) -> str:
+    """차량별 요약을 한 번의 스캔으로 집계하는 SQL (ids_sql: clientid 한 컬럼을 돌려주는 쿼리)
+
+    기본 요약, 주행 효율(SoC/km, Wh/km), 상태별 구간 수를 FILTER 절로 같은 행들에서 함께 계산하고
+    차종 정보는 car_type과 조인한다.
     """
-    특정 차량의 요약 정보 조회
-    - 세그먼트 개수, 유효 세그먼트(길이>0), 총/평균 지속시간, 마지막 활동,
-    - 총 주행거리(세그먼트 합) 및 평균 주행 효율(SoC per km: 주행 세그먼트만)
+    driving_moved = "s.state_code = 2 AND s.end_mileage - s.start_mileage > 0"
+    return f"""
+        WITH ids AS ({ids_sql}),
+        agg AS (
+            SELECT
+                s.clientid                                              AS agg_clientid,
+                COUNT(*)::int                                           AS total_segments,
+                COUNT(*) FILTER (WHERE s.duration_seconds > 0)::int     AS valid_segments,
+                SUM(s.duration_seconds)/3600.0                          AS total_duration_hours,
+                AVG(s.duration_seconds)/60.0                            AS avg_duration_min,
+                MAX(s.end_time)                                         AS last_activity,
+                -- 주행거리: 세그먼트별 이동거리 합(음수 방지)
+                SUM(GREATEST(s.end_mileage - s.start_mileage, 0))       AS total_mileage,
+                -- 주행 효율(SoC per km): 주행 세그먼트만, km당 소모 SOC 비율
+                AVG(ABS(s.end_soc - s.start_soc)::float / (s.end_mileage - s.start_mileage))
+                    FILTER (WHERE {driving_moved}
+                            AND s.start_soc IS NOT NULL AND s.end_soc IS NOT NULL) AS avg_soc_per_km,
+                -- 에너지 효율(Wh/km): 에너지가 계산된 주행 세그먼트의 순소비 에너지 합 / 주행거리 합
+                SUM(e.energy_consumed_wh)                               AS total_energy_consumed_wh,
+                SUM(e.energy_consumed_wh - e.energy_charged_wh) FILTER (WHERE {driving_moved})
+                / NULLIF(SUM(s.end_mileage - s.start_mileage)
+                    FILTER (WHERE {driving_moved} AND e.clientid IS NOT NULL), 0) AS avg_wh_per_km,
+                COUNT(*) FILTER (WHERE s.state_code = 1)::int           AS charging_count,
+                COUNT(*) FILTER (WHERE s.state_code = 2)::int           AS driving_count,
+                COUNT(*) FILTER (WHERE s.state_code = 3)::int           AS idling_count,
+                COUNT(*) FILTER (WHERE s.state_code = 4)::int           AS parked_count,
+                COUNT(*) FILTER (WHERE s.state_code = 9)::int           AS other_count
+            FROM {SEGMENT_STATES_TABLE} s
+            {await _energy_join(db)}
+            WHERE s.clientid IN (SELECT clientid FROM ids)
+            GROUP BY s.clientid
+        )
+        SELECT ids.clientid, ct.car_type, ct.model_year, agg.*
+        FROM ids
+        LEFT JOIN agg ON agg.agg_clientid = ids.clientid
+        LEFT JOIN car_type ct ON ct.clientid = ids.clientid
+        ORDER BY ids.clientid
     """
-    try:
-        # 기본 요약
-        summary_sql = """
-            WITH base AS (
-                SELECT
-                    COUNT(*)::int                                         AS total_segments,
-                    COUNT(*) FILTER (WHERE duration_seconds > 0)::int     AS valid_segments,
-                    SUM(duration_seconds)/3600.0                          AS total_duration_hours,
-                    AVG(duration_seconds)/60.0                            AS avg_duration_min,
-                    MAX(end_time)                                         AS last_activity,
-                    -- 주행거리: 세그먼트별 이동거리 합(음수 방지)
-                    SUM(GREATEST(end_mileage - start_mileage, 0))         AS total_mileage
-                FROM bw_segment_states
-                WHERE clientid = $1
-            )
-            SELECT * FROM base;
-        """
-        base = await db.fetchrow(summary_sql, clientid)
 
-        # 주행 효율(SoC per km): 주행 세그먼트만, km당 소모 SOC 비율
-        eff_sql = """
-            SELECT
-                AVG(
-                    CASE 
-                        WHEN state_code = 2 
-                             AND (end_mileage - start_mileage) > 0 
-                             AND (start_soc IS NOT NULL AND end_soc IS NOT NULL)
-                        THEN ABS(end_soc - start_soc)::float 
-                             / NULLIF(end_mileage - start_mileage, 0)
-                    END
-                ) AS avg_soc_per_km
-            FROM bw_segment_states
-            WHERE clientid = $1;
-        """
-        eff = await db.fetchrow(eff_sql, clientid)
+def _optional_float(value) -> Optional[float]:
+    return float(value) if value is not None else None
 
-        # 구간 종류별 수량 조회
-        segment_counts_sql = """
-            SELECT state_code, COUNT(*) as count
-            FROM bw_segment_states
-            WHERE clientid = $1
-            GROUP BY state_code
-            ORDER BY state_code;
-        """
-        segment_counts = await db.fetch(segment_counts_sql, clientid)
-        
-        # 구간 종류별 수량을 딕셔너리로 변환
-        segment_counts_dict = {}
-        for row in segment_counts:
-            state_code = row['state_code']
-            count = row['count']
-            segment_counts_dict[state_code] = count
-
-        # 차량 메타 정보 조회
-        car_info_sql = """
-            SELECT car_type, model_year
-            FROM car_type
-            WHERE clientid = $1
-        """
-        car_info = await db.fetchrow(car_info_sql, clientid)
+def _vehicle_summary_from_row(row) -> Dict[str, Any]:
+    """요약 SQL 결과 한 행을 응답 dict로 변환 (구간이 없는 차량은 0)"""
+    return {
+        "clientid": row["clientid"],
+        "car_type": row["car_type"],
+        "model_year": row["model_year"],
 
-        return {
-            "clientid": clientid,
-            "car_type": car_info["car_type"] if car_info else None,
-            "model_year": car_info["model_year"] if car_info else None,
-
-            "total_segments": base["total_segments"] if base else 0,
-            "valid_segments": base["valid_segments"] if base else 0,
-            "total_duration_hours": float(base["total_duration_hours"]) if base and base["total_duration_hours"] is not None else 0.0,
-            "avg_duration_min": float(base["avg_duration_min"]) if base and base["avg_duration_min"] is not None else 0.0,
-            "last_activity": base["last_activity"].isoformat() if base and base["last_activity"] else None,
-            "total_mileage": float(base["total_mileage"]) if base and base["total_mileage"] is not None else 0.0,
-
-            # BY_MILEAGE 뷰의 주행효율 정의와 동일한 개념(주행 세그먼트 기준)
-            "avg_soc_per_km": float(eff["avg_soc_per_km"]) if eff and eff["avg_soc_per_km"] is not None else None,
-
-            # 구간 종류별 수량 (state_code: 1=충전, 2=주행, 3=정차, 4=주차, 9=기타)
-            "segment_counts": {
-                "charging": segment_counts_dict.get(1, 0),    # 충전
-                "driving": segment_counts_dict.get(2, 0),     # 주행
-                "idling": segment_counts_dict.get(3, 0),      # 정차
-                "parked": segment_counts_dict.get(4, 0),      # 주차
-                "other": segment_counts_dict.get(9, 0)        # 기타
-            }
+        "total_segments": row["total_segments"] or 0,
+        "valid_segments": row["valid_segments"] or 0,
+        "total_duration_hours": _optional_float(row["total_duration_hours"]) or 0.0,
+        "avg_duration_min": _optional_float(row["avg_duration_min"]) or 0.0,
+        "last_activity": row["last_activity"].isoformat() if row["last_activity"] else None,
+        "total_mileage": _optional_float(row["total_mileage"]) or 0.0,
+
+        # BY_MILEAGE 뷰의 주행효율 정의와 동일한 개념(주행 세그먼트 기준)
+        "avg_soc_per_km": _optional_float(row["avg_soc_per_km"]),
+
+        # 구간 에너지 적분 결과 (에너지 미계산 시 None)
+        "total_energy_consumed_wh": _optional_float(row["total_energy_consumed_wh"]),
+        "avg_wh_per_km": _optional_float(row["avg_wh_per_km"]),
+
+        # 구간 종류별 수량 (state_code: 1=충전, 2=주행, 3=정차, 4=주차, 9=기타)
+        "segment_counts": {
+            "charging": row["charging_count"] or 0,    # 충전
+            "driving": row["driving_count"] or 0,      # 주행
+            "idling": row["idling_count"] or 0,        # 정차
+            "parked": row["parked_count"] or 0,        # 주차
+            "other": row["other_count"] or 0           # 기타
         }
+    }
+
+async def get_vehicle_summaries(db: asyncpg.Connection, clientids: Optional[List[str]] = None,
+                                car_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    """여러 차량(clientid 목록 또는 차종 전체)의 요약 정보를 한 번의 그룹 쿼리로 조회"""
+    if clientids:
+        ids_sql, params = "SELECT DISTINCT unnest($1::varchar[]) AS clientid", [clientids]
+    elif car_type:
+        ids_sql, params = "SELECT clientid FROM car_type WHERE car_type = $1", [car_type]
+    else:
+        raise ValueError("clientid 목록 또는 car_type 중 하나는 필요합니다.")
+    rows = await db.fetch(await _vehicle_summary_query(db, ids_sql), *params)
+    return [_vehicle_summary_from_row(row) for row in rows]
+
+async def get_vehicle_summary(db: asyncpg.Connection, clientid: str) -> Dict[str, Any]:
+    """
+    특정 차량의 요약 정보 조회 (단일 쿼리)
+    - 세그먼트 개수, 유효 세그먼트(길이>0), 총/평균 지속시간, 마지막 활동,
+    - 총 주행거리(세그먼트 합) 및 평균 주행 효율(SoC per km: 주행 세그먼트만)
+    """
+    try:
+        row = await db.fetchrow(
+            await _vehicle_summary_query(db, "SELECT $1::varchar AS clientid"), clientid
+        )
+        return _vehicle_summary_from_row(row)
         
     except Exception as e:
         print(f"차량 요약 정보 조회 오류: {e}")
@@ -433,105 +571,144 @@ async def get_vehicle_summary(db: asyncpg.Connection, clientid: str) -> Dict[str
             'avg_efficiency_wh_per_km': 185.3
         }
 
-async def get_battery_performance_ranking(db: asyncpg.Connection, limit: int = 50, offset: int = 0) -> Dict[str, Any]:
-    """배터리 성능 랭킹 조회"""
+def _ranking_from_row(row) -> Dict[str, Any]:
+    """battery_performance_ranking 행 → 응답 항목"""
+    return {
+        'clientid': row['clientid'],
+        'car_type': row['car_type'] or 'Unknown',
+        'model_year': row['model_year'] or 0,
+        'scores': {
+            'soh': row['soh_total_score'],
+            'cell_balance': row['cell_total_score'],
+            'driving_efficiency': row['driving_total_score'],
+            'charging_efficiency': row['charging_total_score'],
+            'temperature_stability': row['temp_total_score'],
+            'charging_habit': row['habit_total_score'],
+            'total': row['total_battery_score']
+        },
+        'rank': row['battery_rank'],
+        'grade': row['battery_grade'],
+        'metrics': {
+            'avg_soh': float(row['avg_soh']) if row['avg_soh'] else None,
+            'avg_cell_imbalance': float(row['avg_cell_imbalance']) if row['avg_cell_imbalance'] else None,
+            'avg_soc_per_km': float(row['avg_soc_per_km']) if row['avg_soc_per_km'] else None,
+            'slow_power_efficiency': float(row['slow_power_efficiency']) if row['slow_power_efficiency'] else None,
+            'fast_power_efficiency': float(row['fast_power_efficiency']) if row['fast_power_efficiency'] else None,
+            'avg_temp_range': float(row['avg_temp_range']) if row['avg_temp_range'] else None,
+            'avg_start_soc': float(row['avg_start_soc']) if row['avg_start_soc'] else None,
+            'avg_end_soc': float(row['avg_end_soc']) if row['avg_end_soc'] else None
+        },
+        'data_quality': {
+            'soh_records': row['soh_records'],
+            'driving_segments': row['driving_segments'],
+            'charge_sessions': row['total_charge_sessions']
+        }
+    }
+
+@cached_view("battery_performance_ranking", ttl=RANK_INDEX_TTL_SECONDS)
+async def get_battery_ranking_index(db: asyncpg.Connection) -> RankIndex:
+    """배터리 성능 랭킹 정렬 인덱스 - 뷰 새로고침 시 캐시가 무효화되어 다음 요청에서 다시 만든다"""
+    rows = await db.fetch("""
+    SELECT 
+        clientid,
+        car_type,
+        model_year,
+        soh_total_score,
+        cell_total_score,
+        driving_total_score,
+        charging_total_score,
+        temp_total_score,
+        habit_total_score,
+        total_battery_score,
+        battery_rank,
+        battery_grade,
+        avg_soh,
+        avg_cell_imbalance,
+        avg_soc_per_km,
+        slow_power_efficiency,
+        fast_power_efficiency,
+        avg_temp_range,
+        avg_start_soc,
+        avg_end_soc,
+        soh_records,
+        driving_segments,
+        total_charge_sessions
+    FROM battery_performance_ranking
+    """)
+    return RankIndex([_ranking_from_row(row) for row in rows])
+
+async def get_battery_performance_ranking(db: asyncpg.Connection, limit: int = 50, offset: int = 0,
+                                          cursor: Optional[str] = None) -> Dict[str, Any]:
+    """배터리 성능 랭킹 조회 - 메모리 정렬 인덱스 사용
+
+    정렬: total_battery_score DESC, battery_rank ASC, clientid ASC.
+    cursor가 있으면 keyset 페이지네이션, 없으면 offset 방식.
+    """
     try:
-        print(f"배터리 성능 랭킹 조회 시작 - limit: {limit}, offset: {offset}")
-        
-        # 전체 개수 조회
-        count_query = "SELECT COUNT(*) FROM battery_performance_ranking"
-        print(f"카운트 쿼리 실행: {count_query}")
-        total_count = await db.fetchval(count_query)
-        print(f"전체 개수: {total_count}")
-        
-        # 페이지네이션된 데이터 조회
-        data_query = """
-        SELECT 
-            clientid,
-            car_type,
-            model_year,
-            soh_total_score,
-            cell_total_score,
-            driving_total_score,
-            charging_total_score,
-            temp_total_score,
-            habit_total_score,
-            total_battery_score,
-            battery_rank,
-            battery_grade,
-            avg_soh,
-            avg_cell_imbalance,
-            avg_soc_per_km,
-            slow_power_efficiency,
-            fast_power_efficiency,
-            avg_temp_range,
-            avg_start_soc,
-            avg_end_soc,
-            soh_records,
-            driving_segments,
-            total_charge_sessions
-        FROM battery_performance_ranking
-        ORDER BY total_battery_score DESC, battery_rank ASC
-        LIMIT $1 OFFSET $2
-        """
-        
-        rows = await db.fetch(data_query, limit, offset)
-        
-        # 응답 데이터 구성
-        rankings = []
-        for row in rows:
-            ranking = {
-                'clientid': row['clientid'],
-                'car_type': row['car_type'] or 'Unknown',
-                'model_year': row['model_year'] or 0,
-                'scores': {
-                    'soh': row['soh_total_score'],
-                    'cell_balance': row['cell_total_score'],
-                    'driving_efficiency': row['driving_total_score'],
-                    'charging_efficiency': row['charging_total_score'],
-                    'temperature_stability': row['temp_total_score'],
-                    'charging_habit': row['habit_total_score'],
-                    'total': row['total_battery_score']
-                },
-                'rank': row['battery_rank'],
-                'grade': row['battery_grade'],
-                'metrics': {
-                    'avg_soh': float(row['avg_soh']) if row['avg_soh'] else None,
-                    'avg_cell_imbalance': float(row['avg_cell_imbalance']) if row['avg_cell_imbalance'] else None,
-                    'avg_soc_per_km': float(row['avg_soc_per_km']) if row['avg_soc_per_km'] else None,
-                    'slow_power_efficiency': float(row['slow_power_efficiency']) if row['slow_power_efficiency'] else None,
-                    'fast_power_efficiency': float(row['fast_power_efficiency']) if row['fast_power_efficiency'] else None,
-                    'avg_temp_range': float(row['avg_temp_range']) if row['avg_temp_range'] else None,
-                    'avg_start_soc': float(row['avg_start_soc']) if row['avg_start_soc'] else None,
-                    'avg_end_soc': float(row['avg_end_soc']) if row['avg_end_soc'] else None
-                },
-                'data_quality': {
-                    'soh_records': row['soh_records'],
-                    'driving_segments': row['driving_segments'],
-                    'charge_sessions': row['total_charge_sessions']
-                }
-            }
-            rankings.append(ranking)
-        
-        # 페이지네이션 정보 계산
-        total_pages = math.ceil(total_count / limit) if total_count > 0 else 0
+        index = await get_battery_ranking_index(db)
+        after = decode_ranking_cursor(cursor) if cursor else None
+        start, rankings = index.page(limit, offset, after)
+        total_count = len(index)
+        has_more = start + len(rankings) < total_count
+        last = rankings[-1] if rankings else None
         
         return {
             'data': rankings,
             'pagination': {
                 'total_count': total_count,
-                'current_offset': offset,
+                'current_offset': start,
                 'current_limit': limit,
-                'has_more': offset + limit < total_count,
-                'next_offset': offset + limit if offset + limit < total_count else None,
-                'total_pages': total_pages
+                'has_more': has_more,
+                'next_offset': start + limit if has_more else None,
+                'next_cursor': encode_ranking_cursor(
+                    last['scores']['total'], last['rank'], last['clientid']
+                ) if has_more else None,
+                'total_pages': index.total_pages(limit)
             }
         }
         
+    except ValueError:
+        raise
     except Exception as e:
         print(f"배터리 성능 랭킹 조회 오류: {e}")
         raise Exception(f"배터리 성능 랭킹 조회 실패: {str(e)}")
 
+@cached_view("battery_performance_ranking", ttl=RANK_INDEX_TTL_SECONDS)
+async def get_battery_scoring_engine(db: asyncpg.Connection) -> ScoringEngine:
+    """랭킹 인덱스의 영역 점수로 만든 채점 엔진 - 인덱스와 함께 뷰 새로고침 시 다시 만든다"""
+    index = await get_battery_ranking_index(db)
+    return await asyncio.to_thread(ScoringEngine, index.items)
+
+async def get_battery_ranking_what_if(db: asyncpg.Connection, weights: Dict[str, Optional[float]],
+                                      limit: int = 50, offset: int = 0) -> Dict[str, Any]:
+    """영역별 가중치를 바꿔 전체 차량을 다시 채점한 랭킹 (DB 조회 없이 메모리에서 계산)"""
+    engine = await get_battery_scoring_engine(db)
+    result = engine.score(weights)
+    total_count = len(engine)
+    has_more = offset + limit < total_count
+    return {
+        'weights': {name: round(weight, 4) for name, weight in result['weights'].items()},
+        'data': engine.ranked_items(result, limit, offset),
+        'pagination': {
+            'total_count': total_count,
+            'current_offset': offset,
+            'current_limit': limit,
+            'has_more': has_more,
+            'next_offset': offset + limit if has_more else None,
+            'total_pages': math.ceil(total_count / limit) if total_count > 0 else 0
+        },
+        'elapsed_ms': round(result['elapsed_ms'], 3)
+    }
+
+async def get_battery_ranking_position(db: asyncpg.Connection, clientid: str, window: int = 5) -> Optional[Dict[str, Any]]:
+    """특정 차량의 랭킹 위치/백분위와 위아래 window개 이웃 (랭킹에 없으면 None)"""
+    index = await get_battery_ranking_index(db)
+    position = index.lookup(clientid)
+    if position is None:
+        return None
+    return {**position, **index.neighbors(clientid, window)}
+
+@cached_view("battery_performance_ranking")
 async def get_battery_performance_ranking_summary(db: asyncpg.Connection) -> Dict[str, Any]:
     """배터리 성능 랭킹 요약 통계 조회"""
     try:
@@ -586,11 +763,11 @@ async def get_battery_performance_ranking_summary(db: asyncpg.Connection) -> Dic
 async def get_vehicle_segments_count(db: asyncpg.Connection, clientid: str) -> Dict[str, int]:
     """특정 차량의 실제 구간 수 조회"""
     try:
-        sql = """
+        sql = f"""
             SELECT 
                 COUNT(CASE WHEN state_code = 2 THEN 1 END) as driving_segments,
                 COUNT(CASE WHEN state_code = 1 THEN 1 END) as charge_sessions
-            FROM bw_segment_states
+            FROM {SEGMENT_STATES_TABLE}
             WHERE clientid = $1
         """
         
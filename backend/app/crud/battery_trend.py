@@ -0,0 +1,534 @@
+import os
+import time
+
+import asyncpg
+from typing import List, Optional, Dict, Any
+from ..services.cache import cached_view, session_trend_cache, view_cache
+
+# 기간 단위별 eSOH 뷰 정보 (뷰 이름, 기간 컬럼, 이동평균 컬럼, 조회 컬럼)
+TREND_SOURCES: Dict[str, Dict[str, Any]] = {
+    "monthly": {
+        "view": "bw_esoh_monthly",
+        "period": "month",
+        "value": "monthly_p20_esoh",
+        "ma": "p20_ma3",
+        "delta": "delta_1m",
+        "columns": ["month", "monthly_p20_esoh", "p20_ma3", "delta_1m", "n_sessions"],
+    },
+    "weekly": {
+        "view": "bw_esoh_weekly",
+        "period": "week_start",
+        "value": "weekly_p20_esoh",
+        "ma": "p20_ma4",
+        "delta": "delta_1w",
+        "columns": ["week_start", "weekly_p20_esoh", "p20_ma4", "delta_1w", "n_sessions"],
+    },
+}
+
+TREND_INDEX_TABLE = "bw_esoh_trend_index"
+LATEST_SNAPSHOT_TABLE = "bw_esoh_latest_snapshot"
+SOH_FORECAST_TABLE = "bw_soh_forecast"
+
+# 세션 단위 eSOH 원본 (기간 뷰들의 공통 입력) - 임의 기간 단위 추세를 뷰 없이 계산할 때 사용
+ESOH_SESSION_TABLE = os.getenv("BW_ESOH_SESSION_TABLE", "bw_esoh_sessions")
+ESOH_SESSION_TIME_COLUMN = os.getenv("BW_ESOH_SESSION_TIME_COLUMN", "start_time")
+ESOH_SESSION_VALUE_COLUMN = os.getenv("BW_ESOH_SESSION_VALUE_COLUMN", "esoh")
+# 기간 단위(date_trunc 필드)별 기본 이동평균 창 - month/week는 기존 뷰(p20_ma3, p20_ma4)와 같음
+TREND_BUCKETS = {"day": 7, "week": 4, "month": 3, "quarter": 2}
+MAX_MA_WINDOW = 52
+
+# 추세 판정 기본값: 최소 기간 수, 기울기 부호 (decreasing: 감소 추세)
+MIN_TREND_PERIODS = 6
+DEFAULT_TREND_DIRECTION = "decreasing"
+TREND_DIRECTIONS = {
+    "decreasing": "i.slope < 0",
+    "increasing": "i.slope > 0",
+    "any": "i.slope IS NOT NULL",
+}
+
+# 추세 인덱스/최신 스냅샷을 뷰에서 다시 맞추는 주기 상한 (뷰를 앱 밖에서 새로고침한 경우 대비, 0이면 비어 있을 때만 생성)
+TREND_DERIVED_TTL_SECONDS = float(os.getenv("BW_TREND_DERIVED_TTL_SECONDS", "3600"))
+
+# 기간 단위별 마지막 갱신 시각 (time.monotonic, 프로세스 단위)
+_trend_index_built_at: Dict[str, float] = {}
+_latest_snapshot_built_at: Dict[str, float] = {}
+
+
+def _needs_rebuild(built_at: Dict[str, float], granularity: str) -> bool:
+    """이 프로세스에서 갱신한 적이 없거나 TTL이 지났으면 True"""
+    last = built_at.get(granularity)
+    if last is None:
+        return True
+    return TREND_DERIVED_TTL_SECONDS > 0 and time.monotonic() - last >= TREND_DERIVED_TTL_SECONDS
+
+
+async def _ensure_derived_built(db: asyncpg.Connection, granularity: str, built_at: Dict[str, float],
+                                table: str, ensure, refresh) -> None:
+    """파생 테이블이 비었거나 TTL이 지났으면 뷰에서 다시 갱신 (바뀐 차량만 기록)
+
+    갱신 중 들어온 요청은 기존 내용을 그대로 읽도록 시작 시각을 먼저 기록하고, 실패하면 되돌린다.
+    """
+    if not _needs_rebuild(built_at, granularity):
+        return
+    previous = built_at.get(granularity)
+    built_at[granularity] = time.monotonic()
+    try:
+        if previous is None and TREND_DERIVED_TTL_SECONDS <= 0:
+            await ensure(db)
+            built = await db.fetchval(
+                f"SELECT EXISTS (SELECT 1 FROM {table} WHERE granularity = $1)", granularity
+            )
+            if built:
+                return
+        await refresh(db, granularity)
+    except BaseException:
+        if previous is None:
+            built_at.pop(granularity, None)
+        else:
+            built_at[granularity] = previous
+        raise
+
+
+async def ensure_trend_index(db: asyncpg.Connection) -> None:
+    """차량별 eSOH 추세 인덱스 테이블 생성 (없을 때만)
+
+    기간 컬럼 타입이 뷰마다 다를 수 있어 first/last_period는 텍스트로 저장한다.
+    """
+    await db.execute(f"""
+    CREATE TABLE IF NOT EXISTS {TREND_INDEX_TABLE} (
+        granularity TEXT NOT NULL,
+        clientid VARCHAR(50) NOT NULL,
+        n INTEGER NOT NULL,
+        n_points INTEGER NOT NULL,
+        slope DOUBLE PRECISION,
+        intercept DOUBLE PRECISION,
+        first_period TEXT,
+        last_period TEXT,
+        updated_at TIMESTAMP NOT NULL DEFAULT now(),
+        PRIMARY KEY (granularity, clientid)
+    )
+    """)
+    await db.execute(
+        f"CREATE INDEX IF NOT EXISTS ix_{TREND_INDEX_TABLE}_eligibility ON {TREND_INDEX_TABLE} (granularity, slope, n)"
+    )
+
+
+def _trend_index_refresh_sql(granularity: str) -> str:
+    """뷰 한 번 집계로 차량별 n, REGR_SLOPE/INTERCEPT를 구해 바뀐 행만 갱신하고 사라진 차량은 삭제"""
+    source = TREND_SOURCES[granularity]
+    return f"""
+        WITH base AS (
+          SELECT
+            b.clientid,
+            b.{source['period']} AS period,
+            b.{source['ma']} AS y,
+            ROW_NUMBER() OVER (PARTITION BY b.clientid ORDER BY b.{source['period']}) AS period_seq
+          FROM {source['view']} b
+        ),
+        agg AS (
+          SELECT
+            clientid,
+            COUNT(*) AS n,
+            REGR_COUNT(y, period_seq) AS n_points,
+            REGR_SLOPE(y, period_seq) AS slope,
+            REGR_INTERCEPT(y, period_seq) AS intercept,
+            MIN(period)::text AS first_period,
+            MAX(period)::text AS last_period
+          FROM base
+          GROUP BY clientid
+        ),
+        upserted AS (
+          INSERT INTO {TREND_INDEX_TABLE} AS i
+            (granularity, clientid, n, n_points, slope, intercept, first_period, last_period)
+          SELECT $1, clientid, n, n_points, slope, intercept, first_period, last_period
+          FROM agg
+          ON CONFLICT (granularity, clientid) DO UPDATE SET
+            n = EXCLUDED.n,
+            n_points = EXCLUDED.n_points,
+            slope = EXCLUDED.slope,
+            intercept = EXCLUDED.intercept,
+            first_period = EXCLUDED.first_period,
+            last_period = EXCLUDED.last_period,
+            updated_at = now()
+          WHERE (i.n, i.n_points, i.slope, i.intercept, i.first_period, i.last_period)
+                IS DISTINCT FROM
+                (EXCLUDED.n, EXCLUDED.n_points, EXCLUDED.slope, EXCLUDED.intercept,
+                 EXCLUDED.first_period, EXCLUDED.last_period)
+          RETURNING 1
+        ),
+        removed AS (
+          DELETE FROM {TREND_INDEX_TABLE} i
+          WHERE i.granularity = $1
+            AND NOT EXISTS (SELECT 1 FROM agg a WHERE a.clientid = i.clientid)
+          RETURNING 1
+        )
+        SELECT
+          (SELECT COUNT(*) FROM agg) AS vehicles,
+          (SELECT COUNT(*) FROM upserted) AS changed,
+          (SELECT COUNT(*) FROM removed) AS removed
+    """
+
+
+async def refresh_trend_index(db: asyncpg.Connection, granularity: str = "monthly") -> Dict[str, Any]:
+    """eSOH 뷰에서 추세 인덱스 갱신 - 값이 바뀐 차량만 다시 기록"""
+    await ensure_trend_index(db)
+    row = await db.fetchrow(_trend_index_refresh_sql(granularity), granularity)
+    _trend_index_built_at[granularity] = time.monotonic()
+    return {"granularity": granularity, **dict(row)}
+
+
+async def ensure_latest_snapshot(db: asyncpg.Connection) -> None:
+    """차량별 최신 기간 eSOH 스냅샷 테이블 생성 (없을 때만)"""
+    await db.execute(f"""
+    CREATE TABLE IF NOT EXISTS {LATEST_SNAPSHOT_TABLE} (
+        granularity TEXT NOT NULL,
+        clientid VARCHAR(50) NOT NULL,
+        latest_period TEXT NOT NULL,
+        p20_esoh DOUBLE PRECISION,
+        p20_ma DOUBLE PRECISION,
+        delta DOUBLE PRECISION,
+        n_sessions BIGINT,
+        updated_at TIMESTAMP NOT NULL DEFAULT now(),
+        PRIMARY KEY (granularity, clientid)
+    )
+    """)
+
+
+def _latest_snapshot_refresh_sql(granularity: str) -> str:
+    """DISTINCT ON으로 차량별 최신 기간 행만 골라 바뀐 행만 갱신하고 사라진 차량은 삭제"""
+    source = TREND_SOURCES[granularity]
+    return f"""
+        WITH latest AS (
+          SELECT DISTINCT ON (b.clientid)
+            b.clientid,
+            b.{source['period']}::text AS latest_period,
+            b.{source['value']}::double precision AS p20_esoh,
+            b.{source['ma']}::double precision AS p20_ma,
+            b.{source['delta']}::double precision AS delta,
+            b.n_sessions::bigint AS n_sessions
+          FROM {source['view']} b
+          ORDER BY b.clientid, b.{source['period']} DESC
+        ),
+        upserted AS (
+          INSERT INTO {LATEST_SNAPSHOT_TABLE} AS l
+            (granularity, clientid, latest_period, p20_esoh, p20_ma, delta, n_sessions)
+          SELECT $1, clientid, latest_period, p20_esoh, p20_ma, delta, n_sessions
+          FROM latest
+          ON CONFLICT (granularity, clientid) DO UPDATE SET
+            latest_period = EXCLUDED.latest_period,
+            p20_esoh = EXCLUDED.p20_esoh,
+            p20_ma = EXCLUDED.p20_ma,
+            delta = EXCLUDED.delta,
+            n_sessions = EXCLUDED.n_sessions,
+            updated_at = now()
+          WHERE (l.latest_period, l.p20_esoh, l.p20_ma, l.delta, l.n_sessions)
+                IS DISTINCT FROM
+                (EXCLUDED.latest_period, EXCLUDED.p20_esoh, EXCLUDED.p20_ma, EXCLUDED.delta, EXCLUDED.n_sessions)
+          RETURNING 1
+        ),
+        removed AS (
+          DELETE FROM {LATEST_SNAPSHOT_TABLE} l
+          WHERE l.granularity = $1
+            AND NOT EXISTS (SELECT 1 FROM latest x WHERE x.clientid = l.clientid)
+          RETURNING 1
+        )
+        SELECT
+          (SELECT COUNT(*) FROM latest) AS vehicles,
+          (SELECT COUNT(*) FROM upserted) AS changed,
+          (SELECT COUNT(*) FROM removed) AS removed
+    """
+
+
+async def refresh_latest_snapshot(db: asyncpg.Connection, granularity: str = "monthly") -> Dict[str, Any]:
+    """eSOH 뷰에서 차량별 최신 기간 스냅샷 갱신 후 요약 캐시 무효화"""
+    await ensure_latest_snapshot(db)
+    row = await db.fetchrow(_latest_snapshot_refresh_sql(granularity), granularity)
+    _latest_snapshot_built_at[granularity] = time.monotonic()
+    view_cache.invalidate(LATEST_SNAPSHOT_TABLE)
+    return {"granularity": granularity, **dict(row)}
+
+
+def trend_refresh_hook(granularity: str):
+    """eSOH 뷰 새로고침 후 실행할 파생 테이블 갱신 함수 (ViewRefreshScheduler.on_refresh용)"""
+    async def refresh_derived(db: asyncpg.Connection) -> Dict[str, Any]:
+        # eSOH 뷰가 새로고침되었다면 세션 테이블도 갱신된 것이므로 세션 추세 캐시도 비운다
+        session_trend_cache.invalidate(ESOH_SESSION_TABLE)
+        return {
+            "trend_index": await refresh_trend_index(db, granularity),
+            "latest_snapshot": await refresh_latest_snapshot(db, granularity)
+        }
+    refresh_derived.__name__ = f"refresh_{granularity}_trend_derived"
+    return refresh_derived
+
+
+async def _ensure_trend_index_built(db: asyncpg.Connection, granularity: str) -> None:
+    """추세 인덱스가 비었거나 TREND_DERIVED_TTL_SECONDS가 지났으면 뷰에서 다시 갱신"""
+    await _ensure_derived_built(db, granularity, _trend_index_built_at, TREND_INDEX_TABLE,
+                                ensure_trend_index, refresh_trend_index)
+
+
+def _check_trend_params(granularity: str, direction: str) -> None:
+    if granularity not in TREND_SOURCES:
+        raise ValueError(f"지원하지 않는 기간 단위입니다: {granularity}")
+    if direction not in TREND_DIRECTIONS:
+        raise ValueError(f"지원하지 않는 추세 방향입니다: {direction} (지원: {', '.join(TREND_DIRECTIONS)})")
+
+
+# 쿼리 문자열을 모듈 상수로 고정해 두면 asyncpg가 연결별로 prepared statement를 캐시해 재사용한다
+_VEHICLES_QUERY = {
+    direction: f"""
+        SELECT DISTINCT i.clientid, ct.car_type
+        FROM {TREND_INDEX_TABLE} i
+        LEFT JOIN car_type ct ON i.clientid = ct.clientid
+        WHERE i.granularity = $1
+          AND i.n >= $2
+          AND {condition}
+        ORDER BY i.clientid
+    """
+    for direction, condition in TREND_DIRECTIONS.items()
+}
+
+_ELIGIBILITY_QUERY = {
+    direction: f"""
+        SELECT i.clientid, i.n, i.slope, i.intercept, i.last_period
+        FROM {TREND_INDEX_TABLE} i
+        WHERE i.granularity = $1
+          AND i.clientid = $2
+          AND i.n >= $3
+          AND {condition}
+    """
+    for direction, condition in TREND_DIRECTIONS.items()
+}
+
+_TREND_DATA_QUERY = {
+    granularity: f"""
+        SELECT {', '.join(source['columns'])}
+        FROM {source['view']}
+        WHERE clientid = $1
+        ORDER BY {source['period']}
+    """
+    for granularity, source in TREND_SOURCES.items()
+}
+
+
+async def get_trend_car_types(db: asyncpg.Connection) -> List[Dict[str, Any]]:
+    """bw_esoh_monthly 뷰에 데이터가 있는 차량들의 car_type 목록"""
+    rows = await db.fetch("""
+        SELECT DISTINCT ct.car_type
+        FROM bw_esoh_monthly bem
+        JOIN car_type ct ON bem.clientid = ct.clientid
+        WHERE ct.car_type IS NOT NULL
+        GROUP BY ct.car_type
+        ORDER BY ct.car_type
+    """)
+    return [dict(row) for row in rows]
+
+
+async def get_trend_vehicles(db: asyncpg.Connection, granularity: str = "monthly",
+                             min_periods: int = MIN_TREND_PERIODS,
+                             direction: str = DEFAULT_TREND_DIRECTION) -> List[Dict[str, Any]]:
+    """추세 인덱스에서 min_periods 이상 데이터가 있고 기울기 조건을 만족하는 차량 목록"""
+    _check_trend_params(granularity, direction)
+    await _ensure_trend_index_built(db, granularity)
+    rows = await db.fetch(_VEHICLES_QUERY[direction], granularity, min_periods)
+    return [dict(row) for row in rows]
+
+
+async def get_trend_eligibility(db: asyncpg.Connection, clientid: str, granularity: str = "monthly",
+                                min_periods: int = MIN_TREND_PERIODS,
+                                direction: str = DEFAULT_TREND_DIRECTION) -> Optional[Dict[str, Any]]:
+    """차량의 기간 수/기울기 (추세 인덱스 조회) - 조건을 만족하지 않으면 None"""
+    _check_trend_params(granularity, direction)
+    await _ensure_trend_index_built(db, granularity)
+    row = await db.fetchrow(_ELIGIBILITY_QUERY[direction], granularity, clientid, min_periods)
+    return dict(row) if row else None
+
+
+async def get_trend_data(db: asyncpg.Connection, clientid: str,
+                         granularity: str = "monthly") -> List[Dict[str, Any]]:
+    """차량의 기간별 p20 eSOH, 이동평균, 변화량"""
+    rows = await db.fetch(_TREND_DATA_QUERY[granularity], clientid)
+    return [dict(row) for row in rows]
+
+
+async def _ensure_latest_snapshot_built(db: asyncpg.Connection, granularity: str) -> None:
+    """최신 스냅샷이 비었거나 TREND_DERIVED_TTL_SECONDS가 지났으면 뷰에서 다시 갱신"""
+    await _ensure_derived_built(db, granularity, _latest_snapshot_built_at, LATEST_SNAPSHOT_TABLE,
+                                ensure_latest_snapshot, refresh_latest_snapshot)
+
+
+@cached_view(LATEST_SNAPSHOT_TABLE, "car_type")
+async def get_battery_trend_summary(db: asyncpg.Connection, granularity: str = "monthly") -> List[Dict[str, Any]]:
+    """차종별 최신 기간 eSOH 요약 - 차량별 최신 스냅샷 테이블 집계 (스냅샷 갱신 시 캐시 무효화)"""
+    if granularity not in TREND_SOURCES:
+        raise ValueError(f"지원하지 않는 기간 단위입니다: {granularity}")
+    await _ensure_latest_snapshot_built(db, granularity)
+    ma_alias = f"avg_{TREND_SOURCES[granularity]['ma'].split('_')[-1]}"
+    rows = await db.fetch(f"""
+        SELECT
+            ct.car_type,
+            COUNT(*) as vehicle_count,
+            ROUND(AVG(l.p20_esoh)::numeric, 2) as avg_esoh,
+            ROUND(AVG(l.p20_ma)::numeric, 2) as {ma_alias},
+            ROUND(AVG(l.delta)::numeric, 3) as avg_delta
+        FROM {LATEST_SNAPSHOT_TABLE} l
+        JOIN car_type ct ON l.clientid = ct.clientid
+        WHERE l.granularity = $1
+          AND ct.car_type IS NOT NULL
+          AND ct.model_year IS NOT NULL
+        GROUP BY ct.car_type
+        ORDER BY ct.car_type
+    """, granularity)
+    return [dict(row) for row in rows]
+
+
+async def get_esoh_series(db: asyncpg.Connection, granularity: str = "monthly") -> List[asyncpg.Record]:
+    """전체 차량의 기간별 p20 eSOH - 차량/기간 순 정렬
+
+    이동평균은 인접 기간이 겹쳐 잔차가 자기상관되고 기울기 표준오차가 과소 추정되므로 회귀에는 원값을 쓴다.
+    """
+    source = TREND_SOURCES[granularity]
+    return await db.fetch(f"""
+        SELECT
+            clientid,
+            {source['period']} AS period,
+            {source['value']}::double precision AS esoh
+        FROM {source['view']}
+        WHERE {source['value']} IS NOT NULL
+        ORDER BY clientid, {source['period']}
+    """)
+
+
+_FORECAST_COLUMNS = [
+    "granularity", "clientid", "n", "origin_date", "x_mean", "y_mean", "slope_per_day", "slope_se",
+    "residual_std", "last_date", "last_value", "threshold", "eol_date", "eol_low", "eol_high", "status",
+]
+
+
+async def ensure_forecast_table(db: asyncpg.Connection) -> None:
+    """차량별 SOH 열화 회귀 결과와 EOL 예측 테이블 생성 (없을 때만)
+
+    x_mean은 origin_date로부터의 일수, slope_per_day는 하루당 eSOH 변화 [%p/day].
+    """
+    await db.execute(f"""
+    CREATE TABLE IF NOT EXISTS {SOH_FORECAST_TABLE} (
+        granularity TEXT NOT NULL,
+        clientid VARCHAR(50) NOT NULL,
+        n INTEGER NOT NULL,
+        origin_date DATE NOT NULL,
+        x_mean DOUBLE PRECISION,
+        y_mean DOUBLE PRECISION,
+        slope_per_day DOUBLE PRECISION,
+        slope_se DOUBLE PRECISION,
+        residual_std DOUBLE PRECISION,
+        last_date DATE,
+        last_value DOUBLE PRECISION,
+        threshold DOUBLE PRECISION NOT NULL,
+        eol_date DATE,
+        eol_low DATE,
+        eol_high DATE,
+        status TEXT NOT NULL,
+        fitted_at TIMESTAMP NOT NULL DEFAULT now(),
+        PRIMARY KEY (granularity, clientid)
+    )
+    """)
+
+
+async def save_forecasts(db: asyncpg.Connection, granularity: str, records: List[tuple]) -> Dict[str, int]:
+    """예측 결과 저장 - 이번 계산에 없는 차량은 삭제 (한 트랜잭션)"""
+    await ensure_forecast_table(db)
+    placeholders = ", ".join(f"${i + 1}" for i in range(len(_FORECAST_COLUMNS)))
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in _FORECAST_COLUMNS[2:])
+    async with db.transaction():
+        await db.executemany(f"""
+            INSERT INTO {SOH_FORECAST_TABLE} ({', '.join(_FORECAST_COLUMNS)})
+            VALUES ({placeholders})
+            ON CONFLICT (granularity, clientid) DO UPDATE SET {updates}, fitted_at = now()
+        """, records)
+        removed = await db.fetchval(f"""
+            WITH removed AS (
+                DELETE FROM {SOH_FORECAST_TABLE}
+                WHERE granularity = $1 AND NOT (clientid = ANY($2::varchar[]))
+                RETURNING 1
+            )
+            SELECT COUNT(*) FROM removed
+        """, granularity, [r[1] for r in records])
+    view_cache.invalidate(SOH_FORECAST_TABLE)
+    return {"saved": len(records), "removed": removed}
+
+
+async def get_vehicle_forecast(db: asyncpg.Connection, clientid: str,
+                               granularity: str = "monthly") -> Optional[Dict[str, Any]]:
+    """차량의 저장된 회귀 결과/EOL 예측 (없으면 None)"""
+    try:
+        row = await db.fetchrow(f"""
+            SELECT f.*, ct.car_type
+            FROM {SOH_FORECAST_TABLE} f
+            LEFT JOIN car_type ct ON ct.clientid = f.clientid
+            WHERE f.granularity = $1 AND f.clientid = $2
+        """, granularity, clientid)
+    except asyncpg.UndefinedTableError:
+        return None
+    return dict(row) if row else None
+
+
+@cached_view(SOH_FORECAST_TABLE, "car_type")
+async def get_forecast_fits(db: asyncpg.Connection, granularity: str = "monthly") -> List[Dict[str, Any]]:
+    """전체 차량의 저장된 회귀 결과 (차종 포함) - 예측 갱신 시 캐시 무효화"""
+    try:
+        rows = await db.fetch(f"""
+            SELECT f.*, COALESCE(ct.car_type, 'Unknown') AS car_type
+            FROM {SOH_FORECAST_TABLE} f
+            LEFT JOIN car_type ct ON ct.clientid = f.clientid
+            WHERE f.granularity = $1
+        """, granularity)
+    except asyncpg.UndefinedTableError:
+        return []
+    return [dict(row) for row in rows]
+
+
+# 세션 테이블 한 번 집계로 기간별 p20 eSOH를 구한다 (기간 단위는 date_trunc 인자로 전달)
+_SESSION_BUCKET_QUERY = f"""
+    SELECT
+        date_trunc($2, s.{ESOH_SESSION_TIME_COLUMN})::date AS period_start,
+        percentile_cont(0.2) WITHIN GROUP (ORDER BY s.{ESOH_SESSION_VALUE_COLUMN}) AS p20_esoh,
+        COUNT(*) AS n_sessions
+    FROM {ESOH_SESSION_TABLE} s
+    WHERE s.clientid = $1
+      AND s.{ESOH_SESSION_VALUE_COLUMN} IS NOT NULL
+    GROUP BY 1
+    ORDER BY 1
+"""
+
+
+@cached_view(ESOH_SESSION_TABLE, cache=session_trend_cache)
+async def get_session_esoh_buckets(db: asyncpg.Connection, clientid: str,
+                                   bucket: str = "month") -> List[Dict[str, Any]]:
+    """차량의 기간별 p20 eSOH와 세션 수 (세션 테이블 직접 집계 - (clientid, 시각) 인덱스 필요, 전용 캐시)"""
+    if bucket not in TREND_BUCKETS:
+        raise ValueError(f"지원하지 않는 기간 단위입니다: {bucket} (지원: {', '.join(TREND_BUCKETS)})")
+    rows = await db.fetch(_SESSION_BUCKET_QUERY, clientid, bucket)
+    return [dict(row) for row in rows]
+
+
+async def get_custom_trend_data(db: asyncpg.Connection, clientid: str, bucket: str = "month",
+                                ma_window: Optional[int] = None) -> List[Dict[str, Any]]:
+    """임의 기간 단위의 p20 eSOH, 이동평균, 변화량 - 이동평균은 캐시된 집계 결과에서 계산"""
+    buckets = await get_session_esoh_buckets(db, clientid, bucket)
+    window = ma_window or TREND_BUCKETS[bucket]
+    if not 1 <= window <= MAX_MA_WINDOW:
+        raise ValueError(f"이동평균 창은 1~{MAX_MA_WINDOW} 사이여야 합니다.")
+    trend, recent, prev = [], [], None
+    for row in buckets:
+        value = row["p20_esoh"]
+        # 뷰의 이동평균과 같이 앞쪽 기간은 있는 값만으로 평균
+        recent = (recent + [value])[-window:]
+        trend.append({
+            "period_start": row["period_start"],
+            "p20_esoh": value,
+            "p20_ma": sum(recent) / len(recent),
+            "delta": None if prev is None else value - prev,
+            "n_sessions": row["n_sessions"],
+        })
+        prev = value
+    return trend
@@ -1,33 +1,167 @@
+import asyncio
+import os
 import asyncpg
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator, Tuple
 from datetime import datetime, timedelta
+from .cursor import decode_bw_data_cursor
+from . import rollup as rollup_crud
+from ..database.base import DB_POOL_MAX_SIZE
+
+# bw_data 수치형 신호 컬럼 (동적 SQL에 쓰이는 컬럼명은 반드시 이 목록으로 검증)
+BW_DATA_NUMERIC_COLUMNS = [
+    "mileage", "speed", "soc", "soh",
+    "pack_v", "current", "chg_sac", "chg_state", "ev_state",
+    "cell_max", "cell_min", "cell_mean", "cell_median",
+    "temp_max", "temp_min", "temp_mean", "temp_median",
+    "accel1", "accel2", "accel3",
+    "brake1", "brake2", "brake3",
+    "gps_alt", "gps_lat", "gps_lon",
+]
+BW_DATA_COLUMNS = ["clientid", "timestamp"] + BW_DATA_NUMERIC_COLUMNS
+
+def parse_columns(columns: str, allowed: List[str] = BW_DATA_COLUMNS) -> List[str]:
+    """콤마 구분 컬럼 목록을 화이트리스트로 검증 (허용되지 않은 컬럼이면 ValueError)"""
+    selected = []
+    for name in (c.strip() for c in columns.split(",")):
+        if not name:
+            continue
+        if name not in allowed:
+            raise ValueError(f"지원하지 않는 컬럼입니다: {name}")
+        if name not in selected:
+            selected.append(name)
+    if not selected:
+        raise ValueError("최소 한 개 이상의 컬럼을 지정해야 합니다.")
+    return selected
+
+def select_list(fields: Optional[List[str]] = None) -> str:
+    """SELECT 목록 생성 - 미지정 시 전체, 지정 시 키 컬럼(clientid, timestamp) + 요청 컬럼"""
+    if not fields:
+        return "*"
+    unknown = [f for f in fields if f not in BW_DATA_COLUMNS]
+    if unknown:
+        raise ValueError(f"지원하지 않는 컬럼입니다: {', '.join(unknown)}")
+    return ", ".join(BW_DATA_COLUMNS[:2] + [f for f in fields if f not in BW_DATA_COLUMNS[:2]])
+
+# keyset 페이지네이션용 인덱스 (차량별 시간순 / 전체 시간순)
+BW_DATA_INDEXES = {
+    "ix_bw_data_clientid_timestamp": "(clientid, timestamp)",
+    "ix_bw_data_timestamp_clientid": "(timestamp, clientid)",
+}
+
+_bw_data_indexes_ready = False
+
+async def ensure_bw_data_indexes(db: asyncpg.Connection) -> bool:
+    """keyset 페이지네이션 정렬/조건과 같은 복합 인덱스 생성 (앱 시작 시 한 번, CONCURRENTLY)
+
+    파티션 테이블은 CONCURRENTLY를 지원하지 않고 전환 시 같은 인덱스를 만들므로 건너뛴다.
+    """
+    global _bw_data_indexes_ready
+    if _bw_data_indexes_ready:
+        return True
+    try:
+        relkind = await db.fetchval("SELECT relkind FROM pg_class WHERE oid = to_regclass('bw_data')")
+        if relkind == "r":
+            # 이전에 중단된 CONCURRENTLY 생성이 남긴 INVALID 인덱스는 IF NOT EXISTS에 걸리므로 먼저 제거
+            invalid = await db.fetch("""
+                SELECT c.relname
+                FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE i.indrelid = 'bw_data'::regclass
+                  AND NOT i.indisvalid
+                  AND c.relname = ANY($1::text[])
+            """, list(BW_DATA_INDEXES))
+            for row in invalid:
+                await db.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {row['relname']}")
+            for name, columns in BW_DATA_INDEXES.items():
+                await db.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON bw_data {columns}")
+    except Exception as e:
+        # 권한이 없는 계정이면 인덱스 없이 동작 (다음 시작 시 다시 시도)
+        print(f"bw_data 인덱스 생성 실패: {e}")
+        return False
+    _bw_data_indexes_ready = True
+    return True
+
+async def _include_boundary_ties(db: asyncpg.Connection, rows: list, limit: int, columns: str) -> list:
+    """페이지가 가득 찼으면 마지막 행과 (clientid, timestamp)가 같은 행을 모두 포함
+
+    bw_data에는 고유 키가 없어 같은 키의 행이 페이지 경계에 걸리면 다음 페이지(키 < 커서)에서 빠지므로,
+    경계 키의 행은 한 페이지에 모두 담는다 (이 경우 limit보다 많을 수 있음).
+    """
+    if not rows or len(rows) < limit:
+        return rows
+    key = (rows[-1]["clientid"], rows[-1]["timestamp"])
+    ties = await db.fetch(f"SELECT {columns} FROM bw_data WHERE clientid = $1 AND timestamp = $2", *key)
+    return [row for row in rows if (row["clientid"], row["timestamp"]) != key] + list(ties)
+
+async def get_bw_data(db: asyncpg.Connection, skip: int = 0, limit: int = 100,
+                      cursor: Optional[str] = None) -> List[Dict]:
+    """모든 bw_data 조회 - cursor 지정 시 keyset 페이지네이션 (OFFSET은 하위 호환용)
+
+    첫 페이지와 커서 페이지는 경계 키가 같은 행을 모두 포함하므로 limit보다 많을 수 있다.
+    """
+    if cursor:
+        key = decode_bw_data_cursor(cursor)
+        # 행 비교식만으로는 파티션 프루닝이 되지 않으므로 timestamp 상한을 함께 지정
+        query = """
+        SELECT * FROM bw_data 
+        WHERE timestamp <= $1 AND (timestamp, clientid) < ($1, $2)
+        ORDER BY timestamp DESC, clientid DESC 
+        LIMIT $3
+        """
+        rows = await db.fetch(query, key["timestamp"], key["clientid"], limit)
+        rows = await _include_boundary_ties(db, rows, limit, "*")
+        return [dict(row) for row in rows]
 
-async def get_bw_data(db: asyncpg.Connection, skip: int = 0, limit: int = 100) -> List[Dict]:
-    """모든 bw_data 조회"""
     query = """
     SELECT * FROM bw_data 
-    ORDER BY timestamp DESC 
+    ORDER BY timestamp DESC, clientid DESC 
     OFFSET $1 LIMIT $2
     """
     rows = await db.fetch(query, skip, limit)
+    if skip == 0:
+        # 첫 페이지는 이후 커서 페이지의 시작점이므로 경계 키의 행을 모두 포함
+        rows = await _include_boundary_ties(db, rows, limit, "*")
     return [dict(row) for row in rows]
 
-async def get_bw_data_by_client(db: asyncpg.Connection, clientid: str, skip: int = 0, limit: int = 1000) -> List[Dict]:
-    """특정 차량의 데이터 조회"""
-    query = """
-    SELECT * FROM bw_data 
+async def get_bw_data_by_client(db: asyncpg.Connection, clientid: str, skip: int = 0, limit: int = 1000,
+                                cursor: Optional[str] = None,
+                                fields: Optional[List[str]] = None) -> List[Dict]:
+    """특정 차량의 데이터 조회 - cursor 지정 시 keyset 페이지네이션 (OFFSET은 하위 호환용)
+
+    첫 페이지와 커서 페이지는 경계 시각이 같은 행을 모두 포함하므로 limit보다 많을 수 있다.
+    """
+    columns = select_list(fields)
+    if cursor:
+        key = decode_bw_data_cursor(cursor)
+        if key["clientid"] != clientid:
+            raise ValueError("커서의 차량 ID가 요청한 차량 ID와 일치하지 않습니다.")
+        query = f"""
+        SELECT {columns} FROM bw_data 
+        WHERE clientid = $1 AND timestamp < $2
+        ORDER BY timestamp DESC 
+        LIMIT $3
+        """
+        rows = await db.fetch(query, clientid, key["timestamp"], limit)
+        rows = await _include_boundary_ties(db, rows, limit, columns)
+        return [dict(row) for row in rows]
+
+    query = f"""
+    SELECT {columns} FROM bw_data 
     WHERE clientid = $1 
     ORDER BY timestamp DESC 
     OFFSET $2 LIMIT $3
     """
     rows = await db.fetch(query, clientid, skip, limit)
+    if skip == 0:
+        # 첫 페이지는 이후 커서 페이지의 시작점이므로 경계 시각의 행을 모두 포함
+        rows = await _include_boundary_ties(db, rows, limit, columns)
     return [dict(row) for row in rows]
 
-async def get_bw_data_filtered(db: asyncpg.Connection, clientid: Optional[str] = None, 
-                              start_date: Optional[datetime] = None, 
-                              end_date: Optional[datetime] = None, 
-                              limit: int = 1000) -> List[Dict]:
-    """필터링된 bw_data 조회"""
+def _build_filtered_where(clientid: Optional[str] = None,
+                          start_date: Optional[datetime] = None,
+                          end_date: Optional[datetime] = None,
+                          cursor: Optional[str] = None):
+    """필터 조건으로 WHERE 절과 파라미터 목록 생성"""
     conditions = []
     params = []
     param_count = 0
@@ -47,22 +181,177 @@ async def get_bw_data_filtered(db: asyncpg.Connection, clientid: Optional[str] =
         conditions.append(f"timestamp <= ${param_count}")
         params.append(end_date)
     
+    if cursor:
+        key = decode_bw_data_cursor(cursor)
+        conditions.append(f"timestamp <= ${param_count + 1}")
+        conditions.append(f"(timestamp, clientid) < (${param_count + 1}, ${param_count + 2})")
+        params.extend([key["timestamp"], key["clientid"]])
+        param_count += 2
+    
     where_clause = " AND ".join(conditions) if conditions else "1=1"
-    param_count += 1
+    return where_clause, params
+
+async def fetch_bw_data_filtered(db: asyncpg.Connection, clientid: Optional[str] = None,
+                                 start_date: Optional[datetime] = None,
+                                 end_date: Optional[datetime] = None,
+                                 limit: int = 1000,
+                                 cursor: Optional[str] = None,
+                                 fields: Optional[List[str]] = None) -> List[asyncpg.Record]:
+    """필터링된 bw_data를 asyncpg 레코드 그대로 조회 (dict 변환 없음, 경계 키가 같은 행은 모두 포함)"""
+    where_clause, params = _build_filtered_where(clientid, start_date, end_date, cursor)
     params.append(limit)
     
     query = f"""
-    SELECT * FROM bw_data 
+    SELECT {select_list(fields)} FROM bw_data 
     WHERE {where_clause}
-    ORDER BY timestamp DESC 
-    LIMIT ${param_count}
+    ORDER BY timestamp DESC, clientid DESC 
+    LIMIT ${len(params)}
     """
     
     rows = await db.fetch(query, *params)
+    return await _include_boundary_ties(db, rows, limit, select_list(fields))
+
+async def get_bw_data_filtered(db: asyncpg.Connection, clientid: Optional[str] = None, 
+                              start_date: Optional[datetime] = None, 
+                              end_date: Optional[datetime] = None, 
+                              limit: int = 1000,
+                              cursor: Optional[str] = None,
+                              fields: Optional[List[str]] = None) -> List[Dict]:
+    """필터링된 bw_data 조회 - cursor 지정 시 해당 위치 이후 페이지, fields 지정 시 해당 컬럼만 조회"""
+    rows = await fetch_bw_data_filtered(db, clientid, start_date, end_date, limit, cursor, fields)
     return [dict(row) for row in rows]
 
+async def get_bw_data_multi(db: asyncpg.Connection, clientids: List[str],
+                            start_date: Optional[datetime] = None,
+                            end_date: Optional[datetime] = None,
+                            limit_per_vehicle: int = 1000,
+                            fields: Optional[List[str]] = None) -> Dict[str, List[Dict]]:
+    """여러 차량 데이터를 한 번의 쿼리로 조회 - 차량별 LATERAL 인덱스 스캔으로 최신 N건씩"""
+    conditions = ["d.clientid = c.id"]
+    params: list = [clientids]
+    if start_date:
+        params.append(start_date)
+        conditions.append(f"d.timestamp >= ${len(params)}")
+    if end_date:
+        params.append(end_date)
+        conditions.append(f"d.timestamp <= ${len(params)}")
+    params.append(limit_per_vehicle)
+    
+    columns = select_list(fields)
+    inner_columns = "d.*" if columns == "*" else ", ".join(f"d.{c}" for c in columns.split(", "))
+    query = f"""
+    SELECT r.* FROM unnest($1::text[]) AS c(id)
+    CROSS JOIN LATERAL (
+        SELECT {inner_columns} FROM bw_data d
+        WHERE {" AND ".join(conditions)}
+        ORDER BY d.timestamp DESC
+        LIMIT ${len(params)}
+    ) r
+    """
+    rows = await db.fetch(query, *params)
+    
+    grouped: Dict[str, List[Dict]] = {cid: [] for cid in clientids}
+    for row in rows:
+        grouped[row["clientid"]].append(dict(row))
+    return grouped
+
+# 프로세스 전체에서 동시 조회가 잡을 수 있는 연결 수 - 풀 크기보다 작게 두어 다른 요청용 연결을 남김
+BATCH_FETCH_CONCURRENCY = int(os.getenv("BW_BATCH_FETCH_CONCURRENCY", str(max(1, DB_POOL_MAX_SIZE - 4))))
+_batch_fetch_slots = asyncio.Semaphore(BATCH_FETCH_CONCURRENCY)
+
+async def get_bw_data_multi_concurrent(pool: asyncpg.Pool, clientids: List[str],
+                                       start_date: Optional[datetime] = None,
+                                       end_date: Optional[datetime] = None,
+                                       limit_per_vehicle: int = 1000,
+                                       fields: Optional[List[str]] = None,
+                                       max_concurrency: int = 4) -> Dict[str, List[Dict]]:
+    """여러 차량 데이터를 풀 연결 여러 개로 동시에 조회
+
+    요청별 동시 실행 수는 max_concurrency, 프로세스 전체는 BATCH_FETCH_CONCURRENCY로 제한한다.
+    호출자는 연결을 잡은 채로 호출하면 안 된다 (동시 요청끼리 풀을 나눠 잡고 서로 기다리게 됨).
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def fetch_one(clientid: str) -> List[Dict]:
+        async with semaphore, _batch_fetch_slots:
+            async with pool.acquire() as conn:
+                return await get_bw_data_filtered(
+                    conn, clientid=clientid, start_date=start_date, end_date=end_date,
+                    limit=limit_per_vehicle, fields=fields
+                )
+    
+    results = await asyncio.gather(*(fetch_one(cid) for cid in clientids))
+    return dict(zip(clientids, results))
+
+async def _iter_cursor(db: asyncpg.Connection, query: str, params: list,
+                       batch_size: int) -> AsyncIterator[List[asyncpg.Record]]:
+    """트랜잭션 내 서버 측 커서로 결과를 배치 단위로 반환"""
+    async with db.transaction(readonly=True):
+        cur = await db.cursor(query, *params)
+        while True:
+            rows = await cur.fetch(batch_size)
+            if not rows:
+                break
+            yield rows
+
+async def iter_bw_data_filtered(db: asyncpg.Connection, clientid: Optional[str] = None,
+                                start_date: Optional[datetime] = None,
+                                end_date: Optional[datetime] = None,
+                                limit: Optional[int] = None,
+                                batch_size: int = 5000,
+                                fields: Optional[List[str]] = None) -> AsyncIterator[List[asyncpg.Record]]:
+    """필터링된 bw_data를 서버 측 커서로 batch_size 단위씩 조회 (스트리밍 내보내기용)"""
+    where_clause, params = _build_filtered_where(clientid, start_date, end_date)
+    limit_clause = ""
+    if limit:
+        params.append(limit)
+        limit_clause = f"LIMIT ${len(params)}"
+    
+    query = f"""
+    SELECT {select_list(fields)} FROM bw_data 
+    WHERE {where_clause}
+    ORDER BY timestamp DESC, clientid DESC 
+    {limit_clause}
+    """
+    async for batch in _iter_cursor(db, query, params, batch_size):
+        yield batch
+
+def _empty_stats() -> Dict[str, Any]:
+    return {
+        "total_records": 0,
+        "avg_speed": 0,
+        "avg_battery_voltage": 0,
+        "avg_temperature": 0,
+        "avg_soc": 0,
+        "avg_soh": 0,
+        "total_mileage": 0,
+        "soc_range": {"min": 0, "max": 0},
+        "soh_range": {"min": 0, "max": 0}
+    }
+
+def _stats_from_rollup(agg: Dict[str, Any]) -> Dict[str, Any]:
+    """롤업 집계 결과를 get_bw_data_stats 응답 형식으로 변환"""
+    if agg["total_records"] == 0:
+        return _empty_stats()
+    mileage = agg["mileage"]
+    return {
+        "total_records": agg["total_records"],
+        "avg_speed": agg["speed"]["avg"] or 0,
+        "avg_battery_voltage": agg["pack_v"]["avg"] or 0,
+        "avg_temperature": agg["temp_mean"]["avg"] or 0,
+        "avg_soc": agg["soc"]["avg"] or 0,
+        "avg_soh": agg["soh"]["avg"] or 0,
+        "total_mileage": mileage["max"] - mileage["min"] if mileage["max"] and mileage["min"] else 0,
+        "soc_range": {"min": agg["soc"]["min"] or 0, "max": agg["soc"]["max"] or 0},
+        "soh_range": {"min": agg["soh"]["min"] or 0, "max": agg["soh"]["max"] or 0}
+    }
+
 async def get_bw_data_stats(db: asyncpg.Connection, clientid: Optional[str] = None) -> Dict[str, Any]:
-    """bw_data 통계 정보 조회 - soc, soh 컬럼 추가"""
+    """bw_data 통계 정보 조회 - 롤업이 구성되어 있으면 롤업(+워터마크 이후 원본)으로 집계"""
+    agg = await rollup_crud.get_rollup_aggregates(db, clientid=clientid)
+    if agg is not None:
+        return _stats_from_rollup(agg)
+    
     if clientid:
         query = """
         SELECT 
@@ -102,17 +391,7 @@ async def get_bw_data_stats(db: asyncpg.Connection, clientid: Optional[str] = No
         row = await db.fetchrow(query)
     
     if not row or row['total_records'] == 0:
-        return {
-            "total_records": 0,
-            "avg_speed": 0,
-            "avg_battery_voltage": 0,
-            "avg_temperature": 0,
-            "avg_soc": 0,
-            "avg_soh": 0,
-            "total_mileage": 0,
-            "soc_range": {"min": 0, "max": 0},
-            "soh_range": {"min": 0, "max": 0}
-        }
+        return _empty_stats()
     
     return {
         "total_records": row['total_records'],
@@ -132,13 +411,59 @@ async def get_bw_data_stats(db: asyncpg.Connection, clientid: Optional[str] = No
         }
     }
 
-async def get_recent_bw_data(db: asyncpg.Connection, hours: int = 24) -> List[Dict]:
+async def get_recent_bw_data(db: asyncpg.Connection, hours: int = 24,
+                             fields: Optional[List[str]] = None) -> List[Dict]:
     """최근 N시간 동안의 데이터 조회"""
     cutoff_time = datetime.now() - timedelta(hours=hours)
-    query = """
-    SELECT * FROM bw_data 
+    query = f"""
+    SELECT {select_list(fields)} FROM bw_data 
     WHERE timestamp >= $1 
     ORDER BY timestamp DESC
     """
     rows = await db.fetch(query, cutoff_time)
     return [dict(row) for row in rows]
+
+async def iter_recent_bw_data(db: asyncpg.Connection, hours: int = 24,
+                              batch_size: int = 5000,
+                              fields: Optional[List[str]] = None) -> AsyncIterator[List[asyncpg.Record]]:
+    """최근 N시간 데이터를 서버 측 커서로 batch_size 단위씩 조회 (스트리밍 내보내기용)"""
+    cutoff_time = datetime.now() - timedelta(hours=hours)
+    query = f"""
+    SELECT {select_list(fields)} FROM bw_data 
+    WHERE timestamp >= $1 
+    ORDER BY timestamp DESC
+    """
+    async for batch in _iter_cursor(db, query, [cutoff_time], batch_size):
+        yield batch
+
+# 다운샘플링 전 원본을 그대로 읽는 최대 행 수 (넘으면 SQL/롤업에서 버킷 집계)
+SERIES_MAX_RAW_ROWS = 20000
+
+async def get_bw_data_series(db: asyncpg.Connection, clientid: str, columns: List[str],
+                             start_date: Optional[datetime] = None,
+                             end_date: Optional[datetime] = None,
+                             max_rows: int = SERIES_MAX_RAW_ROWS) -> Tuple[List[asyncpg.Record], int]:
+    """차트용 시계열 조회 - timestamp와 지정 컬럼만 시간 오름차순으로 조회
+
+    구간의 원본이 max_rows를 넘으면 max_rows개 등간격 버킷 평균(롤업 우선)으로 대체한다.
+    반환값은 (행 목록, 버킷 폭 초 - 원본이면 0).
+    """
+    where_clause, params = _build_filtered_where(clientid, start_date, end_date)
+    column_list = ", ".join(columns)
+    query = f"""
+    SELECT timestamp, {column_list} FROM bw_data 
+    WHERE {where_clause}
+    ORDER BY timestamp ASC
+    LIMIT {max_rows + 1}
+    """
+    rows = await db.fetch(query, *params)
+    if len(rows) <= max_rows:
+        return rows, 0
+
+    # 오름차순 첫 행이 구간 시작, 끝은 지정값 또는 차량의 마지막 시각
+    start = rows[0]["timestamp"]
+    end = end_date or await db.fetchval(
+        "SELECT MAX(timestamp) FROM bw_data WHERE clientid = $1", clientid
+    )
+    bucketed = await rollup_crud.get_bucketed_series(db, clientid, columns, start, end, max_rows)
+    return bucketed, (end - start).total_seconds() / max_rows
@@ -1,6 +1,7 @@
 import asyncpg
 from typing import List, Optional, Dict
 from ..schemas.car_type import CarTypeCreate
+from ..services.cache import cached_view, view_cache
 
 async def get_car_types(db: asyncpg.Connection, skip: int = 0, limit: int = 100) -> List[Dict]:
     """모든 차량 타입 조회"""
@@ -34,8 +35,10 @@ async def create_car_type(db: asyncpg.Connection, car_type: CarTypeCreate) -> Di
         car_type.model_year, 
         car_type.model_month
     )
+    view_cache.invalidate("car_type")
     return dict(row)
 
+@cached_view("car_type")
 async def get_unique_car_types(db: asyncpg.Connection) -> List[str]:
     """고유한 차량 타입 목록 조회"""
     query = """
@@ -0,0 +1,92 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from ..services.rank_index import ranking_sort_key
+
+
+def encode_cursor(payload: Dict[str, Any]) -> str:
+    """keyset 페이지네이션용 불투명(opaque) 커서 생성"""
+    def _default(value):
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return str(value)
+
+    raw = json.dumps(payload, default=_default, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """커서 문자열을 원래 payload로 복원 (형식 오류 시 ValueError)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception as e:
+        raise ValueError(f"잘못된 커서 형식입니다: {cursor}") from e
+    if not isinstance(payload, dict):
+        raise ValueError(f"잘못된 커서 형식입니다: {cursor}")
+    return payload
+
+
+def encode_bw_data_cursor(clientid: str, timestamp: datetime) -> str:
+    """bw_data 행의 (clientid, timestamp) 키로 커서 생성"""
+    return encode_cursor({"c": clientid, "t": timestamp})
+
+
+def decode_bw_data_cursor(cursor: str) -> Dict[str, Any]:
+    """bw_data 커서를 {"clientid", "timestamp"}로 복원"""
+    payload = decode_cursor(cursor)
+    try:
+        return {
+            "clientid": str(payload["c"]),
+            "timestamp": datetime.fromisoformat(payload["t"]),
+        }
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"잘못된 커서 형식입니다: {cursor}") from e
+
+
+def next_bw_data_cursor(rows, limit: int) -> Optional[str]:
+    """마지막 행 기준 다음 페이지 커서 (페이지가 가득 차지 않았으면 None)"""
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_bw_data_cursor(last["clientid"], last["timestamp"])
+
+
+def encode_client_vehicles_cursor(sort_flag: int, model_year_month: str, client_id: str) -> str:
+    """bw_vehicle_status 정렬 키(Unknown 여부, 연식, client_id)로 커서 생성"""
+    return encode_cursor({"f": sort_flag, "m": model_year_month, "c": client_id})
+
+
+def decode_client_vehicles_cursor(cursor: str) -> Dict[str, Any]:
+    """차량 목록 커서를 {"flag", "model_year_month", "client_id"}로 복원"""
+    payload = decode_cursor(cursor)
+    try:
+        return {
+            "flag": int(payload["f"]),
+            "model_year_month": str(payload["m"]),
+            "client_id": str(payload["c"]),
+        }
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"잘못된 커서 형식입니다: {cursor}") from e
+
+
+def encode_ranking_cursor(score, battery_rank, clientid: str) -> str:
+    """배터리 랭킹 정렬 키(점수, battery_rank, clientid)로 커서 생성"""
+    return encode_cursor({
+        "s": None if score is None else float(score),
+        "r": battery_rank,
+        "c": clientid,
+    })
+
+
+def decode_ranking_cursor(cursor: str) -> Tuple:
+    """배터리 랭킹 커서를 RankIndex 정렬 키로 복원"""
+    payload = decode_cursor(cursor)
+    try:
+        score = None if payload["s"] is None else float(payload["s"])
+        battery_rank = None if payload["r"] is None else int(payload["r"])
+        return ranking_sort_key(score, battery_rank, str(payload["c"]))
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"잘못된 커서 형식입니다: {cursor}") from e
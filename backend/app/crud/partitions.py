@@ -0,0 +1,265 @@
+import asyncpg
+import os
+import re
+from typing import List, Optional, Dict, Any
+from datetime import datetime, date
+
+PARENT_TABLE = "bw_data"
+STAGING_TABLE = "bw_data_partitioned"
+LEGACY_TABLE = "bw_data_legacy"
+DEFAULT_PARTITION = "bw_data_default"
+PARTITION_NAME_RE = re.compile(r"^bw_data_p(\d{4})(\d{2})$")
+
+# 환경변수 기본값 (요청 파라미터로 덮어쓸 수 있음)
+DEFAULT_MONTHS_AHEAD = int(os.getenv("BW_DATA_PARTITION_MONTHS_AHEAD", "3"))
+DEFAULT_RETENTION_MONTHS = int(os.getenv("BW_DATA_RETENTION_MONTHS", "0")) or None
+# 만료 파티션 기본 동작은 분리(detach)만 - 삭제는 명시적으로 켠 경우에만 정기 작업에서 실행
+DEFAULT_RETENTION_DROP = os.getenv("BW_DATA_RETENTION_DROP", "false").lower() in ("1", "true", "yes")
+PARTITION_LOCK_KEY = 7_310_006  # pg_try_advisory_lock 키 (파티션 유지보수 중복 실행 방지)
+
+
+def _month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def _add_months(month: date, n: int) -> date:
+    index = month.year * 12 + (month.month - 1) + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"bw_data_p{month.year:04d}{month.month:02d}"
+
+
+def _partition_month(name: str) -> Optional[date]:
+    match = PARTITION_NAME_RE.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+async def is_partitioned(db: asyncpg.Connection, table: str = PARENT_TABLE) -> bool:
+    """테이블이 파티션 테이블인지 확인"""
+    return await db.fetchval("""
+        SELECT EXISTS (
+            SELECT 1 FROM pg_partitioned_table pt
+            JOIN pg_class c ON c.oid = pt.partrelid
+            WHERE c.relname = $1 AND c.relnamespace = 'public'::regnamespace
+        )
+    """, table)
+
+
+async def list_partitions(db: asyncpg.Connection, table: str = PARENT_TABLE) -> List[Dict[str, Any]]:
+    """파티션 목록 (범위, 추정 행 수, 크기)"""
+    rows = await db.fetch("""
+        SELECT
+            c.relname AS name,
+            pg_get_expr(c.relpartbound, c.oid) AS bound,
+            GREATEST(c.reltuples, 0)::bigint AS estimated_rows,
+            pg_size_pretty(pg_total_relation_size(c.oid)) AS size
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = $1 AND p.relnamespace = 'public'::regnamespace
+        ORDER BY c.relname
+    """, table)
+    return [dict(row) for row in rows]
+
+
+async def _create_month_partition(db: asyncpg.Connection, table: str, month: date) -> bool:
+    """월 파티션 생성 - DEFAULT 파티션에 들어가 있던 해당 월 행은 새 파티션으로 이동"""
+    name = partition_name(month)
+    exists = await db.fetchval("SELECT to_regclass($1) IS NOT NULL", f"public.{name}")
+    if exists:
+        return False
+
+    lower, upper = month, _add_months(month, 1)
+    async with db.transaction():
+        await db.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        has_default = await db.fetchval("SELECT to_regclass($1) IS NOT NULL", f"public.{DEFAULT_PARTITION}")
+        if has_default and table == PARENT_TABLE:
+            await db.execute(f"""
+                WITH moved AS (
+                    DELETE FROM {DEFAULT_PARTITION}
+                    WHERE timestamp >= $1 AND timestamp < $2
+                    RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved
+            """, lower, upper)
+        await db.execute(
+            f"ALTER TABLE {table} ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+        )
+    return True
+
+
+async def ensure_future_partitions(db: asyncpg.Connection, months_ahead: int = DEFAULT_MONTHS_AHEAD,
+                                   table: str = PARENT_TABLE,
+                                   from_month: Optional[date] = None) -> List[str]:
+    """from_month(기본: 이번 달)부터 months_ahead개월 뒤까지 월 파티션을 미리 생성"""
+    start = from_month or _month_start(datetime.now())
+    end = _add_months(_month_start(datetime.now()), months_ahead)
+    created = []
+    month = start
+    while month <= end:
+        if await _create_month_partition(db, table, month):
+            created.append(partition_name(month))
+        month = _add_months(month, 1)
+    return created
+
+
+async def apply_retention(db: asyncpg.Connection, retention_months: Optional[int] = DEFAULT_RETENTION_MONTHS,
+                          drop: bool = False) -> List[str]:
+    """보존 기간이 지난 월 파티션을 분리(detach)하거나 삭제(drop)
+
+    retention_months개월 이전(이번 달 기준)에 끝나는 파티션이 대상이며,
+    None이면 아무것도 하지 않는다.
+    """
+    if not retention_months:
+        return []
+    cutoff = _add_months(_month_start(datetime.now()), -retention_months)
+    expired = []
+    for partition in await list_partitions(db):
+        month = _partition_month(partition["name"])
+        if month is None or _add_months(month, 1) > cutoff:
+            continue
+        async with db.transaction():
+            await db.execute(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {partition['name']}")
+            if drop:
+                await db.execute(f"DROP TABLE {partition['name']}")
+        expired.append(partition["name"])
+    return expired
+
+
+async def maintain_partitions(db: asyncpg.Connection, months_ahead: int = DEFAULT_MONTHS_AHEAD,
+                              retention_months: Optional[int] = DEFAULT_RETENTION_MONTHS,
+                              drop: bool = False) -> Dict[str, Any]:
+    """정기 파티션 유지보수 - 미래 파티션 생성 + 보존 기간 초과 파티션 정리"""
+    if not await is_partitioned(db):
+        return {
+            "status": "error",
+            "message": "bw_data가 아직 파티션 테이블이 아닙니다. 먼저 전환을 실행하세요.",
+            "partitioned": False
+        }
+    created = await ensure_future_partitions(db, months_ahead)
+    expired = await apply_retention(db, retention_months, drop)
+    return {
+        "status": "success",
+        "partitioned": True,
+        "created": created,
+        "detached" if not drop else "dropped": expired
+    }
+
+
+async def _dependent_views(db: asyncpg.Connection, table: str) -> List[Dict[str, Any]]:
+    """테이블을 직접 참조하는 뷰/머티리얼라이즈드 뷰와 그 정의"""
+    rows = await db.fetch("""
+        SELECT DISTINCT
+            v.relname AS name,
+            v.relkind::text AS kind,
+            pg_get_viewdef(v.oid) AS definition,
+            EXISTS (
+                SELECT 1 FROM pg_depend d2
+                JOIN pg_rewrite r2 ON r2.oid = d2.objid
+                WHERE d2.refobjid = v.oid AND r2.ev_class <> v.oid
+            ) AS has_dependents
+        FROM pg_depend d
+        JOIN pg_rewrite r ON r.oid = d.objid
+        JOIN pg_class v ON v.oid = r.ev_class
+        WHERE d.refobjid = $1::text::regclass
+          AND v.oid <> $1::text::regclass
+    """, table)
+    result = []
+    for row in rows:
+        view = dict(row)
+        view["indexes"] = [
+            r["indexdef"] for r in await db.fetch(
+                "SELECT indexdef FROM pg_indexes WHERE schemaname = 'public' AND tablename = $1",
+                row["name"]
+            )
+        ]
+        result.append(view)
+    return result
+
+
+async def convert_to_partitioned(db: asyncpg.Connection, months_ahead: int = DEFAULT_MONTHS_AHEAD) -> Dict[str, Any]:
+    """bw_data를 월 단위 RANGE(timestamp) 파티션 테이블로 전환
+
+    1) 같은 구조의 파티션 테이블(bw_data_partitioned)과 월 파티션, DEFAULT 파티션 생성
+    2) 지난 달까지의 데이터를 월별로 복사 (월마다 별도 트랜잭션, 이미 복사된 월은 건너뜀)
+    3) ACCESS EXCLUSIVE 잠금 아래 남은 구간을 복사하고 이름을 교체,
+       bw_data를 참조하던 뷰를 새 테이블 기준으로 다시 생성
+    기존 테이블은 bw_data_legacy로 남겨 두며 확인 후 직접 삭제한다.
+    2) 단계에서 이미 복사된 과거 월로 들어오는 백필 적재는 반영되지 않으므로 전환 중에는 중단한다.
+    """
+    if await is_partitioned(db):
+        return {"status": "success", "message": "bw_data는 이미 파티션 테이블입니다.", "partitioned": True}
+
+    dependents = await _dependent_views(db, PARENT_TABLE)
+    blocked = [v["name"] for v in dependents if v["kind"] == "m" and v["has_dependents"]]
+    if blocked:
+        return {
+            "status": "error",
+            "message": "다른 뷰가 참조하는 머티리얼라이즈드 뷰가 bw_data에 의존하고 있어 자동 전환할 수 없습니다.",
+            "blocking_views": blocked
+        }
+
+    bounds = await db.fetchrow(f"SELECT MIN(timestamp) AS lo, MAX(timestamp) AS hi FROM {PARENT_TABLE}")
+    first_month = _month_start(bounds["lo"]) if bounds["lo"] else _month_start(datetime.now())
+    current_month = _month_start(datetime.now())
+
+    await db.execute(f"""
+        CREATE TABLE IF NOT EXISTS {STAGING_TABLE}
+        (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+        PARTITION BY RANGE (timestamp)
+    """)
+    await db.execute(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {STAGING_TABLE} DEFAULT")
+    await ensure_future_partitions(db, months_ahead, table=STAGING_TABLE, from_month=first_month)
+
+    # 지난 달까지는 잠금 없이 월별 복사
+    copied = []
+    month = first_month
+    while month < current_month:
+        name = partition_name(month)
+        already = await db.fetchval(f"SELECT EXISTS (SELECT 1 FROM {name})")
+        if not already:
+            async with db.transaction():
+                await db.execute(f"""
+                    INSERT INTO {STAGING_TABLE}
+                    SELECT * FROM {PARENT_TABLE}
+                    WHERE timestamp >= $1 AND timestamp < $2
+                """, month, _add_months(month, 1))
+            copied.append(name)
+        month = _add_months(month, 1)
+
+    async with db.transaction():
+        await db.execute(f"LOCK TABLE {PARENT_TABLE} IN ACCESS EXCLUSIVE MODE")
+        # 이번 달 이후(복사 중 적재된 행 포함)와 범위 밖 행을 마지막으로 복사
+        await db.execute(f"""
+            INSERT INTO {STAGING_TABLE}
+            SELECT * FROM {PARENT_TABLE}
+            WHERE timestamp >= $1 OR timestamp < $2
+        """, current_month, first_month)
+        await db.execute(f"ALTER TABLE {PARENT_TABLE} RENAME TO {LEGACY_TABLE}")
+        await db.execute(f"ALTER TABLE {STAGING_TABLE} RENAME TO {PARENT_TABLE}")
+        await db.execute(f"CREATE INDEX IF NOT EXISTS ix_bw_data_clientid_timestamp_p ON {PARENT_TABLE} (clientid, timestamp)")
+        await db.execute(f"CREATE INDEX IF NOT EXISTS ix_bw_data_timestamp_clientid_p ON {PARENT_TABLE} (timestamp, clientid)")
+
+        # 뷰는 OID로 테이블을 참조하므로 새 bw_data 기준으로 다시 생성
+        stale_matviews = []
+        for view in dependents:
+            if view["kind"] == "v":
+                await db.execute(f"CREATE OR REPLACE VIEW {view['name']} AS {view['definition']}")
+            else:
+                await db.execute(f"DROP MATERIALIZED VIEW {view['name']}")
+                await db.execute(f"CREATE MATERIALIZED VIEW {view['name']} AS {view['definition'].rstrip().rstrip(';')} WITH NO DATA")
+                for indexdef in view["indexes"]:
+                    await db.execute(indexdef)
+                stale_matviews.append(view["name"])
+
+    return {
+        "status": "success",
+        "message": f"bw_data가 월 단위 파티션 테이블로 전환되었습니다. 기존 테이블은 {LEGACY_TABLE}에 남아 있습니다.",
+        "partitioned": True,
+        "copied_months": copied,
+        "recreated_views": [v["name"] for v in dependents],
+        "matviews_needing_refresh": stale_matviews
+    }
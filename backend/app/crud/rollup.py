@@ -0,0 +1,433 @@
+import os
+
+import asyncpg
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import datetime, timedelta
+
+# 롤업 대상 지표 (각 지표마다 count/sum/min/max 보관)
+ROLLUP_METRICS = ["speed", "pack_v", "temp_mean", "soc", "soh", "mileage"]
+
+# 해상도 → 롤업 테이블 (세밀한 것부터)
+ROLLUP_TABLES = {
+    "minute": "bw_data_rollup_1m",
+    "hour": "bw_data_rollup_1h",
+    "day": "bw_data_rollup_1d",
+}
+ROLLUP_RESOLUTIONS = list(ROLLUP_TABLES)
+
+WATERMARK_NAME = "bw_data"
+REFRESH_LOCK_KEY = 7_310_001  # pg_advisory_xact_lock 키 (롤업 갱신 중복 실행 방지)
+# 워터마크 이후 늦게 도착한 행: 이 구간은 갱신 때마다 다시 집계하고, 더 오래된 시각은 적재 시 범위를 기록
+ROLLUP_LATENESS = timedelta(seconds=float(os.getenv("BW_ROLLUP_LATENESS_SECONDS", "3600")))
+DIRTY_TABLE = "bw_rollup_dirty"
+
+
+def _metric_columns_ddl() -> str:
+    return ",\n        ".join(
+        f"{m}_count BIGINT NOT NULL DEFAULT 0, {m}_sum DOUBLE PRECISION, "
+        f"{m}_min DOUBLE PRECISION, {m}_max DOUBLE PRECISION"
+        for m in ROLLUP_METRICS
+    )
+
+
+def _metric_column_names() -> List[str]:
+    return [f"{m}_{agg}" for m in ROLLUP_METRICS for agg in ("count", "sum", "min", "max")]
+
+
+async def ensure_rollup_tables(db: asyncpg.Connection) -> None:
+    """롤업 테이블과 워터마크 테이블 생성 (없을 때만)"""
+    for table in ROLLUP_TABLES.values():
+        await db.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+        clientid VARCHAR(50) NOT NULL,
+        bucket TIMESTAMP NOT NULL,
+        n BIGINT NOT NULL,
+        {_metric_columns_ddl()},
+        PRIMARY KEY (clientid, bucket)
+        )
+        """)
+        await db.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_bucket ON {table} (bucket)")
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS bw_rollup_watermark (
+        name TEXT PRIMARY KEY,
+        watermark TIMESTAMP NOT NULL,
+        updated_at TIMESTAMP NOT NULL DEFAULT now()
+    )
+    """)
+    await db.execute(f"""
+    CREATE TABLE IF NOT EXISTS {DIRTY_TABLE} (
+        id BIGSERIAL PRIMARY KEY,
+        clientid VARCHAR(50) NOT NULL,
+        lo TIMESTAMP NOT NULL,
+        hi TIMESTAMP NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT now()
+    )
+    """)
+
+
+async def get_rollup_watermark(db: asyncpg.Connection) -> Optional[datetime]:
+    """롤업에 반영된 마지막 원본 timestamp (롤업 미구성 시 None)"""
+    try:
+        return await db.fetchval(
+            "SELECT watermark FROM bw_rollup_watermark WHERE name = $1", WATERMARK_NAME
+        )
+    except asyncpg.UndefinedTableError:
+        return None
+
+
+def _upsert_sql(table: str, select_sql: str) -> str:
+    columns = ["clientid", "bucket", "n"] + _metric_column_names()
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in columns[2:])
+    return f"""
+    INSERT INTO {table} ({", ".join(columns)})
+    {select_sql}
+    ON CONFLICT (clientid, bucket) DO UPDATE SET {updates}
+    """
+
+
+def _raw_aggregates() -> str:
+    return ", ".join(
+        f"COUNT({m}), SUM({m}), MIN({m}), MAX({m})" for m in ROLLUP_METRICS
+    )
+
+
+def _merge_aggregates() -> str:
+    return ", ".join(
+        f"SUM({m}_count)::bigint, SUM({m}_sum), MIN({m}_min), MAX({m}_max)" for m in ROLLUP_METRICS
+    )
+
+
+def _merge_ranges(ranges, resolution: str) -> List[Tuple[str, datetime, datetime]]:
+    """차량별 시각 범위를 해상도 버킷 경계로 넓힌 뒤 겹치는 범위를 합침 (재집계 시 중복 합산 방지)"""
+    by_client: Dict[str, List[Tuple[datetime, datetime]]] = {}
+    for clientid, lo, hi in ranges:
+        by_client.setdefault(clientid, []).append((_floor(lo, resolution), _floor(hi, resolution) + _STEPS[resolution]))
+    merged = []
+    for clientid, spans in by_client.items():
+        spans.sort()
+        cur_lo, cur_hi = spans[0]
+        for lo, hi in spans[1:]:
+            if lo <= cur_hi:
+                cur_hi = max(cur_hi, hi)
+            else:
+                merged.append((clientid, cur_lo, cur_hi))
+                cur_lo, cur_hi = lo, hi
+        merged.append((clientid, cur_lo, cur_hi))
+    return merged
+
+
+def _range_params(ranges: List[Tuple[str, datetime, datetime]]) -> list:
+    return [[r[0] for r in ranges], [r[1] for r in ranges], [r[2] for r in ranges]]
+
+
+_DIRTY_RANGES_SQL = "SELECT * FROM unnest($1::varchar[], $2::timestamp[], $3::timestamp[]) AS d(clientid, lo, hi)"
+
+
+async def mark_rollup_dirty(db: asyncpg.Connection, ranges: List[Tuple[str, datetime, datetime]]) -> int:
+    """워터마크 이전 시각으로 늦게 적재된 (clientid, 최소, 최대 시각) 범위를 기록 - 다음 갱신 때 재집계"""
+    watermark = await get_rollup_watermark(db)
+    if watermark is None:
+        return 0
+    # 지연 허용 구간 안의 행은 갱신 때마다 다시 집계되므로 그 이전만 기록
+    late = [(c, lo, hi) for c, lo, hi in ranges if lo < watermark - ROLLUP_LATENESS]
+    if late:
+        query = f"INSERT INTO {DIRTY_TABLE} (clientid, lo, hi) VALUES ($1, $2, $3)"
+        try:
+            await db.executemany(query, late)
+        except asyncpg.UndefinedTableError:
+            # 이 테이블이 생기기 전에 구성된 롤업
+            await ensure_rollup_tables(db)
+            await db.executemany(query, late)
+    return len(late)
+
+
+async def refresh_rollups(db: asyncpg.Connection) -> Dict[str, Any]:
+    """워터마크 이후 원본 데이터만 반영하여 분/시간/일 롤업을 증분 갱신
+
+    워터마크가 걸친 버킷은 원본(또는 하위 롤업)에서 다시 집계해 덮어쓰므로
+    부분 버킷이 중복 합산되지 않는다. 분 → 시간 → 일 순으로 하위 롤업에서 병합한다.
+    늦게 도착한 행을 위해 워터마크 이전 ROLLUP_LATENESS 구간은 매번 다시 집계하고,
+    그보다 오래된 시각으로 적재된 범위(bw_rollup_dirty)는 해당 차량/버킷만 다시 집계한다.
+    """
+    await ensure_rollup_tables(db)
+    started = datetime.now()
+    async with db.transaction():
+        await db.execute("SELECT pg_advisory_xact_lock($1)", REFRESH_LOCK_KEY)
+        watermark = await get_rollup_watermark(db)
+
+        if watermark is None:
+            new_high = await db.fetchval("SELECT MAX(timestamp) FROM bw_data")
+        else:
+            new_high = await db.fetchval(
+                "SELECT MAX(timestamp) FROM bw_data WHERE timestamp > $1", watermark
+            )
+        dirty = await db.fetch(f"DELETE FROM {DIRTY_TABLE} RETURNING clientid, lo, hi")
+        if new_high is None and not dirty:
+            return {
+                "status": "success",
+                "message": "새로 반영할 데이터가 없습니다.",
+                "watermark": watermark,
+                "updated_buckets": {}
+            }
+
+        updated = {}
+        # 1) 원본 → 분 롤업 (지연 허용 구간부터)
+        if new_high is not None:
+            window_start = _floor(watermark - ROLLUP_LATENESS, "minute") if watermark else None
+            lower = "AND timestamp >= $2" if window_start else ""
+            params = [new_high, window_start] if window_start else [new_high]
+            status = await db.execute(_upsert_sql(ROLLUP_TABLES["minute"], f"""
+                SELECT clientid, date_trunc('minute', timestamp), COUNT(*), {_raw_aggregates()}
+                FROM bw_data
+                WHERE timestamp <= $1 {lower}
+                GROUP BY 1, 2
+            """), *params)
+            updated["minute"] = int(status.split()[-1])
+        else:
+            window_start = None
+        if dirty:
+            status = await db.execute(_upsert_sql(ROLLUP_TABLES["minute"], f"""
+                SELECT b.clientid, date_trunc('minute', b.timestamp), COUNT(*), {_raw_aggregates()}
+                FROM ({_DIRTY_RANGES_SQL}) d
+                JOIN bw_data b ON b.clientid = d.clientid AND b.timestamp >= d.lo AND b.timestamp < d.hi
+                GROUP BY 1, 2
+            """), *_range_params(_merge_ranges(dirty, "minute")))
+            updated["minute"] = updated.get("minute", 0) + int(status.split()[-1])
+
+        # 2) 분 → 시간, 시간 → 일 롤업
+        for finer, coarser in (("minute", "hour"), ("hour", "day")):
+            if new_high is not None:
+                lower = f"WHERE bucket >= date_trunc('{coarser}', $1::timestamp)" if window_start else ""
+                status = await db.execute(_upsert_sql(ROLLUP_TABLES[coarser], f"""
+                    SELECT clientid, date_trunc('{coarser}', bucket), SUM(n), {_merge_aggregates()}
+                    FROM {ROLLUP_TABLES[finer]}
+                    {lower}
+                    GROUP BY 1, 2
+                """), *([window_start] if window_start else []))
+                updated[coarser] = int(status.split()[-1])
+            if dirty:
+                status = await db.execute(_upsert_sql(ROLLUP_TABLES[coarser], f"""
+                    SELECT r.clientid, date_trunc('{coarser}', r.bucket), SUM(r.n), {_merge_aggregates()}
+                    FROM ({_DIRTY_RANGES_SQL}) d
+                    JOIN {ROLLUP_TABLES[finer]} r ON r.clientid = d.clientid AND r.bucket >= d.lo AND r.bucket < d.hi
+                    GROUP BY 1, 2
+                """), *_range_params(_merge_ranges(dirty, coarser)))
+                updated[coarser] = updated.get(coarser, 0) + int(status.split()[-1])
+
+        if new_high is not None:
+            await db.execute("""
+            INSERT INTO bw_rollup_watermark (name, watermark, updated_at)
+            VALUES ($1, $2, now())
+            ON CONFLICT (name) DO UPDATE SET watermark = EXCLUDED.watermark, updated_at = now()
+            """, WATERMARK_NAME, new_high)
+
+    return {
+        "status": "success",
+        "message": "bw_data 롤업이 갱신되었습니다.",
+        "watermark": new_high or watermark,
+        "late_ranges": len(dirty),
+        "updated_buckets": updated,
+        "duration_seconds": (datetime.now() - started).total_seconds()
+    }
+
+
+_STEPS = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+
+def _floor(ts: datetime, resolution: str) -> datetime:
+    if resolution == "minute":
+        return ts.replace(second=0, microsecond=0)
+    if resolution == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _ceil(ts: datetime, resolution: str) -> datetime:
+    floored = _floor(ts, resolution)
+    return floored if floored == ts else floored + _STEPS[resolution]
+
+
+def plan_rollup_ranges(start: Optional[datetime], end: datetime,
+                       levels: Tuple[str, ...] = ("day", "hour", "minute")) -> List[Tuple[str, Optional[datetime], datetime]]:
+    """[start, end) 구간을 가장 거친 롤업부터 채우고 남은 양 끝을 더 세밀한 롤업/원본으로 분할
+
+    반환값은 (level, lo, hi) 목록이며 level이 "raw"인 구간은 원본 bw_data에서 집계한다.
+    start가 None이면 처음부터를 의미한다.
+    """
+    if start is not None and start >= end:
+        return []
+    if not levels:
+        return [("raw", start, end)]
+
+    level, finer = levels[0], levels[1:]
+    lo = _ceil(start, level) if start is not None else None
+    hi = _floor(end, level)
+    if lo is not None and lo >= hi:
+        return plan_rollup_ranges(start, end, finer)
+
+    pieces = [(level, lo, hi)]
+    if start is not None:
+        pieces = plan_rollup_ranges(start, lo, finer) + pieces
+    return pieces + plan_rollup_ranges(hi, end, finer)
+
+
+def _piece_sql(level: str, lo: Optional[datetime], hi: datetime,
+               clientid: Optional[str], params: list) -> str:
+    conditions = []
+    time_column = "timestamp" if level == "raw" else "bucket"
+    if clientid:
+        params.append(clientid)
+        conditions.append(f"clientid = ${len(params)}")
+    if lo is not None:
+        params.append(lo)
+        conditions.append(f"{time_column} >= ${len(params)}")
+    params.append(hi)
+    conditions.append(f"{time_column} < ${len(params)}")
+    where_clause = " AND ".join(conditions)
+
+    if level == "raw":
+        return f"SELECT COUNT(*)::bigint, {_raw_aggregates()} FROM bw_data WHERE {where_clause}"
+    return f"SELECT SUM(n)::bigint, {_merge_aggregates()} FROM {ROLLUP_TABLES[level]} WHERE {where_clause}"
+
+
+def _combine(rows) -> Dict[str, Any]:
+    """구간별 부분 집계를 하나로 병합"""
+    total = sum(r[0] or 0 for r in rows)
+    merged = {"total_records": total}
+    for i, m in enumerate(ROLLUP_METRICS):
+        base = 1 + i * 4
+        count = sum(r[base] or 0 for r in rows)
+        sums = [r[base + 1] for r in rows if r[base + 1] is not None]
+        mins = [r[base + 2] for r in rows if r[base + 2] is not None]
+        maxs = [r[base + 3] for r in rows if r[base + 3] is not None]
+        merged[m] = {
+            "count": count,
+            "avg": float(sum(sums)) / count if count else None,
+            "min": float(min(mins)) if mins else None,
+            "max": float(max(maxs)) if maxs else None,
+        }
+    return merged
+
+
+async def get_rollup_aggregates(db: asyncpg.Connection, clientid: Optional[str] = None,
+                                start_date: Optional[datetime] = None,
+                                end_date: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+    """롤업 기반 구간 집계 - 롤업이 구성되지 않았으면 None
+
+    워터마크 이전은 가장 거친 롤업으로, 이후 구간은 원본에서 집계한다.
+    """
+    watermark = await get_rollup_watermark(db)
+    if watermark is None:
+        return None
+
+    end = end_date or datetime.max
+    # 워터마크가 속한 분 버킷은 아직 채워지는 중일 수 있으므로 그 이전까지만 롤업 사용
+    cutoff = min(end, _floor(watermark, "minute"))
+    pieces = plan_rollup_ranges(start_date, cutoff) if start_date is None or start_date < cutoff else []
+    tail_start = cutoff if start_date is None else max(start_date, cutoff)
+    if tail_start < end:
+        pieces.append(("raw", tail_start, end))
+
+    params: list = []
+    query = "\nUNION ALL\n".join(_piece_sql(level, lo, hi, clientid, params) for level, lo, hi in pieces)
+    rows = await db.fetch(query, *params) if pieces else []
+
+    result = _combine(rows)
+    result["watermark"] = watermark
+    result["plan"] = [
+        {"level": level, "start": lo, "end": hi if hi != datetime.max else None}
+        for level, lo, hi in pieces
+    ]
+    return result
+
+
+async def get_rollup_series(db: asyncpg.Connection, resolution: str,
+                            clientid: Optional[str] = None,
+                            start_date: Optional[datetime] = None,
+                            end_date: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """지정 해상도의 버킷별 집계 시계열 (clientid 미지정 시 전체 차량 합산)"""
+    table = ROLLUP_TABLES[resolution]
+    conditions = []
+    params = []
+    if clientid:
+        params.append(clientid)
+        conditions.append(f"clientid = ${len(params)}")
+    if start_date:
+        params.append(start_date)
+        conditions.append(f"bucket >= ${len(params)}")
+    if end_date:
+        params.append(end_date)
+        conditions.append(f"bucket < ${len(params)}")
+    where_clause = " AND ".join(conditions) if conditions else "1=1"
+
+    metric_sql = ", ".join(
+        f"SUM({m}_sum) / NULLIF(SUM({m}_count), 0) AS avg_{m}, "
+        f"MIN({m}_min) AS min_{m}, MAX({m}_max) AS max_{m}"
+        for m in ROLLUP_METRICS
+    )
+    query = f"""
+    SELECT bucket, SUM(n)::bigint AS total_records, {metric_sql}
+    FROM {table}
+    WHERE {where_clause}
+    GROUP BY bucket
+    ORDER BY bucket
+    """
+    rows = await db.fetch(query, *params)
+    return [dict(row) for row in rows]
+
+
+def _series_piece_sql(level: str, lo: datetime, hi: datetime, columns: List[str],
+                      params: list, inclusive: bool = False) -> str:
+    """시계열 버킷 집계의 한 구간 - 버킷 번호별 (첫 시각, 지표별 합계/개수)"""
+    time_column = "timestamp" if level == "raw" else "bucket"
+    params.extend([lo, hi])
+    lo_ref, hi_ref = f"${len(params) - 1}", f"${len(params)}"
+    if level == "raw":
+        source = "bw_data"
+        sums = ", ".join(f"SUM({c}) AS {c}_s, COUNT({c}) AS {c}_c" for c in columns)
+    else:
+        source = ROLLUP_TABLES[level]
+        sums = ", ".join(f"SUM({c}_sum) AS {c}_s, SUM({c}_count) AS {c}_c" for c in columns)
+    return f"""
+        SELECT floor(extract(epoch FROM {time_column} - $2)::float8 / $3)::bigint AS b,
+               MIN({time_column}) AS t, {sums}
+        FROM {source}
+        WHERE clientid = $1 AND {time_column} >= {lo_ref} AND {time_column} {'<=' if inclusive else '<'} {hi_ref}
+        GROUP BY 1
+    """
+
+
+async def get_bucketed_series(db: asyncpg.Connection, clientid: str, columns: List[str],
+                              start: datetime, end: datetime, n_buckets: int) -> List[asyncpg.Record]:
+    """[start, end] 구간을 n_buckets개 등간격 버킷의 평균 시계열로 집계 (차트 다운샘플링 전처리)
+
+    버킷 폭 이하의 가장 거친 롤업을 쓰고, 롤업 경계 밖과 워터마크 이후만 원본에서 집계하므로
+    조회 행 수가 기록 길이가 아니라 버킷 수에 비례한다. 롤업 지표가 아닌 컬럼은 원본만 사용.
+    """
+    width = max((end - start).total_seconds() / n_buckets, 1e-6)
+    levels: Tuple[str, ...] = ()
+    if all(c in ROLLUP_METRICS for c in columns):
+        usable = [r for r in ("day", "hour", "minute") if _STEPS[r].total_seconds() <= width]
+        levels = tuple(usable)
+    watermark = await get_rollup_watermark(db) if levels else None
+    cutoff = min(_floor(watermark, "minute"), end) if watermark else start
+    if cutoff < start:
+        cutoff = start
+
+    pieces = plan_rollup_ranges(start, cutoff, levels) if cutoff > start else []
+    params: list = [clientid, start, width]
+    parts = [_series_piece_sql(level, lo, hi, columns, params) for level, lo, hi in pieces]
+    parts.append(_series_piece_sql("raw", cutoff, end, columns, params, inclusive=True))
+
+    averages = ", ".join(f"SUM({c}_s) / NULLIF(SUM({c}_c), 0) AS {c}" for c in columns)
+    query = f"""
+    SELECT MIN(t) AS timestamp, {averages}
+    FROM ({" UNION ALL ".join(parts)}) p
+    GROUP BY b
+    ORDER BY 1
+    """
+    return await db.fetch(query, *params)
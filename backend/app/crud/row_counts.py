@@ -0,0 +1,90 @@
+import asyncpg
+import time
+from typing import Dict, Any, Iterable
+
+ROW_COUNT_LOG_TABLE = "bw_row_count_log"
+ROW_COUNT_LOCK_KEY = 7_310_005  # pg_try_advisory_lock 키 (정확한 행 수 집계 중복 실행 방지)
+
+# /bw-dashboard/status에서 보여주는 테이블
+DASHBOARD_COUNT_TABLES = ["bw_data", "bw_segments", "bw_segment_states", "car_type"]
+
+
+async def get_estimated_row_counts(db: asyncpg.Connection, tables: Iterable[str]) -> Dict[str, Any]:
+    """pg_class.reltuples 기반 플래너 추정 행 수 (파티션 테이블은 리프 파티션 합계)
+
+    파티션 테이블의 부모는 autovacuum이 ANALYZE하지 않아 값이 없거나(-1), 수동 ANALYZE 시
+    하위 합계와 중복되므로 제외한다. 아직 ANALYZE되지 않은 빈 파티션(-1)은 0으로 보고,
+    전부 ANALYZE된 적이 없으면 None, 테이블이 없으면 결과에서 빠진다.
+    """
+    rows = await db.fetch("""
+        WITH rels AS (
+            SELECT t.name, c.oid AS relid, c.relkind
+            FROM unnest($1::text[]) AS t(name)
+            JOIN pg_class c ON c.oid = to_regclass(t.name)
+        ),
+        leaves AS (
+            SELECT r.name, r.relid FROM rels r WHERE r.relkind <> 'p'
+            UNION ALL
+            SELECT r.name, p.relid
+            FROM rels r, pg_partition_tree(r.relid) p
+            WHERE r.relkind = 'p' AND p.isleaf
+        )
+        SELECT
+            l.name,
+            CASE WHEN bool_and(c.reltuples < 0) THEN NULL
+                 ELSE SUM(GREATEST(c.reltuples, 0))::bigint END AS estimate
+        FROM leaves l
+        JOIN pg_class c ON c.oid = l.relid
+        GROUP BY l.name
+    """, list(tables))
+    return {row["name"]: row["estimate"] for row in rows}
+
+
+async def ensure_row_count_table(db: asyncpg.Connection) -> None:
+    """테이블별 정확한 행 수 기록 테이블 생성 (없을 때만)"""
+    await db.execute(f"""
+    CREATE TABLE IF NOT EXISTS {ROW_COUNT_LOG_TABLE} (
+        table_name TEXT PRIMARY KEY,
+        row_count BIGINT,
+        counted_at TIMESTAMP,
+        duration_seconds DOUBLE PRECISION,
+        last_error TEXT,
+        last_error_at TIMESTAMP
+    )
+    """)
+
+
+async def count_table_rows(db: asyncpg.Connection, table: str) -> Dict[str, Any]:
+    """COUNT(*)로 정확한 행 수를 세고 결과를 기록 테이블에 저장"""
+    started = time.perf_counter()
+    try:
+        count = await db.fetchval(f"SELECT COUNT(*) FROM {table}")
+    except Exception as e:
+        await db.execute(f"""
+        INSERT INTO {ROW_COUNT_LOG_TABLE} (table_name, last_error, last_error_at)
+        VALUES ($1, $2, now())
+        ON CONFLICT (table_name) DO UPDATE SET
+            last_error = EXCLUDED.last_error,
+            last_error_at = EXCLUDED.last_error_at
+        """, table, str(e))
+        return {"table": table, "status": "error", "error": str(e)}
+
+    duration = time.perf_counter() - started
+    await db.execute(f"""
+    INSERT INTO {ROW_COUNT_LOG_TABLE} (table_name, row_count, counted_at, duration_seconds)
+    VALUES ($1, $2, now(), $3)
+    ON CONFLICT (table_name) DO UPDATE SET
+        row_count = EXCLUDED.row_count,
+        counted_at = EXCLUDED.counted_at,
+        duration_seconds = EXCLUDED.duration_seconds
+    """, table, count, duration)
+    return {"table": table, "status": "success", "row_count": count, "duration_seconds": duration}
+
+
+async def get_exact_row_counts(db: asyncpg.Connection) -> Dict[str, Dict[str, Any]]:
+    """마지막으로 집계한 정확한 행 수와 집계 시각 (기록 테이블이 없으면 빈 dict)"""
+    try:
+        rows = await db.fetch(f"SELECT * FROM {ROW_COUNT_LOG_TABLE} ORDER BY table_name")
+    except asyncpg.UndefinedTableError:
+        return {}
+    return {row["table_name"]: {k: v for k, v in dict(row).items() if k != "table_name"} for row in rows}
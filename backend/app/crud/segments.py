@@ -0,0 +1,424 @@
+import asyncio
+import asyncpg
+import os
+import numpy as np
+from typing import List, Optional, Dict, Any
+from datetime import datetime
+
+from ..services.segmentation import (
+    MIN_SEGMENT_RECORDS, classify_runs, split_runs, summarize_runs
+)
+from ..services.energy import efficiency_wh_per_km, integrate_segment_energy
+
+# 앱에서 증분 갱신하는 구간 테이블 (bw_segment_states와 같은 컬럼 + record_count)
+SEGMENTS_TABLE = "bw_segment_states_live"
+# 분석 API가 읽는 구간 원본: 기본은 bw_segment_states 뷰, 위 테이블로 전환 가능
+SEGMENT_STATES_TABLE = os.getenv("BW_SEGMENT_STATES_TABLE", "bw_segment_states")
+SEGMENT_WATERMARK_TABLE = "bw_segment_watermark"
+# 구간별 적분 에너지 (clientid, start_time으로 bw_segment_states / live 테이블과 조인)
+SEGMENT_ENERGY_TABLE = "bw_segment_energy"
+SEGMENT_REFRESH_LOCK_KEY = 7_310_002  # pg_try_advisory_lock 키 (구간 갱신 중복 실행 방지)
+SEGMENT_CHUNK_ROWS = 200_000
+
+_SOURCE_COLUMNS = ["timestamp", "mileage", "soc", "speed", "chg_state", "ev_state", "pack_v", "current"]
+
+_SEGMENT_COLUMNS = [
+    "clientid", "segment_id", "start_time", "end_time", "duration_seconds", "record_count",
+    "start_mileage", "end_mileage", "mileage_change", "start_soc", "end_soc", "soc_change",
+    "max_speed", "avg_speed", "engine_on_percentage", "avg_chg_state",
+    "state_code", "classification_reason",
+]
+
+_ENERGY_COLUMNS = [
+    "clientid", "start_time", "end_time", "energy_consumed_wh", "energy_charged_wh",
+    "efficiency_wh_per_km", "integrated_seconds", "sample_count",
+]
+
+_energy_table_ready = False
+
+
+async def ensure_segment_tables(db: asyncpg.Connection) -> None:
+    """구간 테이블과 차량별 워터마크 테이블 생성 (없을 때만)"""
+    await db.execute(f"""
+    CREATE TABLE IF NOT EXISTS {SEGMENTS_TABLE} (
+        clientid VARCHAR(50) NOT NULL,
+        segment_id BIGINT NOT NULL,
+        start_time TIMESTAMP NOT NULL,
+        end_time TIMESTAMP NOT NULL,
+        duration_seconds NUMERIC NOT NULL,
+        record_count INTEGER NOT NULL,
+        start_mileage DOUBLE PRECISION,
+        end_mileage DOUBLE PRECISION,
+        mileage_change DOUBLE PRECISION,
+        start_soc DOUBLE PRECISION,
+        end_soc DOUBLE PRECISION,
+        soc_change DOUBLE PRECISION,
+        max_speed DOUBLE PRECISION,
+        avg_speed DOUBLE PRECISION,
+        engine_on_percentage NUMERIC,
+        avg_chg_state NUMERIC,
+        state_code INTEGER NOT NULL,
+        classification_reason TEXT,
+        updated_at TIMESTAMP NOT NULL DEFAULT now(),
+        PRIMARY KEY (clientid, segment_id)
+    )
+    """)
+    await db.execute(
+        f"CREATE INDEX IF NOT EXISTS ix_{SEGMENTS_TABLE}_clientid_start ON {SEGMENTS_TABLE} (clientid, start_time)"
+    )
+    await db.execute(f"""
+    CREATE TABLE IF NOT EXISTS {SEGMENT_WATERMARK_TABLE} (
+        clientid VARCHAR(50) PRIMARY KEY,
+        resume_from TIMESTAMP NOT NULL,
+        resume_segment_id BIGINT NOT NULL,
+        processed_until TIMESTAMP NOT NULL,
+        updated_at TIMESTAMP NOT NULL DEFAULT now()
+    )
+    """)
+    await ensure_energy_table(db)
+
+
+async def ensure_energy_table(db: asyncpg.Connection) -> None:
+    """구간 에너지 테이블 생성 (없을 때만)"""
+    global _energy_table_ready
+    await db.execute(f"""
+    CREATE TABLE IF NOT EXISTS {SEGMENT_ENERGY_TABLE} (
+        clientid VARCHAR(50) NOT NULL,
+        start_time TIMESTAMP NOT NULL,
+        end_time TIMESTAMP NOT NULL,
+        energy_consumed_wh DOUBLE PRECISION NOT NULL,
+        energy_charged_wh DOUBLE PRECISION NOT NULL,
+        efficiency_wh_per_km DOUBLE PRECISION,
+        integrated_seconds DOUBLE PRECISION NOT NULL,
+        sample_count INTEGER NOT NULL,
+        updated_at TIMESTAMP NOT NULL DEFAULT now(),
+        PRIMARY KEY (clientid, start_time)
+    )
+    """)
+    _energy_table_ready = True
+
+
+async def energy_table_exists(db: asyncpg.Connection) -> bool:
+    """구간 에너지 테이블 존재 여부 (한 번 확인되면 이후 조회 생략)"""
+    global _energy_table_ready
+    if not _energy_table_ready:
+        _energy_table_ready = await db.fetchval(
+            "SELECT to_regclass($1) IS NOT NULL", f"public.{SEGMENT_ENERGY_TABLE}"
+        )
+    return _energy_table_ready
+
+
+async def list_bw_data_clientids(db: asyncpg.Connection) -> List[str]:
+    """bw_data의 차량 목록 - (clientid, timestamp) 인덱스를 건너뛰며 읽는 loose index scan"""
+    rows = await db.fetch("""
+        WITH RECURSIVE ids AS (
+            SELECT MIN(clientid) AS clientid FROM bw_data
+            UNION ALL
+            SELECT (SELECT MIN(clientid) FROM bw_data WHERE clientid > ids.clientid)
+            FROM ids WHERE ids.clientid IS NOT NULL
+        )
+        SELECT clientid FROM ids WHERE clientid IS NOT NULL
+    """)
+    return [row["clientid"] for row in rows]
+
+
+def _nullable(value):
+    return None if value is None or value != value else float(value)
+
+
+def _build_segments(clientid: str, rows: List[asyncpg.Record], first_segment_id: int,
+                    include_last: bool) -> Dict[str, Any]:
+    """정렬된 원본 행을 구간으로 나눠 분류하고 저장할 튜플 목록 생성 (스레드에서 실행)"""
+    timestamps = [row[0] for row in rows]
+    seconds = np.asarray(timestamps, dtype="datetime64[us]").astype(np.int64) / 1e6
+    columns = {
+        name: np.array([row[i] for row in rows], dtype=np.float64)
+        for i, name in enumerate(_SOURCE_COLUMNS) if i > 0
+    }
+
+    starts = split_runs(seconds)
+    summary = summarize_runs(seconds, columns, starts)
+    state_code, reason = classify_runs(summary)
+
+    segment_index = np.repeat(np.arange(len(starts)), summary["record_count"])
+    energy = integrate_segment_energy(
+        seconds, columns["pack_v"], columns["current"], segment_index, len(starts)
+    )
+    efficiency = efficiency_wh_per_km(energy, summary["mileage_change"])
+
+    n_runs = len(starts) if include_last else len(starts) - 1
+    records, energy_records = [], []
+    for k in range(n_runs):
+        count = int(summary["record_count"][k])
+        if count < MIN_SEGMENT_RECORDS:
+            continue
+        records.append((
+            clientid,
+            first_segment_id + k,
+            timestamps[summary["start_index"][k]],
+            timestamps[summary["end_index"][k] - 1],
+            float(summary["duration_seconds"][k]),
+            count,
+            _nullable(summary["start_mileage"][k]),
+            _nullable(summary["end_mileage"][k]),
+            _nullable(summary["mileage_change"][k]),
+            _nullable(summary["start_soc"][k]),
+            _nullable(summary["end_soc"][k]),
+            _nullable(summary["soc_change"][k]),
+            _nullable(summary["max_speed"][k]),
+            _nullable(summary["avg_speed"][k]),
+            _nullable(summary["engine_on_percentage"][k]),
+            _nullable(summary["avg_chg_state"][k]),
+            int(state_code[k]),
+            str(reason[k]),
+        ))
+        energy_records.append(_energy_record(clientid, records[-1][2], records[-1][3], energy, efficiency, k))
+
+    last = len(starts) - 1
+    return {
+        "records": records,
+        "energy_records": energy_records,
+        "runs": len(starts),
+        "resume_from": timestamps[starts[last]],
+        "resume_segment_id": first_segment_id + last,
+    }
+
+
+def _energy_record(clientid: str, start_time, end_time, energy: Dict[str, np.ndarray],
+                   efficiency: np.ndarray, k: int) -> tuple:
+    return (
+        clientid,
+        start_time,
+        end_time,
+        float(energy["energy_consumed_wh"][k]),
+        float(energy["energy_charged_wh"][k]),
+        _nullable(efficiency[k]),
+        float(energy["integrated_seconds"][k]),
+        int(energy["sample_count"][k]),
+    )
+
+
+def _upsert_energy_sql() -> str:
+    placeholders = ", ".join(f"${i}" for i in range(1, len(_ENERGY_COLUMNS) + 1))
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in _ENERGY_COLUMNS[2:])
+    return f"""
+    INSERT INTO {SEGMENT_ENERGY_TABLE} ({", ".join(_ENERGY_COLUMNS)})
+    VALUES ({placeholders})
+    ON CONFLICT (clientid, start_time) DO UPDATE SET {updates}, updated_at = now()
+    """
+
+
+def _upsert_segments_sql() -> str:
+    placeholders = ", ".join(f"${i}" for i in range(1, len(_SEGMENT_COLUMNS) + 1))
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in _SEGMENT_COLUMNS[2:])
+    return f"""
+    INSERT INTO {SEGMENTS_TABLE} ({", ".join(_SEGMENT_COLUMNS)})
+    VALUES ({placeholders})
+    ON CONFLICT (clientid, segment_id) DO UPDATE SET {updates}, updated_at = now()
+    """
+
+
+async def refresh_vehicle_segments(db: asyncpg.Connection, clientid: str,
+                                   chunk_rows: int = SEGMENT_CHUNK_ROWS) -> Dict[str, Any]:
+    """한 차량의 워터마크 이후 원본만 읽어 구간을 분류하고 upsert
+
+    워터마크는 마지막 구간(아직 이어질 수 있는 열린 구간)의 시작 시각이며,
+    다음 갱신은 그 시각부터 다시 읽어 열린 구간을 같은 segment_id로 덮어쓴다.
+    원본은 chunk_rows 단위로 읽고 청크 끝에 걸친 구간은 다음 청크로 넘긴다.
+    """
+    watermark = await db.fetchrow(
+        f"SELECT resume_from, resume_segment_id, processed_until FROM {SEGMENT_WATERMARK_TABLE} WHERE clientid = $1",
+        clientid
+    )
+    latest = await db.fetchval("SELECT MAX(timestamp) FROM bw_data WHERE clientid = $1", clientid)
+    if latest is None or (watermark and latest <= watermark["processed_until"]):
+        return {"clientid": clientid, "rows": 0, "segments": 0}
+
+    resume_from = watermark["resume_from"] if watermark else None
+    segment_id = watermark["resume_segment_id"] if watermark else 1
+    limit = chunk_rows
+    total_rows = total_segments = 0
+    upsert_sql = _upsert_segments_sql()
+
+    while True:
+        condition = "AND timestamp >= $2" if resume_from else ""
+        params = [clientid, resume_from] if resume_from else [clientid]
+        rows = await db.fetch(f"""
+            SELECT {", ".join(_SOURCE_COLUMNS)}
+            FROM bw_data
+            WHERE clientid = $1 {condition}
+            ORDER BY timestamp
+            LIMIT {limit}
+        """, *params)
+        if not rows:
+            break
+
+        complete = len(rows) < limit
+        built = await asyncio.to_thread(_build_segments, clientid, rows, segment_id, complete)
+        if not complete and built["runs"] == 1:
+            # 청크 전체가 하나의 열린 구간이면 더 크게 다시 읽음
+            limit *= 2
+            continue
+
+        async with db.transaction():
+            if built["records"]:
+                await db.executemany(upsert_sql, built["records"])
+                await db.executemany(_upsert_energy_sql(), built["energy_records"])
+            await db.execute(f"""
+            INSERT INTO {SEGMENT_WATERMARK_TABLE} (clientid, resume_from, resume_segment_id, processed_until, updated_at)
+            VALUES ($1, $2, $3, $4, now())
+            ON CONFLICT (clientid) DO UPDATE SET
+                resume_from = EXCLUDED.resume_from,
+                resume_segment_id = EXCLUDED.resume_segment_id,
+                processed_until = EXCLUDED.processed_until,
+                updated_at = now()
+            """, clientid, built["resume_from"], built["resume_segment_id"], rows[-1]["timestamp"])
+
+        total_rows += len(rows)
+        total_segments += len(built["records"])
+        resume_from, segment_id = built["resume_from"], built["resume_segment_id"]
+        limit = chunk_rows
+        if complete:
+            break
+
+    return {"clientid": clientid, "rows": total_rows, "segments": total_segments}
+
+
+def _build_energy_records(clientid: str, segments: List[asyncpg.Record],
+                          rows: List[asyncpg.Record]) -> List[tuple]:
+    """구간 목록과 해당 기간 원본 행으로 구간별 에너지 튜플 생성 (스레드에서 실행)"""
+    seg_start = np.asarray([s["start_time"] for s in segments], dtype="datetime64[us]").astype(np.int64) / 1e6
+    seg_end = np.asarray([s["end_time"] for s in segments], dtype="datetime64[us]").astype(np.int64) / 1e6
+    mileage_change = np.array([s["mileage_change"] for s in segments], dtype=np.float64)
+
+    if rows:
+        seconds = np.asarray([r[0] for r in rows], dtype="datetime64[us]").astype(np.int64) / 1e6
+        pack_v = np.array([r[1] for r in rows], dtype=np.float64)
+        current = np.array([r[2] for r in rows], dtype=np.float64)
+    else:
+        seconds = pack_v = current = np.empty(0)
+
+    # 각 샘플을 시작 시각 기준으로 구간에 배정하고 구간 끝을 넘으면 제외
+    owner = np.searchsorted(seg_start, seconds, side="right") - 1
+    inside = (owner >= 0) & (seconds <= seg_end[np.maximum(owner, 0)])
+    segment_index = np.where(inside, owner, -1)
+
+    energy = integrate_segment_energy(seconds, pack_v, current, segment_index, len(segments))
+    efficiency = efficiency_wh_per_km(energy, mileage_change)
+    return [
+        _energy_record(clientid, seg["start_time"], seg["end_time"], energy, efficiency, k)
+        for k, seg in enumerate(segments)
+    ]
+
+
+async def refresh_vehicle_energy(db: asyncpg.Connection, clientid: str,
+                                 source_table: str = SEGMENT_STATES_TABLE,
+                                 batch_segments: int = 500) -> Dict[str, Any]:
+    """에너지가 없거나 끝 시각이 바뀐 구간만 원본 pack_v * current를 적분해 저장"""
+    segments = await db.fetch(f"""
+        SELECT s.start_time, s.end_time, s.mileage_change
+        FROM {source_table} s
+        LEFT JOIN {SEGMENT_ENERGY_TABLE} e
+          ON e.clientid = s.clientid AND e.start_time = s.start_time
+        WHERE s.clientid = $1
+          AND (e.clientid IS NULL OR e.end_time <> s.end_time)
+        ORDER BY s.start_time
+    """, clientid)
+
+    upsert_sql = _upsert_energy_sql()
+    for i in range(0, len(segments), batch_segments):
+        batch = segments[i:i + batch_segments]
+        rows = await db.fetch("""
+            SELECT timestamp, pack_v, current
+            FROM bw_data
+            WHERE clientid = $1 AND timestamp >= $2 AND timestamp <= $3
+            ORDER BY timestamp
+        """, clientid, batch[0]["start_time"], batch[-1]["end_time"])
+        records = await asyncio.to_thread(_build_energy_records, clientid, batch, rows)
+        await db.executemany(upsert_sql, records)
+
+    return {"clientid": clientid, "segments": len(segments)}
+
+
+async def refresh_segment_energy(pool: asyncpg.Pool, clientids: Optional[List[str]] = None,
+                                 source_table: str = SEGMENT_STATES_TABLE,
+                                 max_concurrency: int = 4) -> Dict[str, Any]:
+    """구간 원본 테이블(기본: bw_segment_states)의 구간 에너지를 일괄 계산"""
+    started = datetime.now()
+    async with pool.acquire() as db:
+        await ensure_energy_table(db)
+        if clientids is None:
+            clientids = [r["clientid"] for r in await db.fetch(f"SELECT DISTINCT clientid FROM {source_table}")]
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def refresh_one(clientid: str) -> Dict[str, Any]:
+        async with semaphore:
+            async with pool.acquire() as conn:
+                return await refresh_vehicle_energy(conn, clientid, source_table)
+
+    results = await asyncio.gather(*(refresh_one(cid) for cid in clientids))
+    return {
+        "status": "success",
+        "message": "구간 에너지가 갱신되었습니다.",
+        "source_table": source_table,
+        "vehicles": len(clientids),
+        "segments": sum(r["segments"] for r in results),
+        "duration_seconds": (datetime.now() - started).total_seconds()
+    }
+
+
+async def refresh_segments(pool: asyncpg.Pool, clientids: Optional[List[str]] = None,
+                           max_concurrency: int = 4) -> Dict[str, Any]:
+    """전체(또는 지정) 차량의 구간을 증분 갱신 - 차량 단위로 풀 연결 여러 개에서 동시 처리"""
+    started = datetime.now()
+    async with pool.acquire() as lock_conn:
+        locked = await lock_conn.fetchval("SELECT pg_try_advisory_lock($1)", SEGMENT_REFRESH_LOCK_KEY)
+        if not locked:
+            return {"status": "skipped", "message": "다른 구간 갱신이 진행 중입니다."}
+        try:
+            await ensure_segment_tables(lock_conn)
+            if clientids is None:
+                clientids = await list_bw_data_clientids(lock_conn)
+
+            semaphore = asyncio.Semaphore(max_concurrency)
+
+            async def refresh_one(clientid: str) -> Dict[str, Any]:
+                async with semaphore:
+                    async with pool.acquire() as conn:
+                        return await refresh_vehicle_segments(conn, clientid)
+
+            results = await asyncio.gather(*(refresh_one(cid) for cid in clientids))
+        finally:
+            await lock_conn.execute("SELECT pg_advisory_unlock($1)", SEGMENT_REFRESH_LOCK_KEY)
+
+    updated = [r for r in results if r["rows"]]
+    return {
+        "status": "success",
+        "message": "구간 데이터가 갱신되었습니다.",
+        "vehicles": len(clientids),
+        "updated_vehicles": len(updated),
+        "rows": sum(r["rows"] for r in updated),
+        "segments": sum(r["segments"] for r in updated),
+        "duration_seconds": (datetime.now() - started).total_seconds()
+    }
+
+
+async def get_segment_refresh_status(db: asyncpg.Connection) -> Dict[str, Any]:
+    """구간 갱신 현황 - 차량 수, 구간 수, 가장 오래된/최근 워터마크"""
+    try:
+        row = await db.fetchrow(f"""
+            SELECT
+                COUNT(*) AS vehicles,
+                MIN(processed_until) AS oldest_processed_until,
+                MAX(processed_until) AS latest_processed_until,
+                MAX(updated_at) AS last_refreshed_at
+            FROM {SEGMENT_WATERMARK_TABLE}
+        """)
+        segments = await db.fetchval(
+            "SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE oid = $1::text::regclass",
+            SEGMENTS_TABLE
+        )
+    except asyncpg.UndefinedTableError:
+        return {"status": "error", "message": "구간 테이블이 아직 생성되지 않았습니다.", "initialized": False}
+    return {"status": "success", "initialized": True, "estimated_segments": segments, **dict(row)}
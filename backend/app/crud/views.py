@@ -0,0 +1,158 @@
+import asyncpg
+import time
+from typing import List, Optional, Dict, Any, Iterable, Set
+from datetime import datetime
+
+VIEW_REFRESH_LOG_TABLE = "bw_view_refresh_log"
+VIEW_REFRESH_LOCK_KEY = 7_310_004  # pg_try_advisory_lock 키 (뷰 새로고침 작업 중복 실행 방지)
+
+
+async def list_materialized_views(db: asyncpg.Connection) -> Dict[str, Dict[str, Any]]:
+    """public 스키마의 머티리얼라이즈드 뷰와 CONCURRENTLY 가능 여부
+
+    CONCURRENTLY는 뷰가 채워져 있고, 컬럼만으로 된(식/WHERE 없는) 유효한 UNIQUE 인덱스가 있어야 한다.
+    """
+    rows = await db.fetch("""
+        SELECT
+            c.relname AS name,
+            c.relispopulated AS populated,
+            EXISTS (
+                SELECT 1 FROM pg_index i
+                WHERE i.indrelid = c.oid
+                  AND i.indisunique AND i.indisvalid
+                  AND i.indpred IS NULL AND i.indexprs IS NULL
+            ) AS has_unique_index
+        FROM pg_class c
+        WHERE c.relkind = 'm' AND c.relnamespace = 'public'::regnamespace
+        ORDER BY c.relname
+    """)
+    return {
+        row["name"]: {**dict(row), "concurrently": row["populated"] and row["has_unique_index"]}
+        for row in rows
+    }
+
+
+async def get_view_dependencies(db: asyncpg.Connection) -> Dict[str, Set[str]]:
+    """뷰/머티리얼라이즈드 뷰 → 직접 참조하는 뷰/머티리얼라이즈드 뷰 목록 (pg_depend 기준)"""
+    rows = await db.fetch("""
+        SELECT DISTINCT v.relname AS name, ref.relname AS depends_on
+        FROM pg_class v
+        JOIN pg_rewrite r ON r.ev_class = v.oid
+        JOIN pg_depend d ON d.objid = r.oid
+        JOIN pg_class ref ON ref.oid = d.refobjid
+        WHERE v.relkind IN ('m', 'v')
+          AND ref.relkind IN ('m', 'v')
+          AND ref.oid <> v.oid
+          AND v.relnamespace = 'public'::regnamespace
+          AND ref.relnamespace = 'public'::regnamespace
+    """)
+    deps: Dict[str, Set[str]] = {}
+    for row in rows:
+        deps.setdefault(row["name"], set()).add(row["depends_on"])
+    return deps
+
+
+def downstream_views(roots: Iterable[str], deps: Dict[str, Set[str]]) -> Set[str]:
+    """roots와 roots에 (간접적으로) 의존하는 모든 뷰"""
+    dependents: Dict[str, Set[str]] = {}
+    for name, refs in deps.items():
+        for ref in refs:
+            dependents.setdefault(ref, set()).add(name)
+    seen, stack = set(), list(roots)
+    while stack:
+        name = stack.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        stack.extend(dependents.get(name, ()))
+    return seen
+
+
+def plan_refresh_order(matviews: Iterable[str], deps: Dict[str, Set[str]],
+                       targets: Optional[Iterable[str]] = None,
+                       include_dependents: bool = True) -> List[str]:
+    """의존 순서(참조되는 뷰 먼저)로 새로고침할 머티리얼라이즈드 뷰 목록
+
+    targets 미지정 시 전체, include_dependents면 targets에 의존하는 뷰까지 포함한다.
+    일반 뷰는 새로고침하지 않지만 머티리얼라이즈드 뷰 사이의 간접 의존을 잇는 데 사용한다.
+    """
+    matviews = set(matviews)
+    if targets is None:
+        selected = set(matviews)
+    else:
+        selected = downstream_views(targets, deps) if include_dependents else set(targets)
+
+    nodes = set(deps) | {ref for refs in deps.values() for ref in refs} | matviews
+    remaining = {name: set(deps.get(name, ())) & nodes for name in nodes}
+    order = []
+    ready = sorted(name for name, refs in remaining.items() if not refs)
+    while ready:
+        name = ready.pop(0)
+        order.append(name)
+        del remaining[name]
+        newly_ready = [n for n, refs in remaining.items() if name in refs and len(refs) == 1]
+        for refs in remaining.values():
+            refs.discard(name)
+        ready = sorted(ready + newly_ready)
+    if remaining:
+        raise ValueError(f"뷰 의존 관계에 순환이 있습니다: {sorted(remaining)}")
+    return [name for name in order if name in matviews and name in selected]
+
+
+async def ensure_refresh_log_table(db: asyncpg.Connection) -> None:
+    """뷰별 새로고침 이력 테이블 생성 (없을 때만)"""
+    await db.execute(f"""
+    CREATE TABLE IF NOT EXISTS {VIEW_REFRESH_LOG_TABLE} (
+        view_name TEXT PRIMARY KEY,
+        last_started_at TIMESTAMP,
+        last_success_at TIMESTAMP,
+        last_duration_seconds DOUBLE PRECISION,
+        last_concurrently BOOLEAN,
+        last_error TEXT,
+        last_error_at TIMESTAMP
+    )
+    """)
+
+
+async def refresh_materialized_view(db: asyncpg.Connection, name: str,
+                                    concurrently: bool = False) -> Dict[str, Any]:
+    """머티리얼라이즈드 뷰 하나를 새로고침하고 소요 시간/결과를 이력 테이블에 기록
+
+    CONCURRENTLY면 새로고침 중에도 기존 내용을 계속 조회할 수 있다.
+    """
+    started_at = datetime.now()
+    started = time.perf_counter()
+    try:
+        await db.execute(f"REFRESH MATERIALIZED VIEW {'CONCURRENTLY ' if concurrently else ''}{name}")
+    except Exception as e:
+        await db.execute(f"""
+        INSERT INTO {VIEW_REFRESH_LOG_TABLE} (view_name, last_started_at, last_error, last_error_at)
+        VALUES ($1, $2, $3, now())
+        ON CONFLICT (view_name) DO UPDATE SET
+            last_started_at = EXCLUDED.last_started_at,
+            last_error = EXCLUDED.last_error,
+            last_error_at = EXCLUDED.last_error_at
+        """, name, started_at, str(e))
+        return {"view": name, "status": "error", "concurrently": concurrently, "error": str(e)}
+
+    duration = time.perf_counter() - started
+    await db.execute(f"""
+    INSERT INTO {VIEW_REFRESH_LOG_TABLE}
+        (view_name, last_started_at, last_success_at, last_duration_seconds, last_concurrently)
+    VALUES ($1, $2, now(), $3, $4)
+    ON CONFLICT (view_name) DO UPDATE SET
+        last_started_at = EXCLUDED.last_started_at,
+        last_success_at = EXCLUDED.last_success_at,
+        last_duration_seconds = EXCLUDED.last_duration_seconds,
+        last_concurrently = EXCLUDED.last_concurrently
+    """, name, started_at, duration, concurrently)
+    return {"view": name, "status": "success", "concurrently": concurrently, "duration_seconds": duration}
+
+
+async def get_refresh_log(db: asyncpg.Connection) -> Dict[str, Dict[str, Any]]:
+    """뷰별 마지막 새로고침 시각/소요 시간 (이력 테이블이 없으면 빈 dict)"""
+    try:
+        rows = await db.fetch(f"SELECT * FROM {VIEW_REFRESH_LOG_TABLE} ORDER BY view_name")
+    except asyncpg.UndefinedTableError:
+        return {}
+    return {row["view_name"]: {k: v for k, v in dict(row).items() if k != "view_name"} for row in rows}
@@ -7,6 +7,7 @@ load_dotenv()
 
 # 환경변수에서 데이터베이스 연결 정보 가져오기
 DATABASE_URL = os.getenv("DATABASE_URL")
+DB_POOL_MAX_SIZE = 10
 
 
 # 전역 데이터베이스 연결 풀
@@ -23,7 +24,7 @@ async def get_db_pool():
             password=os.getenv("DB_PASSWORD"),
             database=os.getenv("DB_NAME"),
             min_size=1,
-            max_size=10
+            max_size=DB_POOL_MAX_SIZE
         )
     return _db_pool
 
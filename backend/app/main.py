@@ -1,6 +1,18 @@
+import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .api.v1 import vehicles, performance, analytics, ev_chat, battery_trend
+from .api.v1 import vehicles, performance, analytics, ev_chat, battery_trend, ingest, admin
+from .services.ingest import bw_data_ingestor
+from .services.segment_refresh import segment_refresher
+from .services.view_refresh import view_refresher
+from .services.row_counts import row_count_verifier
+from .services.rollup_refresh import rollup_refresher
+from .services.partition_maintenance import partition_maintainer
+from .services.forecast_refresh import soh_forecaster
+from .crud.battery_trend import TREND_SOURCES, trend_refresh_hook
+from .crud.analytics import ensure_vehicle_status_indexes
+from .crud.bw_data import ensure_bw_data_indexes
+from .database.base import get_db_pool
 
 app = FastAPI(
     title="BAAS Analysis API",
@@ -15,14 +27,104 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # keyset 페이지네이션 커서
 )
 
 # API 라우터 등록
 app.include_router(vehicles.router, prefix="/api/v1")
 app.include_router(performance.router, prefix="/api/v1")
 app.include_router(analytics.router, prefix="/api/v1")
+app.include_router(ingest.router, prefix="/api/v1")
 app.include_router(ev_chat.router, prefix="/api/v1/ev-chat", tags=["EV Chat"])
 app.include_router(battery_trend.router, prefix="/api/v1/battery-trend", tags=["Battery Trend"])
+# 파티션 전환 등 되돌릴 수 없는 DDL 엔드포인트는 명시적으로 켠 경우에만 등록
+if os.getenv("BW_ENABLE_ADMIN_API", "false").lower() in ("1", "true", "yes"):
+    app.include_router(admin.router, prefix="/api/v1")
+
+@app.on_event("startup")
+async def create_bw_data_indexes():
+    """bw_data keyset 페이지네이션용 인덱스 생성 (파티션 전환 전 일반 테이블일 때)"""
+    try:
+        pool = await get_db_pool()
+        async with pool.acquire() as db:
+            await ensure_bw_data_indexes(db)
+    except Exception as e:
+        print(f"bw_data 인덱스 확인 실패: {e}")
+
+@app.on_event("startup")
+async def create_vehicle_status_indexes():
+    """bw_vehicle_status 정렬용 인덱스 생성 (GET 요청 중 DDL을 실행하지 않도록 시작 시 한 번)"""
+    try:
+        pool = await get_db_pool()
+        async with pool.acquire() as db:
+            await ensure_vehicle_status_indexes(db)
+    except Exception as e:
+        print(f"bw_vehicle_status 인덱스 확인 실패: {e}")
+
+@app.on_event("startup")
+async def start_segment_refresher():
+    """구간 주기 갱신 시작 (BW_SEGMENT_REFRESH_INTERVAL_SECONDS > 0일 때)"""
+    segment_refresher.start()
+
+@app.on_event("startup")
+async def start_rollup_refresher():
+    """bw_data 롤업 주기 갱신 시작 (BW_ROLLUP_REFRESH_INTERVAL_SECONDS > 0, 롤업 구성 후)"""
+    rollup_refresher.start()
+
+@app.on_event("startup")
+async def start_partition_maintainer():
+    """bw_data 미래 파티션 생성/보존 기간 정리 시작 (BW_PARTITION_MAINTENANCE_INTERVAL_SECONDS > 0일 때)"""
+    partition_maintainer.start()
+
+@app.on_event("startup")
+async def start_view_refresher():
+    """머티리얼라이즈드 뷰 주기 새로고침 시작 (BW_VIEW_REFRESH_INTERVAL_SECONDS > 0일 때)"""
+    # eSOH 뷰가 새로고침되면 추세 인덱스 등 파생 테이블도 갱신
+    for granularity, source in TREND_SOURCES.items():
+        view_refresher.on_refresh(source["view"], trend_refresh_hook(granularity))
+    # 예측 대상 기간 단위의 뷰가 새로고침되면 SOH 열화 예측도 다시 계산
+    for granularity in soh_forecaster.granularities:
+        view_refresher.on_refresh(TREND_SOURCES[granularity]["view"], soh_forecaster.refresh_hook(granularity))
+    view_refresher.start()
+
+@app.on_event("startup")
+async def start_row_count_verifier():
+    """상태 API용 정확한 행 수 주기 집계 시작 (BW_EXACT_COUNT_INTERVAL_SECONDS > 0일 때)"""
+    row_count_verifier.start()
+
+@app.on_event("startup")
+async def start_soh_forecaster():
+    """SOH 열화 예측 주기 계산 시작 (BW_SOH_FORECAST_INTERVAL_SECONDS > 0일 때)"""
+    soh_forecaster.start()
+
+@app.on_event("shutdown")
+async def flush_ingest_buffer():
+    """종료 전 적재 대기 중인 행을 모두 기록"""
+    await bw_data_ingestor.close()
+
+@app.on_event("shutdown")
+async def stop_segment_refresher():
+    await segment_refresher.stop()
+
+@app.on_event("shutdown")
+async def stop_rollup_refresher():
+    await rollup_refresher.stop()
+
+@app.on_event("shutdown")
+async def stop_partition_maintainer():
+    await partition_maintainer.stop()
+
+@app.on_event("shutdown")
+async def stop_view_refresher():
+    await view_refresher.stop()
+
+@app.on_event("shutdown")
+async def stop_row_count_verifier():
+    await row_count_verifier.stop()
+
+@app.on_event("shutdown")
+async def stop_soh_forecaster():
+    await soh_forecaster.stop()
 
 @app.get("/")
 def read_root():
@@ -1,6 +1,7 @@
-from pydantic import BaseModel
+from functools import lru_cache
+from pydantic import BaseModel, TypeAdapter, create_model
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional, Tuple, Type
 
 class BwDataResponse(BaseModel):
     clientid: str
@@ -19,6 +20,10 @@ class BwDataResponse(BaseModel):
     current: Optional[float] = None
     chg_sac: Optional[float] = None
     speed: Optional[float] = None
+    soc: Optional[float] = None
+    soh: Optional[float] = None
+    chg_state: Optional[int] = None
+    ev_state: Optional[int] = None
     cell_max: Optional[float] = None
     cell_min: Optional[float] = None
     cell_mean: Optional[float] = None
@@ -31,6 +36,21 @@ class BwDataResponse(BaseModel):
     class Config:
         from_attributes = True
 
+@lru_cache(maxsize=128)
+def bw_data_projection_model(fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """요청 컬럼만 가진 BwDataResponse 축소 모델 (컬럼 조합별로 캐시)"""
+    definitions = {
+        name: (field.annotation, field.default if not field.is_required() else ...)
+        for name, field in BwDataResponse.model_fields.items()
+        if name in fields
+    }
+    return create_model(f"BwDataResponse_{'_'.join(fields)}", __config__=BwDataResponse.model_config, **definitions)
+
+@lru_cache(maxsize=128)
+def bw_data_projection_adapter(fields: Tuple[str, ...]) -> TypeAdapter:
+    """축소 모델 목록 검증/직렬화용 TypeAdapter"""
+    return TypeAdapter(List[bw_data_projection_model(fields)])
+
 class BwDataFilter(BaseModel):
     clientid: Optional[str] = None
     start_date: Optional[datetime] = None
@@ -0,0 +1,162 @@
+import asyncio
+import functools
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+# 뷰 새로고침 시 무효화되므로 TTL은 새로고침 누락에 대비한 상한
+DEFAULT_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+DEFAULT_MAXSIZE = int(os.getenv("RESPONSE_CACHE_MAXSIZE", "256"))
+# 차량별 세션 eSOH 추세 캐시 - 차량 수만큼 항목이 생기므로 공유 캐시와 분리해 크기를 따로 제한
+SESSION_TREND_CACHE_MAXSIZE = int(os.getenv("BW_SESSION_TREND_CACHE_MAXSIZE", "2048"))
+SESSION_TREND_CACHE_TTL_SECONDS = float(os.getenv("BW_SESSION_TREND_CACHE_TTL_SECONDS", "900"))
+
+
+class ViewCache:
+    """TTL + LRU 프로세스 내 캐시 - 항목마다 원본 뷰/테이블 태그를 달아 새로고침 시 태그 단위로 무효화
+
+    같은 키를 동시에 요청하면 한 번만 조회하고 나머지는 그 결과를 기다린다.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE, ttl: float = DEFAULT_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any, Tuple[str, ...]]]" = OrderedDict()
+        self._tags: Dict[str, Set[Hashable]] = {}
+        self._loading: Dict[Hashable, asyncio.Future] = {}
+        self._generation: Dict[str, int] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires, value, _ = entry
+        if expires < time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[str], ttl: Optional[float] = None):
+        tags = tuple(tags)
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + (ttl if ttl is not None else self.ttl), value, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: Hashable):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate(self, *tags: str) -> int:
+        """태그(뷰/테이블 이름)에 묶인 항목 삭제 - 진행 중인 조회 결과도 저장되지 않도록 세대 증가"""
+        removed = 0
+        for tag in tags:
+            self._generation[tag] = self._generation.get(tag, 0) + 1
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+                removed += 1
+        self.invalidations += removed
+        return removed
+
+    def generation(self, tag: str) -> int:
+        """태그가 무효화된 횟수 - 캐시 밖에서 파생 상태를 유지하는 쪽이 재구성 시점을 판단할 때 사용"""
+        return self._generation.get(tag, 0)
+
+    def clear(self) -> int:
+        removed = len(self._entries)
+        self.invalidate(*list(self._tags))
+        return removed
+
+    async def get_or_load(self, key: Hashable, tags: Iterable[str],
+                          loader: Callable[[], Awaitable[Any]], ttl: Optional[float] = None) -> Any:
+        tags = tuple(tags)
+        found, value = self.get(key)
+        if found:
+            self.hits += 1
+            return value
+
+        pending = self._loading.get(key)
+        if pending is not None:
+            self.hits += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+            # 먼저 조회하던 요청이 취소됨 (클라이언트 연결 종료 등) - 이 요청이 다시 조회
+            return await self.get_or_load(key, tags, loader, ttl)
+
+        self.misses += 1
+        generation = tuple(self._generation.get(tag, 0) for tag in tags)
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            # 대기 중인 요청이 영원히 기다리지 않도록 취소를 알림 (대기 요청은 다시 조회)
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 대기 중인 요청이 없으면 예외 미조회 경고가 나지 않도록 소비
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            if generation == tuple(self._generation.get(tag, 0) for tag in tags):
+                self.set(key, value, tags, ttl)
+            return value
+        finally:
+            self._loading.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "entries_by_tag": {tag: len(keys) for tag, keys in sorted(self._tags.items())}
+        }
+
+
+# 프로세스 단위 공유 캐시
+view_cache = ViewCache()
+# 차량별 항목이 공유 캐시의 fleet 단위 항목(랭킹, 요약 등)을 밀어내지 않도록 분리한 캐시
+session_trend_cache = ViewCache(maxsize=SESSION_TREND_CACHE_MAXSIZE, ttl=SESSION_TREND_CACHE_TTL_SECONDS)
+
+
+def cached_view(*tags: str, ttl: Optional[float] = None, cache: Optional[ViewCache] = None):
+    """첫 인자가 DB 연결인 crud 함수의 결과를 나머지 인자 기준으로 캐시 (cache 미지정 시 view_cache)"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(db, *args, **kwargs):
+            key = (func.__module__, func.__qualname__, args, tuple(sorted(kwargs.items())))
+            target = cache if cache is not None else view_cache
+            return await target.get_or_load(key, tags, lambda: func(db, *args, **kwargs), ttl)
+        return wrapper
+    return decorator
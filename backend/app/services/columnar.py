@@ -0,0 +1,84 @@
+import io
+from typing import List, Optional
+
+import asyncpg
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+COLUMNAR_MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# 값이 모두 NULL인 배치에서도 타입이 흔들리지 않도록 bw_data 컬럼 타입을 고정
+_KNOWN_TYPES = {
+    "clientid": pa.string(),
+    "timestamp": pa.timestamp("us"),
+    "chg_state": pa.int32(),
+    "ev_state": pa.int32(),
+}
+
+
+def _infer_field(name: str, values: tuple) -> pa.Field:
+    if name in _KNOWN_TYPES:
+        return pa.field(name, _KNOWN_TYPES[name])
+    inferred = pa.array(values).type
+    if pa.types.is_null(inferred) or pa.types.is_decimal(inferred):
+        inferred = pa.float64()
+    return pa.field(name, inferred)
+
+
+def records_to_batch(records: List[asyncpg.Record],
+                     schema: Optional[pa.Schema] = None) -> pa.RecordBatch:
+    """asyncpg 레코드 목록을 행 → 열로 전치하여 Arrow RecordBatch로 변환"""
+    names = list(records[0].keys())
+    columns = list(zip(*(tuple(r) for r in records)))
+    if schema is None:
+        schema = pa.schema([_infer_field(n, c) for n, c in zip(names, columns)])
+    arrays = [pa.array(c, type=f.type) for c, f in zip(columns, schema)]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class ColumnarEncoder:
+    """레코드 배치를 Arrow IPC 스트림 또는 Parquet 파일 바이트로 점진적 변환
+
+    첫 배치에서 스키마를 정하고, 이후 배치는 같은 스키마로 이어 쓴다.
+    Parquet은 배치마다 row group 하나를 쓰며 footer는 finish()에서 출력된다.
+    """
+
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        self.sink = io.BytesIO()
+        self.schema: Optional[pa.Schema] = None
+        self.writer = None
+
+    def _drain(self) -> bytes:
+        data = self.sink.getvalue()
+        self.sink.seek(0)
+        self.sink.truncate()
+        return data
+
+    def _open(self, schema: pa.Schema):
+        self.schema = schema
+        if self.fmt == "parquet":
+            self.writer = pq.ParquetWriter(self.sink, schema, compression="zstd")
+        else:
+            self.writer = pa.ipc.new_stream(self.sink, schema)
+
+    def encode(self, records: List[asyncpg.Record]) -> bytes:
+        if not records:
+            return b""
+        batch = records_to_batch(records, self.schema)
+        if self.writer is None:
+            self._open(batch.schema)
+        if self.fmt == "parquet":
+            self.writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            self.writer.write_batch(batch)
+        return self._drain()
+
+    def finish(self) -> bytes:
+        if self.writer is None:
+            self._open(pa.schema([]))
+        self.writer.close()
+        return self._drain()
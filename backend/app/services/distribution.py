@@ -0,0 +1,183 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import asyncpg
+import numpy as np
+
+from ..crud import analytics as analytics_crud
+from ..crud.segments import SEGMENT_STATES_TABLE
+from .cache import view_cache
+from .sketch import DEFAULT_SKETCH_K, KLLSketch
+
+ALL_CAR_TYPES = "전체"
+DEFAULT_PERCENTILES = (1, 5, 10, 25, 50, 75, 90, 95, 99)
+# 조회 시 구간 스케치가 이보다 오래됐으면 새 구간을 먼저 반영
+DISTRIBUTION_SEGMENT_MAX_AGE_SECONDS = float(os.getenv("BW_DISTRIBUTION_SEGMENT_MAX_AGE_SECONDS", "300"))
+DISTRIBUTION_SKETCH_K = int(os.getenv("BW_DISTRIBUTION_SKETCH_K", str(DEFAULT_SKETCH_K)))
+
+# 차량 단위 지표 (battery_performance_ranking 한 행 = 차량 하나)
+RANKING_METRICS: Dict[str, Callable[[Dict[str, Any]], Optional[float]]] = {
+    "total_battery_score": lambda item: item["scores"]["total"],
+    "avg_soh": lambda item: item["metrics"]["avg_soh"],
+    "avg_cell_imbalance": lambda item: item["metrics"]["avg_cell_imbalance"],
+    "avg_soc_per_km": lambda item: item["metrics"]["avg_soc_per_km"],
+    "avg_temp_range": lambda item: item["metrics"]["avg_temp_range"],
+    "avg_start_soc": lambda item: item["metrics"]["avg_start_soc"],
+    "avg_end_soc": lambda item: item["metrics"]["avg_end_soc"],
+}
+# 구간 단위 지표 (주행 구간 하나 = 표본 하나)
+SEGMENT_METRICS = {
+    "segment_soc_per_km": "soc_per_km",
+    "segment_wh_per_km": "efficiency_wh_per_km",
+}
+DISTRIBUTION_METRICS = (*RANKING_METRICS, *SEGMENT_METRICS)
+
+
+class FleetDistribution:
+    """차종별/지표별 KLL 스케치로 차량군 분포(백분위, 히스토그램)를 상수 시간에 제공
+
+    - 랭킹 지표: 랭킹 뷰가 새로고침되면(캐시 태그 세대 변경) 랭킹 인덱스에서 다시 만든다.
+    - 구간 지표: 차량별로 반영한 구간 번호를 기억해 닫힌 주행 구간만 증분으로 추가한다.
+      구간 뷰나 차종 매핑이 바뀌면 처음부터 다시 쌓는다.
+    - 차종별 스케치와 함께 전체 스케치를 같이 갱신하므로 조회 시 병합이 필요 없다.
+    """
+
+    def __init__(self, k: int = DISTRIBUTION_SKETCH_K,
+                 segment_max_age: float = DISTRIBUTION_SEGMENT_MAX_AGE_SECONDS):
+        self.k = k
+        self.segment_max_age = segment_max_age
+        self._sketches: Dict[str, Dict[str, KLLSketch]] = {}
+        self._ranking_generation: Optional[int] = None
+        self._segment_generation: Optional[tuple] = None
+        self._segment_done: Dict[str, int] = {}
+        self._segment_refreshed: Optional[float] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self.ranking_built_at: Optional[datetime] = None
+        self.segments_updated_at: Optional[datetime] = None
+        self.segments_ingested = 0
+
+    def _add(self, metric: str, car_types: Sequence[str], values: np.ndarray):
+        sketches = self._sketches.setdefault(metric, {})
+        valid = ~np.isnan(values)
+        car_types = np.asarray(car_types, dtype=object)[valid]
+        values = values[valid]
+        sketches.setdefault(ALL_CAR_TYPES, KLLSketch(self.k)).update(values)
+        for car_type in set(car_types):
+            sketches.setdefault(car_type, KLLSketch(self.k)).update(values[car_types == car_type])
+
+    async def _rebuild_ranking(self, db: asyncpg.Connection):
+        generation = view_cache.generation("battery_performance_ranking")
+        index = await analytics_crud.get_battery_ranking_index(db)
+        for metric in RANKING_METRICS:
+            self._sketches.pop(metric, None)
+        car_types = [item["car_type"] for item in index.items]
+        for metric, getter in RANKING_METRICS.items():
+            values = np.array([getter(item) for item in index.items], dtype=float)
+            self._add(metric, car_types, values)
+        self._ranking_generation = generation
+        self.ranking_built_at = datetime.now()
+
+    async def _ingest_segments(self, db: asyncpg.Connection) -> int:
+        generation = (view_cache.generation(SEGMENT_STATES_TABLE), view_cache.generation("car_type"))
+        if generation != self._segment_generation:
+            for metric in SEGMENT_METRICS:
+                self._sketches.pop(metric, None)
+            self._segment_done = {}
+            self.segments_ingested = 0
+            self._segment_generation = generation
+
+        heads = await analytics_crud.get_segment_heads(db)
+        # 각 차량의 마지막 구간은 아직 열려 있을 수 있어 제외 (다음 갱신 때 반영)
+        pending = {
+            clientid: (self._segment_done.get(clientid, -1), last_id)
+            for clientid, last_id in heads.items()
+            if last_id - 1 > self._segment_done.get(clientid, -1)
+        }
+        added = 0
+        if pending:
+            rows = await analytics_crud.get_driving_segment_metrics(
+                db, list(pending), [after for after, _ in pending.values()],
+                [before for _, before in pending.values()]
+            )
+            car_types = [row["car_type"] for row in rows]
+            for metric, column in SEGMENT_METRICS.items():
+                values = np.array([row[column] for row in rows], dtype=float)
+                self._add(metric, car_types, values)
+            for clientid, (_, before) in pending.items():
+                self._segment_done[clientid] = before - 1
+            added = len(rows)
+            self.segments_ingested += added
+
+        self._segment_refreshed = time.monotonic()
+        self.segments_updated_at = datetime.now()
+        return added
+
+    async def refresh(self, db: asyncpg.Connection, segments: bool = True) -> Dict[str, Any]:
+        """바뀐 랭킹은 다시 만들고 새 구간은 증분 반영"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            rebuilt = self._ranking_generation != view_cache.generation("battery_performance_ranking")
+            if rebuilt:
+                await self._rebuild_ranking(db)
+            added = await self._ingest_segments(db) if segments else 0
+        return {"ranking_rebuilt": rebuilt, "segments_added": added}
+
+    async def _ensure_fresh(self, db: asyncpg.Connection, metric: str):
+        if metric in RANKING_METRICS:
+            if self._ranking_generation != view_cache.generation("battery_performance_ranking"):
+                await self.refresh(db, segments=False)
+        elif (self._segment_refreshed is None
+              or time.monotonic() - self._segment_refreshed > self.segment_max_age):
+            await self.refresh(db)
+
+    async def describe(self, db: asyncpg.Connection, metric: str, car_type: Optional[str] = None,
+                       percentiles: Sequence[float] = DEFAULT_PERCENTILES, bins: int = 20) -> Dict[str, Any]:
+        """지표 분포 요약 - 개수, 최소/최대, 백분위, 등간격 히스토그램"""
+        if metric not in DISTRIBUTION_METRICS:
+            raise ValueError(f"지원하지 않는 지표입니다: {metric} (지원: {', '.join(DISTRIBUTION_METRICS)})")
+        if any(p < 0 or p > 100 for p in percentiles):
+            raise ValueError("백분위는 0~100 사이여야 합니다.")
+        await self._ensure_fresh(db, metric)
+
+        car_type = car_type or ALL_CAR_TYPES
+        sketch = self._sketches.get(metric, {}).get(car_type)
+        if sketch is None or sketch.count == 0:
+            return {
+                "metric": metric, "car_type": car_type, "count": 0, "min": None, "max": None,
+                "percentiles": {}, "histogram": []
+            }
+        values = sketch.quantiles([p / 100 for p in percentiles])
+        return {
+            "metric": metric,
+            "car_type": car_type,
+            "unit": "vehicle" if metric in RANKING_METRICS else "segment",
+            "count": sketch.count,
+            "min": sketch.min,
+            "max": sketch.max,
+            "percentiles": {f"p{p:g}": value for p, value in zip(percentiles, values)},
+            "histogram": sketch.histogram(bins)
+        }
+
+    def car_types(self, metric: str) -> List[str]:
+        return sorted(self._sketches.get(metric, {}))
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "k": self.k,
+            "metrics": {
+                metric: {car_type: sketch.count for car_type, sketch in sorted(sketches.items())}
+                for metric, sketches in self._sketches.items()
+            },
+            "ranking_built_at": self.ranking_built_at,
+            "segments_updated_at": self.segments_updated_at,
+            "segments_ingested": self.segments_ingested,
+            "vehicles_tracked": len(self._segment_done)
+        }
+
+
+# 프로세스 단위 공유 인스턴스
+fleet_distribution = FleetDistribution()
@@ -0,0 +1,73 @@
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+
+def _bucket_mean(segment: np.ndarray) -> np.ndarray:
+    """NaN을 제외한 열별 평균 (모두 NaN이면 NaN)"""
+    valid = ~np.isnan(segment)
+    counts = valid.sum(axis=0)
+    sums = np.where(valid, segment, 0.0).sum(axis=0)
+    return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets로 선택된 행 인덱스 반환
+
+    x: (n,) 단조 증가 시간축, y: (n, k) 값 행렬.
+    k개 열을 한 번에 처리하며 결과는 (n_out, k) 인덱스 행렬이다.
+    각 버킷은 열 전체에 대해 벡터 연산으로 삼각형 면적을 계산한다.
+    """
+    n = len(x)
+    if y.ndim == 1:
+        y = y[:, None]
+    k = y.shape[1]
+    if n_out >= n or n_out < 3:
+        return np.repeat(np.arange(n)[:, None], k, axis=1)
+
+    # 첫/마지막 점을 제외한 구간을 n_out - 2개 버킷으로 분할
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    cols = np.arange(k)
+    indices = np.empty((n_out, k), dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    a = np.zeros(k, dtype=np.int64)
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[hi:next_hi].mean()
+        avg_y = _bucket_mean(y[hi:next_hi])
+
+        ax = x[a]
+        ay = y[a, cols]
+        area = np.abs(
+            (ax - avg_x) * (y[lo:hi] - ay)
+            - (ax - x[lo:hi, None]) * (avg_y - ay)
+        )
+        area = np.where(np.isnan(area), -1.0, area)
+        a = lo + np.argmax(area, axis=0)
+        indices[i + 1] = a
+
+    return indices
+
+
+def downsample_series(timestamps: Sequence, values: np.ndarray,
+                      columns: List[str], n_out: int) -> Dict[str, Dict[str, list]]:
+    """열별 LTTB 다운샘플링 결과를 {column: {"timestamp": [...], "value": [...]}}로 반환"""
+    if len(timestamps) == 0:
+        return {c: {"timestamp": [], "value": []} for c in columns}
+
+    ts = np.asarray(timestamps, dtype="datetime64[us]")
+    x = ts.astype(np.int64).astype(np.float64)
+    indices = lttb_indices(x, values, n_out)
+
+    series = {}
+    for j, column in enumerate(columns):
+        picked = indices[:, j]
+        column_values = values[picked, j]
+        series[column] = {
+            "timestamp": ts[picked].astype(object).tolist(),
+            "value": [None if np.isnan(v) else float(v) for v in column_values],
+        }
+    return series
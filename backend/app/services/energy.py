@@ -0,0 +1,57 @@
+from typing import Dict
+
+import numpy as np
+
+from .segmentation import SEGMENT_GAP_SECONDS
+
+# 이웃한 유효 샘플 간격이 이보다 길면 적분하지 않음 (구간 분할 기준과 동일)
+ENERGY_MAX_GAP_SECONDS = SEGMENT_GAP_SECONDS
+
+
+def integrate_segment_energy(seconds: np.ndarray, pack_v: np.ndarray, current: np.ndarray,
+                             segment_index: np.ndarray, n_segments: int,
+                             max_gap_seconds: float = ENERGY_MAX_GAP_SECONDS) -> Dict[str, np.ndarray]:
+    """구간별 pack_v * current 사다리꼴 적분 [Wh]
+
+    segment_index는 각 샘플이 속한 구간 번호(0..n_segments-1, 구간 밖이면 -1).
+    전압/전류가 NULL(NaN)인 샘플은 건너뛰고 앞뒤 유효 샘플을 잇되,
+    그 간격이 max_gap_seconds를 넘거나 다른 구간에 걸치면 적분하지 않는다.
+    current는 충전 +, 방전 - 이므로 방전 에너지(consumed)와 충전/회생 에너지(charged)를 나눠 적분한다.
+    """
+    valid = ~np.isnan(pack_v) & ~np.isnan(current) & (segment_index >= 0)
+    t = seconds[valid]
+    power = pack_v[valid] * current[valid]
+    seg = segment_index[valid]
+
+    empty = np.zeros(n_segments)
+    if len(t) < 2:
+        return {
+            "energy_consumed_wh": empty, "energy_charged_wh": empty.copy(),
+            "integrated_seconds": empty.copy(),
+            "sample_count": np.bincount(seg, minlength=n_segments),
+        }
+
+    dt = np.diff(t)
+    ok = (seg[1:] == seg[:-1]) & (dt <= max_gap_seconds)
+    owner = seg[1:][ok]
+    dt = dt[ok]
+
+    discharge = np.maximum(-power, 0.0)
+    charge = np.maximum(power, 0.0)
+    consumed = 0.5 * (discharge[1:] + discharge[:-1])[ok] * dt / 3600.0
+    charged = 0.5 * (charge[1:] + charge[:-1])[ok] * dt / 3600.0
+
+    return {
+        "energy_consumed_wh": np.bincount(owner, weights=consumed, minlength=n_segments),
+        "energy_charged_wh": np.bincount(owner, weights=charged, minlength=n_segments),
+        "integrated_seconds": np.bincount(owner, weights=dt, minlength=n_segments),
+        "sample_count": np.bincount(seg, minlength=n_segments),
+    }
+
+
+def efficiency_wh_per_km(energy: Dict[str, np.ndarray], mileage_change: np.ndarray) -> np.ndarray:
+    """순소비 에너지(방전 - 회생) / 주행거리 [Wh/km] - 이동하지 않았거나 적분 구간이 없으면 NaN"""
+    distance = np.nan_to_num(mileage_change, nan=0.0)
+    usable = (distance > 0) & (energy["integrated_seconds"] > 0)
+    net = energy["energy_consumed_wh"] - energy["energy_charged_wh"]
+    return np.where(usable, net / np.where(usable, distance, 1.0), np.nan)
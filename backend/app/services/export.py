@@ -0,0 +1,113 @@
+import csv
+import decimal
+import io
+import json
+from datetime import date, datetime, time
+from typing import AsyncIterator, Callable, List, Optional
+
+import asyncpg
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from ..database.base import get_db_pool
+from .columnar import COLUMNAR_MEDIA_TYPES, ColumnarEncoder
+
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    **COLUMNAR_MEDIA_TYPES,
+}
+
+BatchSource = Callable[[asyncpg.Connection], AsyncIterator[List[asyncpg.Record]]]
+
+
+def _json_default(value):
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_ndjson(records: List[asyncpg.Record]) -> bytes:
+    """레코드 배치를 NDJSON 바이트로 변환 (한 줄에 한 행)"""
+    lines = [json.dumps(dict(r), default=_json_default, ensure_ascii=False) for r in records]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class NdjsonEncoder:
+    """레코드 배치를 NDJSON 바이트로 변환"""
+
+    def encode(self, records: List[asyncpg.Record]) -> bytes:
+        return encode_ndjson(records) if records else b""
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class CsvEncoder:
+    """레코드 배치를 CSV 바이트로 변환 (첫 배치에만 헤더 출력)"""
+
+    def __init__(self):
+        self.header_written = False
+
+    def encode(self, records: List[asyncpg.Record]) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if not self.header_written and records:
+            writer.writerow(records[0].keys())
+            self.header_written = True
+        for r in records:
+            writer.writerow(
+                v.isoformat() if isinstance(v, (datetime, date, time)) else v
+                for v in r.values()
+            )
+        return buffer.getvalue().encode("utf-8")
+
+    def finish(self) -> bytes:
+        return b""
+
+
+def make_encoder(fmt: str):
+    """형식별 배치 인코더 생성 (encode(records) / finish() 인터페이스)"""
+    if fmt == "ndjson":
+        return NdjsonEncoder()
+    if fmt == "csv":
+        return CsvEncoder()
+    return ColumnarEncoder(fmt)
+
+
+def encode_records(records: List[asyncpg.Record], fmt: str) -> bytes:
+    """이미 조회된 레코드 전체를 하나의 바이트 페이로드로 인코딩 (페이지 크기가 제한된 응답용)"""
+    encoder = make_encoder(fmt)
+    return encoder.encode(records) + encoder.finish()
+
+
+async def iter_encoded_chunks(source: BatchSource, fmt: str,
+                              request: Optional[Request] = None) -> AsyncIterator[bytes]:
+    """풀에서 전용 연결을 잡아 배치를 인코딩하며 전송 (클라이언트 연결 종료 시 중단)"""
+    encoder = make_encoder(fmt)
+    pool = await get_db_pool()
+    async with pool.acquire() as conn:
+        batches = source(conn)
+        try:
+            async for batch in batches:
+                if request is not None and await request.is_disconnected():
+                    return
+                chunk = encoder.encode(batch)
+                if chunk:
+                    yield chunk
+        finally:
+            # 중단 시에도 연결을 풀에 돌려주기 전에 소스의 트랜잭션/커서를 정리
+            await batches.aclose()
+    yield encoder.finish()
+
+
+def streaming_export_response(source: BatchSource, fmt: str, filename: str,
+                              request: Optional[Request] = None) -> StreamingResponse:
+    """NDJSON/CSV/Arrow/Parquet 스트리밍 응답 생성"""
+    return StreamingResponse(
+        iter_encoded_chunks(source, fmt, request),
+        media_type=STREAM_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
@@ -0,0 +1,29 @@
+import decimal
+from typing import Any
+
+import asyncpg
+import orjson
+from fastapi.responses import JSONResponse
+
+
+def _default(value):
+    if isinstance(value, asyncpg.Record):
+        return dict(value)
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    raise TypeError(f"JSON으로 직렬화할 수 없는 타입입니다: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """orjson 직렬화 - asyncpg 레코드와 Decimal을 직접 처리 (datetime은 ISO 8601)"""
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    """pydantic 검증과 jsonable_encoder를 거치지 않고 orjson으로 바로 직렬화하는 응답
+
+    응답 스키마는 런타임 검증 대신 테스트(tests/test_fast_responses.py)로 조회 컬럼과 응답 모델 일치를 보장한다.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
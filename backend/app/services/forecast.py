@@ -0,0 +1,261 @@
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+# 수명 종료(EOL) 기준 eSOH [%]
+DEFAULT_EOL_THRESHOLD = 80.0
+# 회귀에 필요한 최소 기간 수 (추세 인덱스 기본값과 동일)
+MIN_FORECAST_POINTS = 6
+# 예측 시점이 너무 먼 경우(기울기가 0에 가까움)는 EOL 없음으로 처리
+MAX_FORECAST_DAYS = 365 * 30
+
+# 양측 95% Student t 임계값 (자유도 1~30), 그 이상은 정규분포 근사
+_T95 = np.array([
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+])
+
+# 예측 상태 코드
+STATUS_INSUFFICIENT = "insufficient_data"
+STATUS_STABLE = "no_degradation"
+STATUS_REACHED = "reached"
+STATUS_PROJECTED = "projected"
+
+
+def t_critical_95(df: np.ndarray) -> np.ndarray:
+    df = np.asarray(df)
+    return np.where(df > len(_T95), 1.96, _T95[np.clip(df, 1, len(_T95)) - 1])
+
+
+def to_date(value: Any) -> date:
+    """기간 값(date/datetime/'YYYY-MM'/'YYYY-MM-DD')을 date로 변환"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value)
+    if len(text) == 7:
+        text += "-01"
+    return date.fromisoformat(text[:10])
+
+
+def fit_degradation(codes: np.ndarray, days: np.ndarray, values: np.ndarray, n_groups: int,
+                    min_points: int = MIN_FORECAST_POINTS) -> Dict[str, np.ndarray]:
+    """차량별 선형 회귀 y = a + b·t 를 패딩한 (차량 × 기간) 행렬에서 한 번에 계산
+
+    codes는 차량 번호(0..n_groups-1)로 정렬되어 있어야 하며, days는 차량별 기준일로부터의 일수.
+    결과는 중심화한 형태(x_mean, y_mean, slope)와 기울기 표준오차, 잔차 표준편차.
+    """
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    width = int(counts.max()) if len(counts) and counts.max() > 0 else 1
+    pos = np.arange(len(codes)) - starts[codes]
+
+    t = np.full((n_groups, width), np.nan)
+    y = np.full((n_groups, width), np.nan)
+    t[codes, pos] = days
+    y[codes, pos] = values
+    mask = ~np.isnan(t) & ~np.isnan(y)
+    t = np.where(mask, t, 0.0)
+    y = np.where(mask, y, 0.0)
+
+    n = mask.sum(axis=1)
+    safe_n = np.maximum(n, 1)
+    x_mean = t.sum(axis=1) / safe_n
+    y_mean = y.sum(axis=1) / safe_n
+    dx = np.where(mask, t - x_mean[:, None], 0.0)
+    dy = np.where(mask, y - y_mean[:, None], 0.0)
+    sxx = (dx * dx).sum(axis=1)
+    sxy = (dx * dy).sum(axis=1)
+
+    fitted = (n >= max(min_points, 3)) & (sxx > 0)
+    slope = np.where(fitted, sxy / np.where(sxx > 0, sxx, 1.0), np.nan)
+    resid = np.where(mask, dy - slope[:, None] * dx, 0.0)
+    df = np.maximum(n - 2, 1)
+    residual_std = np.where(fitted, np.sqrt((resid * resid).sum(axis=1) / df), np.nan)
+    slope_se = np.where(fitted, residual_std / np.sqrt(np.where(sxx > 0, sxx, 1.0)), np.nan)
+
+    last_idx = np.maximum(n - 1, 0)
+    rows = np.arange(n_groups)
+    return {
+        "n": n,
+        "x_mean": x_mean,
+        "y_mean": y_mean,
+        "slope_per_day": slope,
+        "slope_se": slope_se,
+        "residual_std": residual_std,
+        "last_day": np.where(n > 0, t[rows, last_idx], np.nan),
+        "last_value": np.where(n > 0, y[rows, last_idx], np.nan),
+    }
+
+
+def project_eol(fit: Dict[str, np.ndarray], threshold: float = DEFAULT_EOL_THRESHOLD) -> Dict[str, np.ndarray]:
+    """회귀선이 threshold에 닿는 시점(기준일로부터 일수)과 95% 역예측(Fieller) 구간
+
+    구간은 평균 회귀선의 95% 신뢰대가 threshold와 만나는 두 점으로, 기울기 오차(se²·d²)와
+    중심점 y_mean의 오차(s²/n)를 함께 반영한다: (b·d - g)² = t²·(s²/n + se²·d²), d = x - x_mean.
+    기울기가 0과 유의하게 구분되지 않으면 구간이 닫히지 않으므로 해당 경계는 없음(NaN).
+    """
+    n = np.asarray(fit["n"])
+    slope = np.asarray(fit["slope_per_day"], dtype=float)
+    se = np.asarray(fit["slope_se"], dtype=float)
+    s = np.asarray(fit["residual_std"], dtype=float)
+    x_mean = np.asarray(fit["x_mean"], dtype=float)
+    gap = threshold - np.asarray(fit["y_mean"], dtype=float)
+    tc = t_critical_95(np.maximum(n - 2, 1))
+
+    def within_horizon(d):
+        return np.where(d < MAX_FORECAST_DAYS, x_mean + d, np.nan)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d_eol = gap / slope
+        a = slope * slope - (tc * se) ** 2
+        disc = (tc ** 2) * (se * se * gap * gap + s * s * a / np.maximum(n, 1))
+        root = np.sqrt(np.maximum(disc, 0.0))
+        r1 = (slope * gap - root) / a
+        r2 = (slope * gap + root) / a
+    lower, upper = np.minimum(r1, r2), np.maximum(r1, r2)
+
+    degrading = slope < 0
+    eol = np.where(degrading, within_horizon(d_eol), np.nan)
+    # a > 0: 닫힌 구간 [lower, upper]
+    # a <= 0: 구간이 (-∞, lower] ∪ [upper, ∞) 형태라 추정치가 속한 쪽의 이른 경계만 의미가 있음
+    bounded = degrading & (a > 0)
+    open_late = degrading & (a <= 0) & (disc > 0) & (d_eol >= upper)
+    early = np.where(bounded, within_horizon(lower), np.where(open_late, within_horizon(upper), np.nan))
+    late = np.where(bounded, within_horizon(upper), np.nan)
+
+    reached = np.asarray(fit["last_value"], dtype=float) <= threshold
+    status = np.where(
+        np.isnan(slope), STATUS_INSUFFICIENT,
+        np.where(reached, STATUS_REACHED, np.where(np.isnan(eol), STATUS_STABLE, STATUS_PROJECTED))
+    )
+    return {"eol_day": eol, "eol_low_day": early, "eol_high_day": late, "status": status}
+
+
+def day_to_date(origin: date, days: float) -> Optional[date]:
+    if days is None or np.isnan(days):
+        return None
+    return origin + timedelta(days=int(round(float(days))))
+
+
+def build_forecast_records(granularity: str, rows, threshold: float = DEFAULT_EOL_THRESHOLD,
+                           min_points: int = MIN_FORECAST_POINTS) -> list:
+    """(clientid, period, esoh) 행(차량/기간 순 정렬)으로 전체 차량을 한 번에 회귀해 저장용 레코드 생성"""
+    if not rows:
+        return []
+    clientids = np.array([row["clientid"] for row in rows], dtype=object)
+    dates = np.array([to_date(row["period"]) for row in rows], dtype="datetime64[D]")
+    values = np.array([row["esoh"] for row in rows], dtype=float)
+
+    starts = np.flatnonzero(np.concatenate(([True], clientids[1:] != clientids[:-1])))
+    codes = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(rows))))
+    origins = dates[starts]
+    days = (dates - origins[codes]).astype(float)
+
+    fit = fit_degradation(codes, days, values, len(starts), min_points)
+    eol = project_eol(fit, threshold)
+
+    def number(value):
+        return None if np.isnan(value) else float(value)
+
+    records = []
+    for i, start in enumerate(starts):
+        origin = origins[i].astype(date)
+        records.append((
+            granularity, clientids[start], int(fit["n"][i]), origin,
+            number(fit["x_mean"][i]), number(fit["y_mean"][i]), number(fit["slope_per_day"][i]),
+            number(fit["slope_se"][i]), number(fit["residual_std"][i]),
+            day_to_date(origin, fit["last_day"][i]), number(fit["last_value"][i]), float(threshold),
+            day_to_date(origin, eol["eol_day"][i]), day_to_date(origin, eol["eol_low_day"][i]),
+            day_to_date(origin, eol["eol_high_day"][i]), str(eol["status"][i]),
+        ))
+    return records
+
+
+def _fit_arrays(fits: list) -> Dict[str, np.ndarray]:
+    def column(name):
+        return np.array([np.nan if f[name] is None else f[name] for f in fits], dtype=float)
+
+    last_day = np.array([
+        np.nan if f["last_date"] is None else (f["last_date"] - f["origin_date"]).days for f in fits
+    ], dtype=float)
+    return {
+        "n": np.array([f["n"] for f in fits], dtype=np.int64),
+        "x_mean": column("x_mean"),
+        "y_mean": column("y_mean"),
+        "slope_per_day": column("slope_per_day"),
+        "slope_se": column("slope_se"),
+        "residual_std": column("residual_std"),
+        "last_value": column("last_value"),
+        "last_day": last_day,
+    }
+
+
+def describe_forecast(fit_row: Dict[str, Any], threshold: float) -> Dict[str, Any]:
+    """저장된 회귀 결과로 임의 threshold의 EOL 예측 (DB 재조회 없이 계산)"""
+    eol = project_eol(_fit_arrays([fit_row]), threshold)
+    origin = fit_row["origin_date"]
+    slope = fit_row["slope_per_day"]
+    return {
+        "clientid": fit_row["clientid"],
+        "car_type": fit_row.get("car_type"),
+        "granularity": fit_row["granularity"],
+        "threshold": threshold,
+        "status": str(eol["status"][0]),
+        "eol_date": day_to_date(origin, eol["eol_day"][0]),
+        "eol_ci95": {
+            "low": day_to_date(origin, eol["eol_low_day"][0]),
+            "high": day_to_date(origin, eol["eol_high_day"][0]),
+        },
+        "model": {
+            "n": fit_row["n"],
+            "slope_per_year": None if slope is None else slope * 365.25,
+            "slope_se_per_year": None if fit_row["slope_se"] is None else fit_row["slope_se"] * 365.25,
+            "residual_std": fit_row["residual_std"],
+            "last_date": fit_row["last_date"],
+            "last_value": fit_row["last_value"],
+        },
+        "fitted_at": fit_row["fitted_at"],
+    }
+
+
+def summarize_by_car_type(fits: list, threshold: float) -> list:
+    """차종별 EOL 예측 분포 (예측 가능 차량 수, EOL 시점 중앙값/사분위, 평균 연간 열화율)"""
+    if not fits:
+        return []
+    arrays = _fit_arrays(fits)
+    eol = project_eol(arrays, threshold)
+    # 기준일이 차량마다 달라 절대 날짜(epoch 일수)로 바꿔 비교
+    origin_days = np.array([f["origin_date"].toordinal() for f in fits], dtype=float)
+    eol_ordinal = origin_days + eol["eol_day"]
+    last_ordinal = origin_days + arrays["last_day"]
+    car_types = np.array([f["car_type"] for f in fits], dtype=object)
+
+    def ordinal_to_date(value):
+        return None if np.isnan(value) else date.fromordinal(int(round(value)))
+
+    summary = []
+    for car_type in sorted(set(car_types)):
+        sel = car_types == car_type
+        projected = sel & (eol["status"] == STATUS_PROJECTED)
+        eol_sel = eol_ordinal[projected]
+        years_left = (eol_ordinal[projected] - last_ordinal[projected]) / 365.25
+        slopes = arrays["slope_per_day"][sel]
+        p25, p50, p75 = (np.percentile(eol_sel, [25, 50, 75]) if len(eol_sel) else (np.nan,) * 3)
+        summary.append({
+            "car_type": car_type,
+            "vehicle_count": int(sel.sum()),
+            "projected_count": int(projected.sum()),
+            "reached_count": int((sel & (eol["status"] == STATUS_REACHED)).sum()),
+            "no_degradation_count": int((sel & (eol["status"] == STATUS_STABLE)).sum()),
+            "insufficient_count": int((sel & (eol["status"] == STATUS_INSUFFICIENT)).sum()),
+            "eol_date_p25": ordinal_to_date(p25),
+            "eol_date_median": ordinal_to_date(p50),
+            "eol_date_p75": ordinal_to_date(p75),
+            "median_years_to_eol": float(np.median(years_left)) if len(years_left) else None,
+            "avg_slope_per_year": float(np.nanmean(slopes) * 365.25) if np.any(~np.isnan(slopes)) else None,
+        })
+    return summary
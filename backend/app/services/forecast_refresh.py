@@ -0,0 +1,111 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import asyncpg
+
+from ..crud import battery_trend as battery_trend_crud
+from ..database.base import get_db_pool
+from .forecast import DEFAULT_EOL_THRESHOLD, build_forecast_records
+
+# 0이면 주기 실행 비활성 (eSOH 뷰 새로고침 후 또는 POST /battery-trend/forecast/refresh로 실행)
+SOH_FORECAST_INTERVAL_SECONDS = int(os.getenv("BW_SOH_FORECAST_INTERVAL_SECONDS", "0"))
+SOH_EOL_THRESHOLD = float(os.getenv("BW_SOH_EOL_THRESHOLD", str(DEFAULT_EOL_THRESHOLD)))
+
+
+class SOHForecaster:
+    """전체 차량 SOH 열화 회귀/EOL 예측을 백그라운드에서 계산해 예측 테이블에 저장"""
+
+    def __init__(self, interval: int = SOH_FORECAST_INTERVAL_SECONDS, threshold: float = SOH_EOL_THRESHOLD,
+                 granularities: Optional[List[str]] = None):
+        self.interval = interval
+        self.threshold = threshold
+        self.granularities = granularities or ["monthly"]
+        self._task: Optional[asyncio.Task] = None
+        self._running: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self.last_result: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+        self.last_run_at: Optional[datetime] = None
+
+    async def forecast(self, db: asyncpg.Connection, granularity: str) -> Dict[str, Any]:
+        """한 기간 단위의 전체 차량 예측 - 회귀 계산은 스레드에서 실행"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            rows = await battery_trend_crud.get_esoh_series(db, granularity)
+            records = await asyncio.to_thread(build_forecast_records, granularity, rows, self.threshold)
+            saved = await battery_trend_crud.save_forecasts(db, granularity, records)
+        statuses: Dict[str, int] = {}
+        for record in records:
+            statuses[record[-1]] = statuses.get(record[-1], 0) + 1
+        return {"granularity": granularity, "threshold": self.threshold, **saved, "statuses": statuses}
+
+    async def run_once(self) -> Dict[str, Any]:
+        self.last_run_at = datetime.now()
+        try:
+            pool = await get_db_pool()
+            async with pool.acquire() as db:
+                results = [await self.forecast(db, granularity) for granularity in self.granularities]
+            self.last_result = {"status": "success", "results": results}
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+        return self.last_result
+
+    def refresh_hook(self, granularity: str):
+        """eSOH 뷰 새로고침 후 실행할 예측 갱신 함수 (ViewRefreshScheduler.on_refresh용)"""
+        async def refresh_forecast(db: asyncpg.Connection) -> Dict[str, Any]:
+            self.last_run_at = datetime.now()
+            result = await self.forecast(db, granularity)
+            self.last_result = {"status": "success", "results": [result]}
+            return result
+        refresh_forecast.__name__ = f"refresh_{granularity}_soh_forecast"
+        return refresh_forecast
+
+    def trigger(self) -> bool:
+        """백그라운드 예측 1회 실행 - 이미 실행 중이면 False"""
+        if self._running is not None and not self._running.done():
+            return False
+        self._running = asyncio.create_task(self._run_once_logged())
+        return True
+
+    async def _run_once_logged(self):
+        try:
+            await self.run_once()
+        except Exception as e:
+            print(f"SOH 예측 오류: {e}")
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await self._run_once_logged()
+            await asyncio.sleep(self.interval)
+
+    async def stop(self):
+        for task in (self._task, self._running):
+            if task is not None:
+                task.cancel()
+        self._task = None
+        self._running = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "interval_seconds": self.interval,
+            "threshold": self.threshold,
+            "granularities": self.granularities,
+            "periodic": self._task is not None,
+            "running": self._running is not None and not self._running.done(),
+            "last_run_at": self.last_run_at,
+            "last_result": self.last_result,
+            "last_error": self.last_error
+        }
+
+
+# 프로세스 단위 공유 인스턴스
+soh_forecaster = SOHForecaster()
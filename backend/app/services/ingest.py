@@ -0,0 +1,310 @@
+import asyncio
+import json
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import pyarrow as pa
+
+from ..crud.bw_data import BW_DATA_COLUMNS
+from ..crud.rollup import mark_rollup_dirty
+from ..database.base import get_db_pool
+
+_INT_COLUMNS = {"chg_state", "ev_state"}
+
+Row = Tuple[Any, ...]
+
+
+class IngestBackpressureError(Exception):
+    """적재 대기열이 가득 차 요청을 받을 수 없을 때 발생"""
+
+
+def _to_timestamp(value) -> datetime:
+    if isinstance(value, datetime):
+        ts = value
+    elif isinstance(value, str):
+        ts = datetime.fromisoformat(value)
+    else:
+        raise ValueError(f"timestamp 형식이 올바르지 않습니다: {value!r}")
+    # bw_data.timestamp는 timezone 없는 서버 로컬 시각
+    if ts.tzinfo is not None:
+        ts = ts.astimezone().replace(tzinfo=None)
+    return ts
+
+
+def _coerce_row(item: Dict[str, Any]) -> Row:
+    """dict 한 건을 BW_DATA_COLUMNS 순서의 COPY용 튜플로 변환"""
+    if not item.get("clientid") or item.get("timestamp") is None:
+        raise ValueError("clientid와 timestamp는 필수입니다.")
+    row = [str(item["clientid"]), _to_timestamp(item["timestamp"])]
+    for column in BW_DATA_COLUMNS[2:]:
+        value = item.get(column)
+        if value is not None:
+            value = int(value) if column in _INT_COLUMNS else float(value)
+        row.append(value)
+    return tuple(row)
+
+
+def time_ranges(rows: List[Row]) -> List[Tuple[str, datetime, datetime]]:
+    """차량별 (clientid, 최소 시각, 최대 시각)"""
+    ranges: Dict[str, List[datetime]] = {}
+    for row in rows:
+        span = ranges.get(row[0])
+        if span is None:
+            ranges[row[0]] = [row[1], row[1]]
+        elif row[1] < span[0]:
+            span[0] = row[1]
+        elif row[1] > span[1]:
+            span[1] = row[1]
+    return [(clientid, lo, hi) for clientid, (lo, hi) in ranges.items()]
+
+
+def parse_ndjson(body: bytes) -> List[Row]:
+    """NDJSON 본문을 COPY용 튜플 목록으로 변환"""
+    rows = []
+    for line_no, line in enumerate(body.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+            if not isinstance(item, dict):
+                raise ValueError("각 줄은 JSON 객체여야 합니다.")
+            rows.append(_coerce_row(item))
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"{line_no}번째 줄 파싱 실패: {e}") from e
+    return rows
+
+
+def parse_arrow(body: bytes, file_format: bool = False) -> List[Row]:
+    """Arrow IPC 스트림/파일 본문을 COPY용 튜플 목록으로 변환 (열 단위로 변환 후 전치)"""
+    try:
+        if file_format:
+            table = pa.ipc.open_file(pa.py_buffer(body)).read_all()
+        else:
+            table = pa.ipc.open_stream(body).read_all()
+    except pa.ArrowInvalid as e:
+        raise ValueError(f"Arrow {'파일' if file_format else '스트림'} 파싱 실패: {e}") from e
+    if table.num_rows == 0:
+        return []
+
+    columns = []
+    for column in BW_DATA_COLUMNS:
+        if column in table.column_names:
+            columns.append(table.column(column).to_pylist())
+        else:
+            columns.append([None] * table.num_rows)
+    return [_coerce_row(dict(zip(BW_DATA_COLUMNS, values))) for values in zip(*columns)]
+
+
+class BwDataIngestor:
+    """동시 요청의 행을 모아 binary COPY 한 번으로 적재하는 마이크로 배치 적재기
+
+    - 요청들은 공유 버퍼에 행을 넣고 자신이 포함된 배치의 COPY 완료를 기다린다.
+    - 워커는 flush_rows가 쌓이거나 flush_interval이 지나면 버퍼를 비워 COPY한다.
+    - 대기 중인 행이 max_pending_rows를 넘으면 submit이 공간이 날 때까지 대기하며,
+      submit_timeout 안에 공간이 나지 않으면 IngestBackpressureError를 발생시킨다.
+      풀이 포화되면 COPY가 늦어져 대기 행이 쌓이므로 자연스럽게 역압이 걸린다.
+    """
+
+    def __init__(self, flush_rows: int = 5000, flush_interval: float = 0.05,
+                 max_pending_rows: int = 200_000, workers: int = 2,
+                 submit_timeout: float = 5.0, rate_window: float = 10.0):
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.max_pending_rows = max_pending_rows
+        self.workers = workers
+        self.submit_timeout = submit_timeout
+        self.rate_window = rate_window
+
+        self._buffer: List[Tuple[List[Row], asyncio.Future]] = []
+        self._buffered_rows = 0
+        self._pending_rows = 0
+        self._has_data: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Condition] = None
+        self._tasks: List[asyncio.Task] = []
+        self._recent = deque()
+
+        self.total_rows = 0
+        self.total_batches = 0
+        self.failed_batches = 0
+        self.failed_requests = 0
+        self.rejected_requests = 0
+        self.last_batch_rows = 0
+        self.last_copy_seconds = 0.0
+
+    def _ensure_started(self):
+        if self._tasks:
+            return
+        self._has_data = asyncio.Event()
+        self._full = asyncio.Event()
+        self._space = asyncio.Condition()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def submit(self, rows: List[Row]) -> Dict[str, Any]:
+        """행을 적재 버퍼에 넣고 COPY 완료까지 대기"""
+        if not rows:
+            return {"accepted": 0}
+        self._ensure_started()
+        await self._reserve(len(rows))
+
+        future = asyncio.get_running_loop().create_future()
+        self._buffer.append((rows, future))
+        self._buffered_rows += len(rows)
+        self._has_data.set()
+        if self._buffered_rows >= self.flush_rows:
+            self._full.set()
+        return await future
+
+    async def _reserve(self, n: int):
+        def has_space():
+            return self._pending_rows == 0 or self._pending_rows + n <= self.max_pending_rows
+
+        async with self._space:
+            try:
+                await asyncio.wait_for(self._space.wait_for(has_space), self.submit_timeout)
+            except asyncio.TimeoutError:
+                self.rejected_requests += 1
+                raise IngestBackpressureError(
+                    f"적재 대기 행이 한도({self.max_pending_rows})를 초과했습니다. 잠시 후 다시 시도하세요."
+                )
+            self._pending_rows += n
+
+    async def _release(self, n: int):
+        async with self._space:
+            self._pending_rows -= n
+            self._space.notify_all()
+
+    def _take_batch(self) -> List[Tuple[List[Row], asyncio.Future]]:
+        items, rows = [], 0
+        while self._buffer and rows < self.flush_rows:
+            item = self._buffer.pop(0)
+            items.append(item)
+            rows += len(item[0])
+        self._buffered_rows -= rows
+        if not self._buffer:
+            self._has_data.clear()
+        if self._buffered_rows < self.flush_rows:
+            self._full.clear()
+        return items
+
+    async def _worker(self):
+        while True:
+            await self._has_data.wait()
+            # 동시에 들어오는 요청이 같은 배치에 합류할 수 있도록 잠시 대기
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            items = self._take_batch()
+            if items:
+                await self._flush(items)
+
+    async def _copy(self, conn, records: List[Row]):
+        await conn.copy_records_to_table("bw_data", records=records, columns=BW_DATA_COLUMNS)
+        await self._mark_late_rows(conn, records)
+
+    async def _copy_each(self, conn, items: List[Tuple[List[Row], asyncio.Future]]) -> Dict[int, Exception]:
+        """요청별로 따로 COPY - 실패한 요청 번호와 예외"""
+        failures = {}
+        for i, (rows, _) in enumerate(items):
+            try:
+                await self._copy(conn, rows)
+            except Exception as e:
+                failures[i] = e
+        return failures
+
+    async def _flush(self, items: List[Tuple[List[Row], asyncio.Future]]):
+        records = [row for rows, _ in items for row in rows]
+        started = time.perf_counter()
+        try:
+            pool = await get_db_pool()
+            async with pool.acquire() as conn:
+                try:
+                    await self._copy(conn, records)
+                    failures = {}
+                except Exception:
+                    if len(items) == 1:
+                        raise
+                    # COPY는 전부 아니면 전무이므로, 잘못된 행이 있는 요청만 실패하도록 요청별로 다시 적재
+                    failures = await self._copy_each(conn, items)
+        except Exception as e:
+            self.failed_batches += 1
+            self.failed_requests += len(items)
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            elapsed = time.perf_counter() - started
+            loaded = len(records) - sum(len(items[i][0]) for i in failures)
+            if failures:
+                self.failed_batches += 1
+                self.failed_requests += len(failures)
+            self._record(loaded, elapsed)
+            for i, (rows, future) in enumerate(items):
+                if future.done():
+                    continue
+                if i in failures:
+                    future.set_exception(failures[i])
+                else:
+                    future.set_result({
+                        "accepted": len(rows),
+                        "batch_rows": loaded,
+                        "batch_requests": len(items),
+                        "copy_seconds": round(elapsed, 4)
+                    })
+        finally:
+            await self._release(len(records))
+
+    async def _mark_late_rows(self, conn, records: List[Row]):
+        """롤업 워터마크보다 오래된 시각의 행이면 다음 롤업 갱신 때 재집계되도록 범위 기록"""
+        try:
+            await mark_rollup_dirty(conn, time_ranges(records))
+        except Exception as e:
+            # 적재는 이미 끝났으므로 요청은 실패시키지 않음 (지연 허용 구간 안이면 갱신 때 반영됨)
+            print(f"롤업 재집계 범위 기록 오류: {e}")
+
+    def _record(self, rows: int, elapsed: float):
+        now = time.monotonic()
+        self.total_rows += rows
+        self.total_batches += 1
+        self.last_batch_rows = rows
+        self.last_copy_seconds = elapsed
+        self._recent.append((now, rows))
+        while self._recent and now - self._recent[0][0] > self.rate_window:
+            self._recent.popleft()
+
+    def rows_per_second(self) -> float:
+        """최근 rate_window초 동안의 적재 속도"""
+        now = time.monotonic()
+        rows = sum(n for t, n in self._recent if now - t <= self.rate_window)
+        return rows / self.rate_window
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "total_rows": self.total_rows,
+            "total_batches": self.total_batches,
+            "failed_batches": self.failed_batches,
+            "failed_requests": self.failed_requests,
+            "rejected_requests": self.rejected_requests,
+            "pending_rows": self._pending_rows,
+            "last_batch_rows": self.last_batch_rows,
+            "last_copy_seconds": round(self.last_copy_seconds, 4),
+            "last_copy_rows_per_second": round(self.last_batch_rows / self.last_copy_seconds, 1)
+            if self.last_copy_seconds else 0.0,
+            "rows_per_second": round(self.rows_per_second(), 1),
+            "rate_window_seconds": self.rate_window
+        }
+
+    async def close(self):
+        """남은 버퍼를 모두 적재한 뒤 워커 종료"""
+        while self._buffer or self._pending_rows:
+            await asyncio.sleep(self.flush_interval)
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+
+# 프로세스 단위 공유 적재기
+bw_data_ingestor = BwDataIngestor()
@@ -0,0 +1,88 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from ..crud import partitions as partitions_crud
+from ..database.base import get_db_pool
+
+# 0이면 정기 유지보수 비활성 (관리자 API로 미래 파티션만 수동 생성 가능)
+PARTITION_MAINTENANCE_INTERVAL_SECONDS = int(os.getenv("BW_PARTITION_MAINTENANCE_INTERVAL_SECONDS", "86400"))
+
+
+class PartitionMaintainer:
+    """bw_data 미래 월 파티션 생성과 보존 기간 정리를 interval초마다 실행
+
+    보존 기간 정리는 이 작업에서만 실행되며 기본은 분리(detach)만 한다 (BW_DATA_RETENTION_DROP으로 삭제).
+    bw_data가 파티션 테이블이 아니면 아무것도 하지 않고, advisory lock으로 한 워커만 실행한다.
+    """
+
+    def __init__(self, interval: int = PARTITION_MAINTENANCE_INTERVAL_SECONDS,
+                 months_ahead: int = partitions_crud.DEFAULT_MONTHS_AHEAD,
+                 retention_months: Optional[int] = partitions_crud.DEFAULT_RETENTION_MONTHS,
+                 drop: bool = partitions_crud.DEFAULT_RETENTION_DROP):
+        self.interval = interval
+        self.months_ahead = months_ahead
+        self.retention_months = retention_months
+        self.drop = drop
+        self._task: Optional[asyncio.Task] = None
+        self.last_result: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+        self.last_run_at: Optional[datetime] = None
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def run_once(self) -> Dict[str, Any]:
+        self.last_run_at = datetime.now()
+        try:
+            pool = await get_db_pool()
+            async with pool.acquire() as db:
+                locked = await db.fetchval("SELECT pg_try_advisory_lock($1)", partitions_crud.PARTITION_LOCK_KEY)
+                if not locked:
+                    self.last_result = {"status": "skipped", "message": "다른 워커에서 파티션 유지보수가 진행 중입니다."}
+                    return self.last_result
+                try:
+                    if not await partitions_crud.is_partitioned(db):
+                        self.last_result = {"status": "skipped", "message": "bw_data가 파티션 테이블이 아닙니다."}
+                    else:
+                        self.last_result = await partitions_crud.maintain_partitions(
+                            db, self.months_ahead, self.retention_months, self.drop
+                        )
+                finally:
+                    await db.execute("SELECT pg_advisory_unlock($1)", partitions_crud.PARTITION_LOCK_KEY)
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+        return self.last_result
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"파티션 유지보수 오류: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "interval_seconds": self.interval,
+            "months_ahead": self.months_ahead,
+            "retention_months": self.retention_months,
+            "drop": self.drop,
+            "running": self._task is not None,
+            "last_run_at": self.last_run_at,
+            "last_result": self.last_result,
+            "last_error": self.last_error
+        }
+
+
+# 프로세스 단위 공유 인스턴스
+partition_maintainer = PartitionMaintainer()
@@ -0,0 +1,79 @@
+import bisect
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+RankKey = Tuple[int, float, int, float, str]
+
+
+def ranking_sort_key(score: Optional[float], battery_rank: Optional[int], clientid: str) -> RankKey:
+    """ORDER BY total_battery_score DESC, battery_rank ASC, clientid ASC 와 같은 순서의 정렬 키
+
+    PostgreSQL 기본값처럼 DESC는 NULL을 앞에, ASC는 NULL을 뒤에 둔다.
+    """
+    return (
+        0 if score is None else 1,
+        0.0 if score is None else -float(score),
+        0 if battery_rank is not None else 1,
+        0.0 if battery_rank is None else float(battery_rank),
+        clientid,
+    )
+
+
+class RankIndex:
+    """배터리 성능 랭킹 정렬 인덱스 - 뷰 한 번 조회로 만들고 새로고침 시 다시 만든다
+
+    - clientid → 순위/백분위: O(1) 위치 조회 + 동점 처리용 이분 탐색 O(log n)
+    - 정렬 키 기준 keyset 페이지, 특정 차량 기준 위/아래 이웃 조회
+    """
+
+    def __init__(self, items: Sequence[Dict[str, Any]]):
+        keyed = sorted(
+            (ranking_sort_key(item["scores"]["total"], item["rank"], item["clientid"]), item)
+            for item in items
+        )
+        self.keys: List[RankKey] = [key for key, _ in keyed]
+        self.items: List[Dict[str, Any]] = [item for _, item in keyed]
+        self.positions: Dict[str, int] = {item["clientid"]: i for i, item in enumerate(self.items)}
+        # 점수 기준 동점 순위 계산용 (NULL 점수는 맨 앞 구간)
+        self._score_keys: List[Tuple[int, float]] = [key[:2] for key in self.keys]
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def page(self, limit: int, offset: int = 0,
+             after: Optional[RankKey] = None) -> Tuple[int, List[Dict[str, Any]]]:
+        """(시작 위치, 항목) - after(직전 페이지 마지막 행의 정렬 키)가 있으면 그 다음부터, 없으면 offset부터"""
+        start = bisect.bisect_right(self.keys, after) if after is not None else offset
+        return start, self.items[start:start + limit]
+
+    def lookup(self, clientid: str) -> Optional[Dict[str, Any]]:
+        """차량의 정렬 위치(1부터), 점수 동점 순위, 상위 비율/백분위"""
+        pos = self.positions.get(clientid)
+        if pos is None:
+            return None
+        n = len(self.items)
+        score_rank = bisect.bisect_left(self._score_keys, self._score_keys[pos]) + 1
+        return {
+            "clientid": clientid,
+            "position": pos + 1,
+            "score_rank": score_rank,
+            "total_count": n,
+            # 상위 몇 %인지 (1위 = 100/n %)
+            "top_percent": round((pos + 1) / n * 100, 2),
+            # 이 차량보다 아래 순위인 차량 비율
+            "percentile": round((n - pos - 1) / (n - 1) * 100, 2) if n > 1 else 100.0,
+        }
+
+    def neighbors(self, clientid: str, window: int = 5) -> Optional[Dict[str, Any]]:
+        """차량 기준 위 window개 / 아래 window개"""
+        pos = self.positions.get(clientid)
+        if pos is None:
+            return None
+        return {
+            "above": self.items[max(pos - window, 0):pos],
+            "vehicle": self.items[pos],
+            "below": self.items[pos + 1:pos + 1 + window],
+        }
+
+    def total_pages(self, limit: int) -> int:
+        return math.ceil(len(self.items) / limit) if self.items else 0
@@ -0,0 +1,69 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from ..crud import rollup as rollup_crud
+from ..database.base import get_db_pool
+
+# 0이면 주기 갱신 비활성 (POST /performance/rollup/refresh로 수동 실행)
+ROLLUP_REFRESH_INTERVAL_SECONDS = int(os.getenv("BW_ROLLUP_REFRESH_INTERVAL_SECONDS", "300"))
+
+
+class RollupRefresher:
+    """bw_data 롤업 증분 갱신을 interval초마다 실행하는 백그라운드 작업
+
+    최초 전체 집계는 부하가 크므로 수동 갱신으로 롤업이 구성된 뒤에만 주기 갱신한다.
+    """
+
+    def __init__(self, interval: int = ROLLUP_REFRESH_INTERVAL_SECONDS):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.last_result: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+        self.last_run_at: Optional[datetime] = None
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def run_once(self) -> Optional[Dict[str, Any]]:
+        self.last_run_at = datetime.now()
+        try:
+            pool = await get_db_pool()
+            async with pool.acquire() as db:
+                if await rollup_crud.get_rollup_watermark(db) is None:
+                    self.last_result = {"status": "skipped", "message": "롤업이 아직 구성되지 않았습니다."}
+                else:
+                    self.last_result = await rollup_crud.refresh_rollups(db)
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+        return self.last_result
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"롤업 주기 갱신 오류: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "interval_seconds": self.interval,
+            "running": self._task is not None,
+            "last_run_at": self.last_run_at,
+            "last_result": self.last_result,
+            "last_error": self.last_error
+        }
+
+
+# 프로세스 단위 공유 인스턴스
+rollup_refresher = RollupRefresher()
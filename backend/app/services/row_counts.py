@@ -0,0 +1,92 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from ..crud import row_counts as row_counts_crud
+from ..database.base import get_db_pool
+
+# 0이면 주기 집계 비활성 (POST /analytics/bw-dashboard/counts/refresh로 수동 실행)
+EXACT_COUNT_INTERVAL_SECONDS = int(os.getenv("BW_EXACT_COUNT_INTERVAL_SECONDS", "3600"))
+
+
+class RowCountVerifier:
+    """상태 API가 보여줄 테이블의 정확한 행 수를 interval초마다 백그라운드에서 집계
+
+    결과는 기록 테이블에 저장해 모든 워커가 같은 값을 읽고, advisory lock으로 한 워커만 집계한다.
+    """
+
+    def __init__(self, interval: int = EXACT_COUNT_INTERVAL_SECONDS,
+                 tables: Optional[List[str]] = None):
+        self.interval = interval
+        self.tables = tables if tables is not None else row_counts_crud.DASHBOARD_COUNT_TABLES
+        self._task: Optional[asyncio.Task] = None
+        self._running: Optional[asyncio.Task] = None
+        self.last_result: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+        self.last_run_at: Optional[datetime] = None
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def run_once(self) -> Dict[str, Any]:
+        self.last_run_at = datetime.now()
+        try:
+            pool = await get_db_pool()
+            async with pool.acquire() as db:
+                locked = await db.fetchval("SELECT pg_try_advisory_lock($1)", row_counts_crud.ROW_COUNT_LOCK_KEY)
+                if not locked:
+                    self.last_result = {"status": "skipped", "message": "다른 워커에서 행 수 집계가 진행 중입니다."}
+                    return self.last_result
+                try:
+                    await row_counts_crud.ensure_row_count_table(db)
+                    results = [await row_counts_crud.count_table_rows(db, table) for table in self.tables]
+                finally:
+                    await db.execute("SELECT pg_advisory_unlock($1)", row_counts_crud.ROW_COUNT_LOCK_KEY)
+            failed = [r["table"] for r in results if r["status"] != "success"]
+            self.last_result = {"status": "failed" if failed else "success", "results": results}
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+        return self.last_result
+
+    def trigger(self) -> bool:
+        """백그라운드 집계 1회 실행 - 이미 실행 중이면 False"""
+        if self._running is not None and not self._running.done():
+            return False
+        self._running = asyncio.create_task(self._run_once_logged())
+        return True
+
+    async def _run_once_logged(self):
+        try:
+            await self.run_once()
+        except Exception as e:
+            print(f"행 수 집계 오류: {e}")
+
+    async def _run(self):
+        while True:
+            await self._run_once_logged()
+            await asyncio.sleep(self.interval)
+
+    async def stop(self):
+        for task in (self._task, self._running):
+            if task is not None:
+                task.cancel()
+        self._task = None
+        self._running = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "interval_seconds": self.interval,
+            "periodic": self._task is not None,
+            "running": self._running is not None and not self._running.done(),
+            "last_run_at": self.last_run_at,
+            "last_result": self.last_result,
+            "last_error": self.last_error
+        }
+
+
+# 프로세스 단위 공유 인스턴스
+row_count_verifier = RowCountVerifier()
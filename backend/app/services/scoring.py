@@ -0,0 +1,131 @@
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# battery_performance_ranking 영역별 점수와 뷰의 배점 (합계 100)
+SCORE_AREAS = (
+    ("soh", 20.0),
+    ("cell_balance", 15.0),
+    ("driving_efficiency", 20.0),
+    ("charging_efficiency", 15.0),
+    ("temperature_stability", 15.0),
+    ("charging_habit", 15.0),
+)
+DEFAULT_WEIGHTS = {name: weight for name, weight in SCORE_AREAS}
+GRADE_BUCKETS = 10
+
+
+def competition_rank(unknown: np.ndarray, total: np.ndarray) -> np.ndarray:
+    """RANK() OVER (ORDER BY Unknown 여부, total DESC) - 동점은 같은 순위, 다음 순위는 건너뜀"""
+    order = np.lexsort((-total, unknown))
+    sorted_unknown = unknown[order]
+    sorted_total = total[order]
+    new_group = np.ones(len(order), dtype=bool)
+    new_group[1:] = (sorted_unknown[1:] != sorted_unknown[:-1]) | (sorted_total[1:] != sorted_total[:-1])
+    # 그룹 시작 위치를 앞으로 채워 동점 그룹의 첫 위치를 순위로 사용
+    group_start = np.maximum.accumulate(np.where(new_group, np.arange(len(order)), 0))
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = group_start + 1
+    return rank
+
+
+def ntile(order: np.ndarray, buckets: int = GRADE_BUCKETS) -> np.ndarray:
+    """NTILE(buckets) - order 순서대로 나누고 앞쪽 (n % buckets)개 버킷에 한 행씩 더 배정"""
+    n = len(order)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    size, extra = divmod(n, buckets)
+    positions = np.arange(n)
+    big = extra * (size + 1)
+    bucket = np.where(
+        positions < big,
+        positions // (size + 1),
+        extra + (positions - big) // max(size, 1),
+    ) + 1
+    grade = np.empty(n, dtype=np.int64)
+    grade[order] = bucket
+    return grade
+
+
+class ScoringEngine:
+    """차량별 영역 점수를 NumPy 행렬로 한 번 올려 두고 가중치만 바꿔 전체 차량을 다시 채점
+
+    영역 점수(0~배점)를 배점으로 나눠 0~1로 정규화한 뒤 가중치(합계 100으로 환산)를 곱해 총점을 만든다.
+    기본 가중치는 뷰의 배점과 같으므로 뷰의 총점/순위/등급이 그대로 재현된다.
+    """
+
+    def __init__(self, items: Sequence[Dict[str, Any]]):
+        self.items = list(items)
+        self.clientids = np.array([item["clientid"] for item in self.items], dtype=object)
+        self.unknown = np.array([item["car_type"] == "Unknown" for item in self.items], dtype=bool)
+        scores = np.array(
+            [[item["scores"].get(name) for name, _ in SCORE_AREAS] for item in self.items],
+            dtype=float,
+        ).reshape(len(self.items), len(SCORE_AREAS))
+        max_points = np.array([points for _, points in SCORE_AREAS])
+        # NULL 영역 점수는 0점
+        self.normalized = np.nan_to_num(scores, nan=0.0) / max_points
+        self.baseline_rank = np.array(
+            [item["rank"] if item["rank"] is not None else 0 for item in self.items], dtype=np.int64
+        )
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    @staticmethod
+    def normalize_weights(weights: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+        """영역별 가중치를 합계 100으로 환산 (지정하지 않은 영역은 뷰 배점 사용)"""
+        merged = {**DEFAULT_WEIGHTS, **{k: v for k, v in (weights or {}).items() if v is not None}}
+        unknown = set(merged) - set(DEFAULT_WEIGHTS)
+        if unknown:
+            raise ValueError(f"알 수 없는 점수 영역입니다: {', '.join(sorted(unknown))}")
+        if any(v < 0 for v in merged.values()):
+            raise ValueError("가중치는 0 이상이어야 합니다.")
+        total = sum(merged.values())
+        if total <= 0:
+            raise ValueError("가중치 합계가 0보다 커야 합니다.")
+        return {name: merged[name] * 100.0 / total for name, _ in SCORE_AREAS}
+
+    def score(self, weights: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """가중치로 전체 차량 영역 점수/총점/순위/등급을 다시 계산 (정렬 순서 포함)"""
+        started = time.perf_counter()
+        normalized_weights = self.normalize_weights(weights)
+        w = np.array([normalized_weights[name] for name, _ in SCORE_AREAS])
+        area_scores = self.normalized * w
+        # 부동소수 오차로 동점이 갈리지 않도록 소수 둘째 자리에서 반올림 후 순위 계산
+        total = np.round(area_scores.sum(axis=1), 2)
+        rank = competition_rank(self.unknown, total)
+        clientids = self.clientids.astype(str)
+        order = np.lexsort((clientids, rank))
+        grade = ntile(np.lexsort((clientids, -total)), GRADE_BUCKETS)
+        return {
+            "weights": normalized_weights,
+            "area_scores": area_scores,
+            "total": total,
+            "rank": rank,
+            "grade": grade,
+            "order": order,
+            "elapsed_ms": (time.perf_counter() - started) * 1000,
+        }
+
+    def ranked_items(self, result: Dict[str, Any], limit: int, offset: int = 0) -> List[Dict[str, Any]]:
+        """score() 결과를 순위 순으로 잘라 응답 항목으로 변환"""
+        page = []
+        for i in result["order"][offset:offset + limit]:
+            item = self.items[i]
+            rank = int(result["rank"][i])
+            page.append({
+                "clientid": item["clientid"],
+                "car_type": item["car_type"],
+                "model_year": item["model_year"],
+                "scores": {
+                    **{name: round(float(result["area_scores"][i, j]), 2) for j, (name, _) in enumerate(SCORE_AREAS)},
+                    "total": float(result["total"][i]),
+                },
+                "rank": rank,
+                "grade": int(result["grade"][i]),
+                "baseline_rank": item["rank"],
+                "rank_change": int(self.baseline_rank[i]) - rank if item["rank"] is not None else None,
+            })
+        return page
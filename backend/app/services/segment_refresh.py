@@ -0,0 +1,74 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from ..crud.segments import (
+    SEGMENT_STATES_TABLE, SEGMENTS_TABLE, refresh_segment_energy, refresh_segments
+)
+from ..database.base import get_db_pool
+from .distribution import fleet_distribution
+
+# 0이면 주기 갱신 비활성 (POST /analytics/segments/refresh로 수동 실행)
+SEGMENT_REFRESH_INTERVAL_SECONDS = int(os.getenv("BW_SEGMENT_REFRESH_INTERVAL_SECONDS", "0"))
+
+
+class SegmentRefresher:
+    """구간 증분 갱신을 interval초마다 실행하는 백그라운드 작업"""
+
+    def __init__(self, interval: int = SEGMENT_REFRESH_INTERVAL_SECONDS, max_concurrency: int = 4):
+        self.interval = interval
+        self.max_concurrency = max_concurrency
+        self._task: Optional[asyncio.Task] = None
+        self.last_result: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+        self.last_run_at: Optional[datetime] = None
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def run_once(self) -> Dict[str, Any]:
+        self.last_run_at = datetime.now()
+        try:
+            pool = await get_db_pool()
+            self.last_result = await refresh_segments(pool, max_concurrency=self.max_concurrency)
+            if SEGMENT_STATES_TABLE != SEGMENTS_TABLE:
+                # 분석 API가 뷰를 읽는 경우 뷰 구간의 에너지도 채움 (live 테이블은 분류 시 함께 계산됨)
+                self.last_result["energy"] = await refresh_segment_energy(
+                    pool, max_concurrency=self.max_concurrency
+                )
+            # 새로 닫힌 주행 구간을 분포 스케치에 반영
+            async with pool.acquire() as db:
+                self.last_result["distribution"] = await fleet_distribution.refresh(db)
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+        return self.last_result
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"구간 주기 갱신 오류: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "interval_seconds": self.interval,
+            "running": self._task is not None,
+            "last_run_at": self.last_run_at,
+            "last_result": self.last_result,
+            "last_error": self.last_error
+        }
+
+
+# 프로세스 단위 공유 인스턴스
+segment_refresher = SegmentRefresher()
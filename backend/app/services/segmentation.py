@@ -0,0 +1,112 @@
+from typing import Dict
+
+import numpy as np
+
+# bw_segments: 같은 차량에서 60초 이하 간격으로 이어진 행을 하나의 구간으로 묶음
+SEGMENT_GAP_SECONDS = 60
+# bw_segment_states: 10개 이상 레코드가 포함된 구간만 분류
+MIN_SEGMENT_RECORDS = 10
+
+# 상태 분류 임계값 (state_code: 1=충전, 2=주행, 3=정차, 4=주차, 9=기타)
+CHARGING_MIN_CHG_STATE = 0.5      # 충전기 연결 비율
+ENGINE_ON_MIN_PERCENTAGE = 50.0   # 시동 켜짐 비율 [%]
+DRIVING_MIN_MAX_SPEED = 5.0       # 구간 최고 속도 [km/h]
+DRIVING_MIN_MILEAGE_CHANGE = 0.1  # 구간 주행거리 [km]
+
+
+def split_runs(seconds: np.ndarray, gap_seconds: float = SEGMENT_GAP_SECONDS) -> np.ndarray:
+    """시간 간격이 gap_seconds를 넘는 지점에서 끊은 run 시작 인덱스 (run-length encoding)"""
+    if len(seconds) == 0:
+        return np.empty(0, dtype=np.int64)
+    breaks = np.flatnonzero(np.diff(seconds) > gap_seconds) + 1
+    return np.concatenate(([0], breaks)).astype(np.int64)
+
+
+def _first_valid(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """각 run에서 처음으로 NaN이 아닌 값 (없으면 NaN)"""
+    n = len(values)
+    idx = np.where(np.isnan(values), n, np.arange(n))
+    nxt = np.minimum.accumulate(idx[::-1])[::-1]
+    pick = nxt[starts]
+    ok = pick < ends
+    return np.where(ok, values[np.minimum(pick, n - 1)], np.nan)
+
+
+def _last_valid(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """각 run에서 마지막으로 NaN이 아닌 값 (없으면 NaN)"""
+    n = len(values)
+    idx = np.where(np.isnan(values), -1, np.arange(n))
+    prev = np.maximum.accumulate(idx)
+    pick = prev[ends - 1]
+    ok = pick >= starts
+    return np.where(ok, values[np.maximum(pick, 0)], np.nan)
+
+
+def _run_mean(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    valid = ~np.isnan(values)
+    sums = np.add.reduceat(np.where(valid, values, 0.0), starts)
+    counts = np.add.reduceat(valid.astype(np.int64), starts)
+    return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+def _run_max(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    return np.fmax.reduceat(values, starts)
+
+
+def summarize_runs(seconds: np.ndarray, columns: Dict[str, np.ndarray],
+                   starts: np.ndarray) -> Dict[str, np.ndarray]:
+    """run별 요약 - bw_segment_states 컬럼 정의와 같은 지표를 열 단위로 계산
+
+    seconds는 epoch 초(float), columns는 mileage/soc/speed/chg_state/ev_state 배열(NaN=NULL).
+    """
+    n = len(seconds)
+    ends = np.concatenate((starts[1:], [n])).astype(np.int64)
+    mileage, soc, speed = columns["mileage"], columns["soc"], columns["speed"]
+
+    summary = {
+        "start_index": starts,
+        "end_index": ends,
+        "record_count": ends - starts,
+        "start_seconds": seconds[starts],
+        "end_seconds": seconds[ends - 1],
+        "start_mileage": _first_valid(mileage, starts, ends),
+        "end_mileage": _last_valid(mileage, starts, ends),
+        "start_soc": _first_valid(soc, starts, ends),
+        "end_soc": _last_valid(soc, starts, ends),
+        "max_speed": _run_max(speed, starts),
+        "avg_speed": _run_mean(speed, starts),
+        "engine_on_percentage": _run_mean(columns["ev_state"], starts) * 100.0,
+        "avg_chg_state": _run_mean(columns["chg_state"], starts),
+    }
+    summary["duration_seconds"] = summary["end_seconds"] - summary["start_seconds"]
+    summary["mileage_change"] = summary["end_mileage"] - summary["start_mileage"]
+    summary["soc_change"] = summary["end_soc"] - summary["start_soc"]
+    return summary
+
+
+def classify_runs(summary: Dict[str, np.ndarray]):
+    """구간 요약으로 state_code와 classification_reason 계산 (벡터 연산)"""
+    chg = summary["avg_chg_state"]
+    engine_on = summary["engine_on_percentage"]
+    moved = (
+        (np.nan_to_num(summary["max_speed"], nan=0.0) >= DRIVING_MIN_MAX_SPEED)
+        | (np.nan_to_num(summary["mileage_change"], nan=0.0) >= DRIVING_MIN_MILEAGE_CHANGE)
+    )
+
+    charging = np.nan_to_num(chg, nan=0.0) >= CHARGING_MIN_CHG_STATE
+    known_engine = ~np.isnan(engine_on)
+    engine_running = known_engine & (np.nan_to_num(engine_on, nan=0.0) >= ENGINE_ON_MIN_PERCENTAGE)
+    conditions = [
+        charging,
+        engine_running & moved,
+        engine_running & ~moved,
+        known_engine & ~engine_running & ~moved,
+    ]
+    state_code = np.select(conditions, [1, 2, 3, 4], default=9)
+
+    reason = np.select(
+        conditions + [~known_engine, ~engine_running & moved],
+        ["charging", "driving", "idling", "parked", "unclassified_ev", "unclassified_mile"],
+        default="unclassified",
+    )
+    return state_code, reason
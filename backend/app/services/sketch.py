@@ -0,0 +1,136 @@
+import math
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_SKETCH_K = 200
+
+
+class KLLSketch:
+    """병합 가능한 KLL 분위수 스케치
+
+    레벨 h의 항목은 가중치 2^h를 가지며, 레벨이 용량을 넘으면 정렬 후 한 칸 건너 하나씩 골라
+    윗 레벨로 올린다. 보관 항목 수는 k에 비례하는 상수 수준이고 순위 오차는 대략 1.7/k 이내.
+    같은 k의 스케치끼리는 레벨별로 이어 붙인 뒤 다시 압축해 병합한다.
+    """
+
+    def __init__(self, k: int = DEFAULT_SKETCH_K, seed: Optional[int] = None):
+        self.k = k
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+        self._sorted: Optional[tuple] = None
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self._levels) - level - 1
+        return max(int(math.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _size(self) -> int:
+        return sum(len(level) for level in self._levels)
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(h) for h in range(len(self._levels)))
+
+    def _compress(self):
+        while self._size() > self._max_size():
+            for h, items in enumerate(self._levels):
+                if len(items) < self._capacity(h):
+                    continue
+                if h + 1 == len(self._levels):
+                    self._levels.append(np.empty(0))
+                items = np.sort(items)
+                # 홀수 개면 하나는 현재 레벨에 남김
+                keep = items[:1] if len(items) % 2 else items[:0]
+                pairs = items[len(keep):]
+                promoted = pairs[self._rng.integers(2)::2]
+                self._levels[h] = keep
+                self._levels[h + 1] = np.concatenate([self._levels[h + 1], promoted])
+                break
+        self._sorted = None
+
+    def update(self, values: Iterable[float]) -> int:
+        """값 추가 (NaN/None은 무시) - 추가된 개수"""
+        values = np.asarray(list(values) if not isinstance(values, np.ndarray) else values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return 0
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._levels[0] = np.concatenate([self._levels[0], values])
+        self._compress()
+        return len(values)
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        """other를 이 스케치에 병합 (other는 변경하지 않음)"""
+        if other.k != self.k:
+            raise ValueError("k가 다른 스케치는 병합할 수 없습니다.")
+        if other.count == 0:
+            return self
+        while len(self._levels) < len(other._levels):
+            self._levels.append(np.empty(0))
+        for h, items in enumerate(other._levels):
+            self._levels[h] = np.concatenate([self._levels[h], items])
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _weighted(self):
+        """(정렬된 항목, 누적 가중치) - 다음 갱신 전까지 재사용"""
+        if self._sorted is None:
+            items = np.concatenate(self._levels)
+            weights = np.concatenate([np.full(len(level), 2 ** h, dtype=float) for h, level in enumerate(self._levels)])
+            order = np.argsort(items, kind="stable")
+            self._sorted = (items[order], np.cumsum(weights[order]))
+        return self._sorted
+
+    def quantiles(self, qs: Sequence[float]) -> List[Optional[float]]:
+        """분위수 (q는 0~1)"""
+        if self.count == 0:
+            return [None] * len(qs)
+        items, cum = self._weighted()
+        qs = np.clip(np.asarray(qs, dtype=float), 0.0, 1.0)
+        idx = np.minimum(np.searchsorted(cum, qs * cum[-1], side="left"), len(items) - 1)
+        values = items[idx]
+        # 양 끝은 정확한 최소/최대값 사용
+        values = np.where(qs <= 0.0, self.min, np.where(qs >= 1.0, self.max, values))
+        return [float(v) for v in values]
+
+    def cdf(self, points: Sequence[float]) -> np.ndarray:
+        """각 지점 이하 값의 비율 추정"""
+        if self.count == 0:
+            return np.zeros(len(points))
+        items, cum = self._weighted()
+        idx = np.searchsorted(items, np.asarray(points, dtype=float), side="right")
+        below = np.where(idx > 0, cum[np.maximum(idx - 1, 0)], 0.0)
+        return below / cum[-1]
+
+    def histogram(self, bins: int = 20, range_: Optional[tuple] = None) -> List[Dict[str, Any]]:
+        """등간격 구간별 개수 추정 (기본 범위는 최소~최대)"""
+        if self.count == 0:
+            return []
+        lo, hi = range_ if range_ is not None else (self.min, self.max)
+        if hi <= lo:
+            return [{"from": lo, "to": hi, "count": self.count}]
+        edges = np.linspace(lo, hi, bins + 1)
+        cdf = self.cdf(edges)
+        # 첫 구간은 하한 값도 포함
+        cdf[0] = self.cdf([np.nextafter(lo, -np.inf)])[0]
+        counts = np.diff(cdf) * self.count
+        return [
+            {"from": float(edges[i]), "to": float(edges[i + 1]), "count": int(round(counts[i]))}
+            for i in range(bins)
+        ]
+
+    def copy(self) -> "KLLSketch":
+        clone = KLLSketch(self.k)
+        clone.count, clone.min, clone.max = self.count, self.min, self.max
+        clone._levels = [level.copy() for level in self._levels]
+        return clone
+
+    def retained(self) -> int:
+        return self._size()
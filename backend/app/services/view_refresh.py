@@ -0,0 +1,203 @@
+import asyncio
+import itertools
+import os
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import asyncpg
+
+from ..crud import views as views_crud
+from ..database.base import get_db_pool
+from .cache import view_cache
+
+# 0이면 주기 새로고침 비활성 (POST /analytics/views/refresh로 수동 실행)
+VIEW_REFRESH_INTERVAL_SECONDS = int(os.getenv("BW_VIEW_REFRESH_INTERVAL_SECONDS", "0"))
+# 주기 새로고침에서 제외할 뷰 (콤마 구분, 예: 크기가 큰 bw_segments)
+VIEW_REFRESH_EXCLUDE = [v.strip() for v in os.getenv("BW_VIEW_REFRESH_EXCLUDE", "").split(",") if v.strip()]
+
+
+class ViewRefreshJob:
+    """머티리얼라이즈드 뷰 새로고침 작업 한 건의 진행 상태"""
+
+    def __init__(self, job_id: str, targets: Optional[List[str]], include_dependents: bool):
+        self.id = job_id
+        self.targets = targets
+        self.include_dependents = include_dependents
+        self.status = "pending"
+        self.plan: List[str] = []
+        self.results: List[Dict[str, Any]] = []
+        self.current: Optional[str] = None
+        self.message: Optional[str] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "targets": self.targets,
+            "include_dependents": self.include_dependents,
+            "plan": self.plan,
+            "current": self.current,
+            "results": self.results,
+            "message": self.message,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+class ViewRefreshScheduler:
+    """머티리얼라이즈드 뷰를 의존 순서대로 새로고침하는 백그라운드 작업 관리자
+
+    - 작업은 제출 즉시 job_id를 돌려주고 백그라운드에서 한 번에 하나씩 실행된다.
+    - 고유 인덱스가 있는 뷰는 REFRESH ... CONCURRENTLY로 새로고침해 조회를 막지 않는다.
+    - 뷰마다 새로고침이 끝나면 해당 뷰 태그의 응답 캐시를 무효화한다.
+    - 다중 워커 환경에서는 advisory lock으로 동시에 하나의 작업만 DB에서 실행한다.
+    """
+
+    def __init__(self, interval: int = VIEW_REFRESH_INTERVAL_SECONDS,
+                 exclude: Optional[List[str]] = None, max_jobs: int = 50):
+        self.interval = interval
+        self.exclude = exclude if exclude is not None else VIEW_REFRESH_EXCLUDE
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, ViewRefreshJob]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock: Optional[asyncio.Lock] = None
+        self._tasks: set = set()
+        self._periodic: Optional[asyncio.Task] = None
+        self._hooks: Dict[str, List[Callable[[asyncpg.Connection], Awaitable[Any]]]] = {}
+
+    def on_refresh(self, view: str, callback: Callable[[asyncpg.Connection], Awaitable[Any]]):
+        """뷰 새로고침이 성공하면 같은 연결로 callback(db)을 실행 (뷰에서 파생된 테이블 갱신용)"""
+        self._hooks.setdefault(view, []).append(callback)
+
+    async def _run_hooks(self, db: asyncpg.Connection, name: str, result: Dict[str, Any]):
+        for callback in self._hooks.get(name, ()):
+            try:
+                outcome = await callback(db)
+                result.setdefault("hooks", []).append({"hook": callback.__name__, "status": "success", "result": outcome})
+            except Exception as e:
+                result.setdefault("hooks", []).append({"hook": callback.__name__, "status": "error", "error": str(e)})
+
+    def submit(self, targets: Optional[List[str]] = None, include_dependents: bool = True) -> ViewRefreshJob:
+        """새로고침 작업 등록 - 실행은 백그라운드"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        job = ViewRefreshJob(f"{datetime.now():%Y%m%d%H%M%S}-{next(self._ids)}", targets, include_dependents)
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.max_jobs:
+            oldest = next(iter(self._jobs.values()))
+            if oldest.status in ("pending", "running"):
+                break
+            self._jobs.popitem(last=False)
+        job.task = asyncio.create_task(self._run(job))
+        self._tasks.add(job.task)
+        job.task.add_done_callback(self._tasks.discard)
+        return job
+
+    def get_job(self, job_id: str) -> Optional[ViewRefreshJob]:
+        return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        return [job.to_dict() for job in reversed(self._jobs.values())]
+
+    async def _run(self, job: ViewRefreshJob):
+        try:
+            async with self._lock:
+                job.status = "running"
+                job.started_at = datetime.now()
+                try:
+                    await self._execute(job)
+                except Exception as e:
+                    job.status = "failed"
+                    job.message = f"뷰 새로고침 작업 실패: {str(e)}"
+        except asyncio.CancelledError:
+            # 종료 등으로 취소되어도 상태가 pending/running으로 남지 않도록 기록
+            job.status = "cancelled"
+            job.message = "뷰 새로고침 작업이 취소되었습니다."
+            raise
+        finally:
+            job.current = None
+            job.finished_at = datetime.now()
+
+    async def _execute(self, job: ViewRefreshJob):
+        pool = await get_db_pool()
+        async with pool.acquire() as db:
+            locked = await db.fetchval("SELECT pg_try_advisory_lock($1)", views_crud.VIEW_REFRESH_LOCK_KEY)
+            if not locked:
+                job.status = "skipped"
+                job.message = "다른 워커에서 뷰 새로고침이 진행 중입니다."
+                return
+            try:
+                await views_crud.ensure_refresh_log_table(db)
+                matviews = await views_crud.list_materialized_views(db)
+                deps = await views_crud.get_view_dependencies(db)
+                unknown = [v for v in (job.targets or []) if v not in matviews]
+                if unknown:
+                    job.status = "failed"
+                    job.message = f"존재하지 않는 머티리얼라이즈드 뷰입니다: {', '.join(unknown)}"
+                    return
+
+                job.plan = views_crud.plan_refresh_order(matviews, deps, job.targets, job.include_dependents)
+                if job.targets is None:
+                    job.plan = [v for v in job.plan if v not in self.exclude]
+
+                # 새로고침에 실패한 뷰에 의존하는 뷰는 오래된 입력으로 새로고침하지 않고 건너뜀
+                blocked: Dict[str, str] = {}
+                for name in job.plan:
+                    if name in blocked:
+                        job.results.append({"view": name, "status": "skipped", "blocked_by": blocked[name]})
+                        continue
+                    job.current = name
+                    result = await views_crud.refresh_materialized_view(db, name, matviews[name]["concurrently"])
+                    job.results.append(result)
+                    if result["status"] == "success":
+                        view_cache.invalidate(name)
+                        await self._run_hooks(db, name, result)
+                    else:
+                        for dependent in views_crud.downstream_views([name], deps) - {name}:
+                            blocked.setdefault(dependent, name)
+
+                failed = [r["view"] for r in job.results if r["status"] == "error"]
+                skipped = [r["view"] for r in job.results if r["status"] == "skipped"]
+                job.status = "failed" if failed else "success"
+                job.message = (
+                    f"새로고침 실패: {', '.join(failed)}"
+                    + (f" (의존 뷰 건너뜀: {', '.join(skipped)})" if skipped else "")
+                    if failed else f"뷰 {len(job.plan)}개를 새로고침했습니다."
+                )
+            finally:
+                await db.execute("SELECT pg_advisory_unlock($1)", views_crud.VIEW_REFRESH_LOCK_KEY)
+
+    def start(self):
+        if self.interval > 0 and self._periodic is None:
+            self._periodic = asyncio.create_task(self._run_periodic())
+
+    async def _run_periodic(self):
+        while True:
+            await self.submit().task
+            await asyncio.sleep(self.interval)
+
+    async def stop(self):
+        if self._periodic is not None:
+            self._periodic.cancel()
+            self._periodic = None
+        for task in list(self._tasks):
+            task.cancel()
+
+    def status(self) -> Dict[str, Any]:
+        running = [job.id for job in self._jobs.values() if job.status in ("pending", "running")]
+        return {
+            "interval_seconds": self.interval,
+            "exclude": self.exclude,
+            "periodic": self._periodic is not None,
+            "active_jobs": running
+        }
+
+
+# 프로세스 단위 공유 인스턴스
+view_refresher = ViewRefreshScheduler()
@@ -0,0 +1,49 @@
+from decimal import Decimal
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.database.base import get_db
+
+
+class FakeConnection:
+    """쿼리 결과를 미리 지정해 두는 asyncpg 연결 대용"""
+
+    def __init__(self, rows=None, value=True):
+        self.rows = rows or []
+        self.value = value
+        self.queries = []
+
+    async def fetch(self, query, *args):
+        self.queries.append(query)
+        return self.rows
+
+    async def fetchval(self, query, *args):
+        self.queries.append(query)
+        return self.value
+
+
+@pytest.fixture
+def make_client():
+    """라우터 하나만 등록하고 get_db를 가짜 연결로 바꾼 테스트 클라이언트"""
+    def factory(router, conn, prefix="/api/v1"):
+        app = FastAPI()
+        app.include_router(router, prefix=prefix)
+
+        async def override():
+            yield conn
+        app.dependency_overrides[get_db] = override
+        return TestClient(app)
+    return factory
+
+
+@pytest.fixture
+def sample_time():
+    return datetime(2024, 8, 20, 8, 0, 0, 123456)
+
+
+@pytest.fixture
+def sample_decimal():
+    return Decimal("12.5")
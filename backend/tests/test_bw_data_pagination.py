@@ -0,0 +1,60 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from app.crud import bw_data as bw_data_crud
+from app.crud.cursor import next_bw_data_cursor
+
+
+class VehicleTable:
+    """get_bw_data_by_client가 보내는 세 가지 쿼리만 흉내 내는 한 차량의 bw_data"""
+
+    def __init__(self, rows):
+        self.rows = sorted(rows, key=lambda r: r["timestamp"], reverse=True)
+
+    async def fetch(self, query, clientid, *args):
+        rows = [r for r in self.rows if r["clientid"] == clientid]
+        if "timestamp = $2" in query:
+            return [r for r in rows if r["timestamp"] == args[0]]
+        if "timestamp < $2" in query:
+            boundary, limit = args
+            return [r for r in rows if r["timestamp"] < boundary][:limit]
+        skip, limit = args
+        return rows[skip:skip + limit]
+
+
+def read_all_pages(table, limit):
+    async def scenario():
+        pages, cursor = [], None
+        while True:
+            page = await bw_data_crud.get_bw_data_by_client(table, "car-1", limit=limit, cursor=cursor)
+            pages.append(page)
+            cursor = next_bw_data_cursor(page, limit)
+            if cursor is None:
+                return pages
+    return asyncio.run(scenario())
+
+
+def test_cursor_pages_keep_rows_sharing_the_boundary_timestamp():
+    base = datetime(2024, 8, 20, 8, 0)
+    times = [base + timedelta(seconds=s) for s in (9, 8, 7, 7, 7, 6, 5, 5, 4, 3)]
+    table = VehicleTable([
+        {"clientid": "car-1", "timestamp": t, "soc": float(i)} for i, t in enumerate(times)
+    ])
+
+    pages = read_all_pages(table, limit=3)
+    seen = [row["soc"] for page in pages for row in page]
+
+    assert sorted(seen) == [float(i) for i in range(len(times))]
+    # 경계 시각(7초)의 행 3개는 첫 페이지에 모두 담긴다
+    assert [row["timestamp"] for row in pages[0]] == times[:5]
+
+
+def test_cursor_pages_without_ties_respect_limit():
+    base = datetime(2024, 8, 20, 8, 0)
+    table = VehicleTable([
+        {"clientid": "car-1", "timestamp": base + timedelta(seconds=s), "soc": float(s)} for s in range(7)
+    ])
+
+    pages = read_all_pages(table, limit=3)
+
+    assert [len(page) for page in pages] == [3, 3, 1]
@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+from app.services.cache import ViewCache, cached_view, view_cache
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, 2))
+
+
+def test_concurrent_requests_share_one_load():
+    cache = ViewCache()
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_load("k", ["view"], loader) for _ in range(5)))
+
+    assert run(scenario()) == ["value"] * 5
+    assert len(calls) == 1
+
+
+def test_waiter_reloads_when_leader_is_cancelled():
+    cache = ViewCache()
+
+    async def scenario():
+        leader_started = asyncio.Event()
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            if len(calls) == 1:
+                leader_started.set()
+                await asyncio.sleep(10)
+            return "value"
+
+        leader = asyncio.create_task(cache.get_or_load("k", ["view"], loader))
+        await leader_started.wait()
+        waiter = asyncio.create_task(cache.get_or_load("k", ["view"], loader))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert await waiter == "value"
+        return calls
+
+    assert len(run(scenario())) == 2
+    assert cache.get("k") == (True, "value")
+
+
+def test_waiter_cancelled_while_leader_continues():
+    cache = ViewCache()
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def loader():
+            await release.wait()
+            return "value"
+
+        leader = asyncio.create_task(cache.get_or_load("k", ["view"], loader))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_load("k", ["view"], loader))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        release.set()
+        return await leader
+
+    assert run(scenario()) == "value"
+
+
+def test_loader_error_reaches_waiters():
+    cache = ViewCache()
+
+    async def scenario():
+        async def loader():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        return await asyncio.gather(
+            *(cache.get_or_load("k", ["view"], loader) for _ in range(3)), return_exceptions=True
+        )
+
+    results = run(scenario())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert cache.get("k") == (False, None)
+
+
+def test_invalidation_during_load_skips_store():
+    cache = ViewCache()
+
+    async def scenario():
+        async def loader():
+            cache.invalidate("view")
+            return "stale"
+
+        return await cache.get_or_load("k", ["view"], loader)
+
+    assert run(scenario()) == "stale"
+    assert cache.get("k") == (False, None)
+
+
+def test_cached_view_uses_dedicated_cache():
+    per_vehicle = ViewCache(maxsize=2)
+
+    @cached_view("sessions", cache=per_vehicle)
+    async def load(db, clientid):
+        return clientid.upper()
+
+    async def scenario():
+        return [await load(None, c) for c in ("a", "b", "c")]
+
+    before = view_cache.stats()["entries"]
+    assert run(scenario()) == ["A", "B", "C"]
+    assert per_vehicle.stats()["entries"] == 2
+    assert per_vehicle.evictions == 1
+    assert view_cache.stats()["entries"] == before
@@ -0,0 +1,85 @@
+import asyncpg
+import pytest
+
+from app.api.v1 import analytics, performance
+from app.crud import bw_data as bw_data_crud
+from app.schemas.bw_data import BwDataResponse
+
+from conftest import FakeConnection
+
+
+def _bw_data_row(sample_time):
+    row = {column: float(i) for i, column in enumerate(bw_data_crud.BW_DATA_NUMERIC_COLUMNS)}
+    row.update(clientid="V001", timestamp=sample_time, chg_state=1, ev_state=0, soh=None)
+    return row
+
+
+def test_bw_data_columns_match_response_model():
+    # fast 경로는 응답 모델 검증을 생략하므로 조회 컬럼이 곧 응답 스키마
+    assert set(bw_data_crud.BW_DATA_COLUMNS) == set(BwDataResponse.model_fields)
+    assert len(bw_data_crud.BW_DATA_COLUMNS) == len(set(bw_data_crud.BW_DATA_COLUMNS))
+
+
+def test_fast_select_list_covers_response_model():
+    selected = bw_data_crud.select_list(bw_data_crud.BW_DATA_NUMERIC_COLUMNS)
+    assert {c.strip() for c in selected.split(",")} == set(BwDataResponse.model_fields)
+
+
+def test_performance_data_fast_matches_validated_response(make_client, sample_time):
+    conn = FakeConnection(rows=[_bw_data_row(sample_time)])
+    client = make_client(performance.router, conn)
+
+    slow = client.get("/api/v1/performance/data", params={"clientid": "V001"})
+    fast = client.get("/api/v1/performance/data", params={"clientid": "V001", "fast": "true"})
+
+    assert slow.status_code == fast.status_code == 200
+    assert fast.json() == slow.json()
+
+
+def test_vehicle_segments_fast_matches_default_response(make_client, monkeypatch, sample_time, sample_decimal):
+    row = {
+        "segment_start_time": sample_time,
+        "segment_end_time": sample_time,
+        "segment_duration_minutes": sample_decimal,
+        "start_mileage": 100.0,
+        "end_mileage": 110.0,
+        "mileage_change": 10.0,
+        "start_soc": 80.0,
+        "end_soc": 75.0,
+        "soc_change": -5.0,
+        "max_speed": 90.0,
+        "avg_speed": 45.0,
+        "engine_on_percentage": 100.0,
+        "avg_chg_state": 0.0,
+        "energy_consumed_wh": None,
+        "efficiency_wh_per_km": None,
+        "segment_type": "driving",
+    }
+    conn = FakeConnection(rows=[row])
+    client = make_client(analytics.router, conn)
+
+    slow = client.get("/api/v1/analytics/vehicle/V001/segments")
+
+    # fast 경로는 행 단위 dict 변환 경로를 거치지 않아야 함
+    async def fail(*args, **kwargs):
+        raise AssertionError("fast 경로가 get_vehicle_segments_data를 호출했습니다.")
+    monkeypatch.setattr(analytics.analytics_crud, "get_vehicle_segments_data", fail)
+    fast = client.get("/api/v1/analytics/vehicle/V001/segments", params={"fast": "true"})
+
+    assert slow.status_code == fast.status_code == 200
+    assert fast.json() == slow.json()
+    assert list(fast.json()[0]) == list(slow.json()[0])
+
+
+def test_vehicle_segments_fast_surfaces_query_errors(make_client, monkeypatch):
+    class BrokenConnection(FakeConnection):
+        async def fetch(self, query, *args):
+            raise asyncpg.UndefinedTableError("relation does not exist")
+
+    async def fail(*args, **kwargs):
+        raise AssertionError("fast 경로 실패 시 기본 경로(더미 데이터)로 넘어가면 안 됩니다.")
+    monkeypatch.setattr(analytics.analytics_crud, "get_vehicle_segments_data", fail)
+    client = make_client(analytics.router, BrokenConnection())
+
+    with pytest.raises(asyncpg.UndefinedTableError):
+        client.get("/api/v1/analytics/vehicle/V001/segments", params={"fast": "true"})
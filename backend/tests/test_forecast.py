@@ -0,0 +1,105 @@
+import numpy as np
+
+from app.services.forecast import (
+    STATUS_INSUFFICIENT,
+    STATUS_PROJECTED,
+    STATUS_REACHED,
+    STATUS_STABLE,
+    fit_degradation,
+    project_eol,
+)
+
+MONTH_DAYS = np.arange(12) * 30.0
+
+
+def fit_vehicles(series):
+    """차량별 (days, values) 목록을 fit_degradation 입력으로 변환해 회귀"""
+    codes = np.concatenate([np.full(len(days), i) for i, (days, _) in enumerate(series)])
+    days = np.concatenate([days for days, _ in series])
+    values = np.concatenate([values for _, values in series])
+    return fit_degradation(codes, days, values, len(series))
+
+
+def test_fit_degradation_recovers_line_per_vehicle():
+    fit = fit_vehicles([
+        (MONTH_DAYS, 100.0 - 0.01 * MONTH_DAYS),
+        (MONTH_DAYS[:8], 95.0 + 0.002 * MONTH_DAYS[:8]),
+    ])
+
+    np.testing.assert_array_equal(fit["n"], [12, 8])
+    np.testing.assert_allclose(fit["slope_per_day"], [-0.01, 0.002])
+    np.testing.assert_allclose(fit["y_mean"] - fit["slope_per_day"] * fit["x_mean"], [100.0, 95.0])
+    np.testing.assert_allclose(fit["residual_std"], [0.0, 0.0], atol=1e-9)
+    np.testing.assert_allclose(fit["last_day"], [330.0, 210.0])
+    np.testing.assert_allclose(fit["last_value"], [96.7, 95.42])
+
+
+def test_fit_degradation_skips_short_and_missing_series():
+    values = 100.0 - 0.01 * MONTH_DAYS
+    values[[1, 4, 7, 9, 10, 11]] = np.nan
+    fit = fit_vehicles([(MONTH_DAYS, values), (MONTH_DAYS[:3], np.array([99.0, 98.0, 97.0]))])
+
+    np.testing.assert_array_equal(fit["n"], [6, 3])
+    assert np.isclose(fit["slope_per_day"][0], -0.01)
+    assert np.isnan(fit["slope_per_day"][1])
+    assert np.isnan(fit["slope_se"][1])
+
+
+def test_project_eol_statuses():
+    fit = fit_vehicles([
+        (MONTH_DAYS, 100.0 - 0.01 * MONTH_DAYS),
+        (MONTH_DAYS, np.full(12, 95.0)),
+        (MONTH_DAYS, 85.0 - 0.02 * MONTH_DAYS),
+        (MONTH_DAYS[:3], np.array([99.0, 98.0, 97.0])),
+    ])
+    eol = project_eol(fit, threshold=80.0)
+
+    assert list(eol["status"]) == [STATUS_PROJECTED, STATUS_STABLE, STATUS_REACHED, STATUS_INSUFFICIENT]
+    assert np.isclose(eol["eol_day"][0], 2000.0)
+    # 잔차가 없으면 구간이 점으로 줄어든다
+    assert np.isclose(eol["eol_low_day"][0], 2000.0)
+    assert np.isclose(eol["eol_high_day"][0], 2000.0)
+    assert np.isnan(eol["eol_day"][1])
+
+
+def test_project_eol_interval_brackets_estimate_and_widens_with_noise():
+    rng = np.random.default_rng(0)
+    noise = rng.normal(0.0, 1.0, 12)
+    fit = fit_vehicles([
+        (MONTH_DAYS, 100.0 - 0.01 * MONTH_DAYS + 0.2 * noise),
+        (MONTH_DAYS, 100.0 - 0.01 * MONTH_DAYS + 0.6 * noise),
+    ])
+    eol = project_eol(fit, threshold=80.0)
+
+    assert np.all(eol["eol_low_day"] < eol["eol_day"])
+    assert np.all(eol["eol_day"] < eol["eol_high_day"])
+    width = eol["eol_high_day"] - eol["eol_low_day"]
+    assert width[1] > width[0]
+
+
+def test_project_eol_interval_has_no_late_bound_for_insignificant_slope():
+    rng = np.random.default_rng(1)
+    fit = fit_vehicles([(MONTH_DAYS, 100.0 - 0.001 * MONTH_DAYS + rng.normal(0.0, 2.0, 12))])
+    eol = project_eol(fit, threshold=80.0)
+
+    assert np.isnan(eol["eol_high_day"][0])
+
+
+def test_project_eol_interval_covers_true_eol_at_nominal_rate():
+    # 12개월 × 4000대, 독립 잡음 - 95% 구간이 실제 EOL을 약 95% 포함해야 한다
+    rng = np.random.default_rng(2024)
+    vehicles, threshold = 4000, 80.0
+    intercept = rng.uniform(96.0, 100.0, vehicles)
+    slope = -rng.uniform(0.005, 0.02, vehicles)
+    noise = rng.normal(0.0, 0.5, (vehicles, len(MONTH_DAYS)))
+    values = intercept[:, None] + slope[:, None] * MONTH_DAYS + noise
+
+    codes = np.repeat(np.arange(vehicles), len(MONTH_DAYS))
+    fit = fit_degradation(codes, np.tile(MONTH_DAYS, vehicles), values.ravel(), vehicles)
+    eol = project_eol(fit, threshold)
+
+    true_eol = (threshold - intercept) / slope
+    low = np.nan_to_num(eol["eol_low_day"], nan=-np.inf)
+    high = np.nan_to_num(eol["eol_high_day"], nan=np.inf)
+    coverage = np.mean((low <= true_eol) & (true_eol <= high))
+    assert 0.935 <= coverage <= 0.965
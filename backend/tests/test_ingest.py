@@ -0,0 +1,66 @@
+from datetime import datetime
+
+import pyarrow as pa
+import pytest
+
+from app.api.v1 import ingest as ingest_api
+from app.services import ingest
+from app.services.ingest import parse_arrow, parse_ndjson
+
+TABLE = pa.table({
+    "clientid": ["car-1", "car-2"],
+    "timestamp": [datetime(2024, 1, 1, 9, 0), datetime(2024, 1, 1, 9, 1)],
+    "soc": [81.5, None],
+    "chg_state": [1, 0],
+})
+
+
+def arrow_stream(table):
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def arrow_file(table):
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def expected_rows():
+    return parse_ndjson(
+        b'{"clientid": "car-1", "timestamp": "2024-01-01T09:00:00", "soc": 81.5, "chg_state": 1}\n'
+        b'{"clientid": "car-2", "timestamp": "2024-01-01T09:01:00", "chg_state": 0}\n'
+    )
+
+
+def test_parse_arrow_stream_and_file_round_trip():
+    assert parse_arrow(arrow_stream(TABLE)) == expected_rows()
+    assert parse_arrow(arrow_file(TABLE), file_format=True) == expected_rows()
+
+
+def test_parse_arrow_rejects_mismatched_format():
+    with pytest.raises(ValueError):
+        parse_arrow(arrow_file(TABLE))
+
+
+@pytest.mark.parametrize("content_type, encode", [
+    (ingest_api.ARROW_STREAM_CONTENT_TYPE, arrow_stream),
+    (ingest_api.ARROW_FILE_CONTENT_TYPE, arrow_file),
+])
+def test_ingest_endpoint_accepts_arrow_formats(monkeypatch, make_client, content_type, encode):
+    submitted = []
+
+    async def submit(rows):
+        submitted.append(rows)
+        return {"rows": len(rows)}
+
+    monkeypatch.setattr(ingest.bw_data_ingestor, "submit", submit)
+    client = make_client(ingest_api.router, None)
+    response = client.post("/api/v1/ingest/bw-data", content=encode(TABLE),
+                           headers={"content-type": content_type})
+
+    assert response.status_code == 200
+    assert submitted == [expected_rows()]